@@ -0,0 +1,115 @@
+"""Задержка под параллельной нагрузкой: блокирующая сессия против AsyncSession
+
+Создаёт группу с парами на три года вперёд и в одном цикле событий (как у одного воркера)
+поднимает приложение с двумя одинаковыми обработчиками страницы расписания: через синхронную
+сессию, как читали обработчики до AsyncSession, и через `get_async_session`. В каждый отправляет
+разом по CONCURRENCY запросов и один `/health`, который в базу не ходит, печатает время всей
+пачки, медиану и p95 задержки страниц и задержку `/health`, затем удаляет созданные строки.
+
+Запуск: `python -m benchmarks.concurrency`
+"""
+
+import asyncio
+import statistics
+import time
+from datetime import timedelta
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from benchmarks.ics_render import START, YEARS, cleanup, seed
+from calendar_backend.database import async_engine, get_async_session
+from calendar_backend.methods import utils
+from calendar_backend.models import Event
+from calendar_backend.routes.models import GetListEvent
+from calendar_backend.settings import get_settings
+
+
+CONCURRENCY = 32
+PAGE_SIZE = 100
+END = START + timedelta(days=365 * YEARS + 1)
+
+
+def page(events, occurrence):
+    """Страница с total, как в `GET /event/`; годится и для Query, и для Select"""
+    return (
+        events.add_columns(func.count().over().label("total"))
+        .options(selectinload(Event.room), selectinload(Event.group), selectinload(Event.lecturer))
+        .order_by(occurrence.c.start_ts, Event.id)
+        .limit(PAGE_SIZE)
+    )
+
+
+def timetable(rows) -> GetListEvent:
+    return GetListEvent(items=[row.Event for row in rows], limit=PAGE_SIZE, offset=0, total=rows[0].total)
+
+
+def build_app(engine) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {}
+
+    @app.get("/blocking")
+    async def blocking(group_id: int):
+        # Синхронный запрос прямо в async def: пока он идёт, цикл событий стоит
+        with Session(engine) as session:
+            return timetable(page(*utils.get_timetable_query(session, START, END, group_id=group_id)).all())
+
+    @app.get("/async")
+    async def non_blocking(group_id: int, session: AsyncSession = Depends(get_async_session)):
+        return timetable(
+            (await session.execute(page(*utils.get_timetable_select(START, END, group_id=group_id)))).all()
+        )
+
+    return app
+
+
+async def timed(client: httpx.AsyncClient, path: str, params: dict, sent: float) -> float:
+    """Задержка от общего момента отправки: пока цикл занят, запрос не начнётся вовсе"""
+    response = await client.get(path, params=params)
+    response.raise_for_status()
+    return time.perf_counter() - sent
+
+
+async def measure(client: httpx.AsyncClient, path: str, group_id: int) -> None:
+    await timed(client, path, {"group_id": group_id}, time.perf_counter())  # прогрев пула и кэша компиляции
+    sent = time.perf_counter()
+    *latencies, health = await asyncio.gather(
+        *(timed(client, path, {"group_id": group_id}, sent) for _ in range(CONCURRENCY)),
+        timed(client, "/health", {}, sent),
+    )
+    elapsed = time.perf_counter() - sent
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    print(
+        f"{path:>9}: {elapsed:7.3f} s for {CONCURRENCY} pages, p50 {statistics.median(latencies):6.3f} s, "
+        f"p95 {p95:6.3f} s, /health {health:6.3f} s"
+    )
+
+
+async def compare(engine, group_id: int) -> None:
+    transport = httpx.ASGITransport(app=build_app(engine))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(2):
+            await measure(client, "/blocking", group_id)
+            await measure(client, "/async", group_id)
+    await async_engine.dispose()
+
+
+def main():
+    engine = create_engine(str(get_settings().DB_DSN), isolation_level="AUTOCOMMIT")
+    with Session(engine) as session:
+        group = seed(session)
+        session.execute(text("ANALYZE event, events_groups, events_rooms, events_lecturers"))
+        try:
+            asyncio.run(compare(engine, group.id))
+        finally:
+            cleanup(session, group)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Импорт расписания факультета через `import_events`
+
+Создаёт группы, аудитории и преподавателей, импортирует семестр пар (около 20 тысяч событий),
+затем импортирует тот же семестр ещё раз, когда все события оказываются дублями,
+печатает время обоих проходов и удаляет созданные строки.
+
+Запуск: `python -m benchmarks.event_import`
+"""
+
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.orm import Session
+
+from calendar_backend.methods.event_import import import_events
+from calendar_backend.models import Event, EventsGroups, EventsLecturers, EventsRooms, Group, Lecturer, Room
+from calendar_backend.routes.models import EventPost
+from calendar_backend.settings import get_settings
+
+
+GROUPS = 40
+ROOMS = 30
+LECTURERS = 60
+SEMESTER_START = date(2031, 2, 3)
+WEEKS = 17
+SLOTS = 6
+
+
+def seed(session: Session) -> tuple[list[int], list[int], list[int]]:
+    tag = f"bench-import-{datetime.utcnow().isoformat()}"
+    groups = [Group(name="", number=f"{tag}-{i}") for i in range(GROUPS)]
+    rooms = [Room(name=f"{tag}-{i}") for i in range(ROOMS)]
+    lecturers = [Lecturer(first_name="Имя", middle_name="Отчество", last_name=f"{tag}-{i}") for i in range(LECTURERS)]
+    session.add_all(groups + rooms + lecturers)
+    session.commit()
+    return [row.id for row in groups], [row.id for row in rooms], [row.id for row in lecturers]
+
+
+def timetable(group_ids: list[int], room_ids: list[int], lecturer_ids: list[int]) -> list[EventPost]:
+    events = []
+    for day in range(WEEKS * 7):
+        current = datetime.combine(SEMESTER_START + timedelta(days=day), datetime.min.time())
+        if current.isoweekday() > 5:
+            continue
+        for slot in range(SLOTS):
+            start_ts = current + timedelta(hours=9 + 2 * slot)
+            for i, group_id in enumerate(group_ids):
+                events.append(
+                    EventPost(
+                        name=f"Предмет {(i + slot) % 12}",
+                        room_id=[room_ids[(i + slot) % len(room_ids)]],
+                        group_id=[group_id],
+                        lecturer_id=[lecturer_ids[(i + day) % len(lecturer_ids)]],
+                        start_ts=start_ts,
+                        end_ts=start_ts + timedelta(minutes=95),
+                    )
+                )
+    return events
+
+
+def cleanup(engine, group_ids: list[int], room_ids: list[int], lecturer_ids: list[int]) -> None:
+    with Session(engine) as session:
+        event_ids = select(EventsGroups.event_id).where(EventsGroups.group_id.in_(group_ids)).scalar_subquery()
+        event_ids = list(session.scalars(select(Event.id).where(Event.id.in_(event_ids))))
+        for link in (EventsGroups, EventsRooms, EventsLecturers):
+            session.execute(delete(link).where(link.event_id.in_(event_ids)))
+        session.execute(delete(Event).where(Event.id.in_(event_ids)))
+        session.execute(delete(Group).where(Group.id.in_(group_ids)))
+        session.execute(delete(Room).where(Room.id.in_(room_ids)))
+        session.execute(delete(Lecturer).where(Lecturer.id.in_(lecturer_ids)))
+        session.commit()
+
+
+def main():
+    engine = create_engine(str(get_settings().DB_DSN), isolation_level="AUTOCOMMIT")
+    with Session(engine) as session:
+        ids = seed(session)
+    events = timetable(*ids)
+    print(f"{len(events)} events")
+    try:
+        for title in ("import", "reimport"):
+            with Session(engine) as session:
+                started = time.perf_counter()
+                result = import_events(session, events)
+                session.commit()
+                elapsed = time.perf_counter() - started
+            print(f"{title:>10}: {elapsed:7.3f} s, {len(result.events)} inserted, {result.skipped} skipped")
+    finally:
+        cleanup(engine, *ids)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Память и время рендеринга .ics: icalendar против потокового рендера
+
+Создаёт группу с парами на три года вперёд (так разрешает `/event/repeating`), рендерит
+её календарь так, как это делалось через `icalendar.Calendar`, и через `stream_ics`,
+печатает время и пик памяти по `tracemalloc`, затем удаляет созданные строки.
+
+Запуск: `python -m benchmarks.ics_render`
+"""
+
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import pytz
+from icalendar import Calendar
+from icalendar import Event as IcsEvent
+from icalendar import vText
+from sqlalchemy import create_engine, delete, text
+from sqlalchemy.orm import Session, selectinload
+
+from calendar_backend.cache import MemoryCache
+from calendar_backend.methods import utils
+from calendar_backend.methods.calendar_cache import calendar_cache
+from calendar_backend.methods.list_calendar import stream_ics
+from calendar_backend.models import Event, EventsGroups, EventsLecturers, EventsRooms, Group, Lecturer, Room
+from calendar_backend.settings import get_settings
+
+
+START = date(2030, 9, 2)
+YEARS = 3
+SLOTS = 6
+
+
+def seed(session: Session) -> Group:
+    tag = f"bench-ics-{datetime.utcnow().isoformat()}"
+    group = Group(name="", number=tag)
+    room = Room(name=tag)
+    lecturer = Lecturer(first_name="Имя", middle_name="Отчество", last_name=tag)
+    session.add_all((group, room, lecturer))
+    session.flush()
+    session.execute(
+        text(
+            """
+            INSERT INTO event (name, start_ts, end_ts, is_deleted)
+            SELECT 'Лекция по очень интересному предмету', d + make_interval(hours => 9 + 2 * s),
+                   d + make_interval(hours => 10 + 2 * s), false
+            FROM generate_series(CAST(:start AS timestamp), CAST(:end AS timestamp), '1 day') d
+            CROSS JOIN generate_series(0, :slots - 1) s
+            WHERE extract(isodow FROM d) < 6
+            """
+        ),
+        {"start": START, "end": START + timedelta(days=365 * YEARS), "slots": SLOTS},
+    )
+    event_ids = session.execute(
+        text("SELECT id FROM event WHERE start_ts >= :start AND name = 'Лекция по очень интересному предмету'"),
+        {"start": START},
+    ).scalars()
+    event_ids = list(event_ids)
+    session.execute(EventsGroups.__table__.insert(), [{"event_id": id, "group_id": group.id} for id in event_ids])
+    session.execute(EventsRooms.__table__.insert(), [{"event_id": id, "room_id": room.id} for id in event_ids])
+    session.execute(
+        EventsLecturers.__table__.insert(), [{"event_id": id, "lecturer_id": lecturer.id} for id in event_ids]
+    )
+    session.commit()
+    return group
+
+
+def cleanup(session: Session, group: Group) -> None:
+    event_ids = [row.event_id for row in session.query(EventsGroups).filter(EventsGroups.group_id == group.id)]
+    room_ids = {row.room_id for row in session.query(EventsRooms).filter(EventsRooms.event_id.in_(event_ids))}
+    lecturer_ids = {
+        row.lecturer_id for row in session.query(EventsLecturers).filter(EventsLecturers.event_id.in_(event_ids))
+    }
+    for link in (EventsGroups, EventsRooms, EventsLecturers):
+        session.execute(delete(link).where(link.event_id.in_(event_ids)))
+    session.execute(delete(Event).where(Event.id.in_(event_ids)))
+    session.execute(delete(Room).where(Room.id.in_(room_ids)))
+    session.execute(delete(Lecturer).where(Lecturer.id.in_(lecturer_ids)))
+    session.execute(delete(Group).where(Group.id == group.id))
+    session.commit()
+
+
+def render_icalendar(session: Session, group_id: int, start: date, end: date) -> bytes:
+    """Рендер через icalendar.Calendar, как было до потокового рендера"""
+    events, occurrence = utils.get_timetable_query(session, start, end, group_id=group_id)
+    timetable = (
+        events.with_entities(Event)
+        .options(selectinload(Event.room), selectinload(Event.lecturer))
+        .order_by(occurrence.c.start_ts)
+        .all()
+    )
+    user_calendar = Calendar()
+    for lesson in timetable:
+        teacher = (
+            str([f"{row.first_name} {row.middle_name} {row.last_name}" for row in lesson.lecturer])
+            if lesson.lecturer
+            else "-"
+        )
+        place = str([row.name for row in lesson.room]) if lesson.room else "-"
+        event = IcsEvent()
+        event.add("summary", f"{lesson.name}, {teacher}")
+        event.add("dtstart", lesson.start_ts.replace(tzinfo=pytz.UTC))
+        event.add("dtend", lesson.end_ts.replace(tzinfo=pytz.UTC))
+        event["location"] = vText(place)
+        user_calendar.add_component(event)
+    return user_calendar.to_ical()
+
+
+def measure(title: str, render) -> None:
+    """Время меряется отдельно от памяти: tracemalloc сильно замедляет аллокации"""
+    started = time.perf_counter()
+    size = render()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    render()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{title:>10}: {elapsed:7.3f} s, peak {peak / 2**20:7.2f} MiB, {size / 2**20:6.2f} MiB of ics")
+
+
+def main():
+    engine = create_engine(str(get_settings().DB_DSN), isolation_level="AUTOCOMMIT")
+    calendar_cache.directory = None
+    calendar_cache.backend = MemoryCache(max_items=0)
+    start, end = START, START + timedelta(days=365 * YEARS + 1)
+    with Session(engine) as session:
+        group = seed(session)
+        try:
+            print(f"{utils.get_timetable_query(session, start, end, group_id=group.id)[0].count()} events")
+            for _ in range(2):
+                with Session(engine) as render_session:
+                    measure("icalendar", lambda: len(render_icalendar(render_session, group.id, start, end)))
+                measure(
+                    "stream",
+                    lambda: sum(len(chunk) for chunk in stream_ics(engine, "bench", start, end, group_id=group.id)),
+                )
+        finally:
+            cleanup(session, group)
+
+
+if __name__ == "__main__":
+    main()
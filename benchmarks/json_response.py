@@ -0,0 +1,117 @@
+"""Процессорное время сериализации списков: словарь через `response_model` против `ModelResponse`
+
+Собирает в памяти страницу из EVENTS событий с группами, аудиториями и преподавателями, как её
+отдаёт `GET /event/`, и страницу преподавателей `GET /lecturer/`. Для каждой печатает время CPU на
+запрос по-старому (модель, `model_dump`, проверка по `response_model` и `json.dumps` в FastAPI)
+и по-новому (`model_construct` и один `model_dump_json`), и проверяет, что JSON получается тот же.
+База не нужна.
+
+Запуск: `python -m benchmarks.json_response`
+"""
+
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from calendar_backend.routes.models import GetListLecturer, GroupGet, LecturerGet, RoomGet
+from calendar_backend.routes.models.event import Event as EventItem
+from calendar_backend.routes.models.event import GetListEvent
+from calendar_backend.routes.response import ModelResponse
+
+
+EVENTS = 1000
+LECTURERS = 100
+REPEAT = 50
+START = datetime(2030, 9, 2, 9)
+
+
+def references():
+    groups = [GroupGet(id=i, name=f"Группа {i}", number=f"{100 + i}") for i in range(20)]
+    rooms = [RoomGet(id=i, name=f"{i}-{i + 1}", building="physics", direction="North") for i in range(20)]
+    lecturers = [
+        LecturerGet(
+            id=i,
+            first_name="Пётр",
+            middle_name="Сергеевич",
+            last_name=f"Иванов-{i}",
+            avatar_id=i,
+            avatar_link=f"/static/photo/lecturer/{i}.webp",
+            description="Профессор кафедры общей физики",
+        )
+        for i in range(LECTURERS)
+    ]
+    return groups, rooms, lecturers
+
+
+def event_rows(groups, rooms, lecturers) -> list[dict]:
+    """Строки запроса с уже подставленными объектами из кэша"""
+    return [
+        {
+            "id": i,
+            "name": "Лекция по очень интересному предмету",
+            "start_ts": START + timedelta(hours=2 * i),
+            "end_ts": START + timedelta(hours=2 * i + 1),
+            "group": [groups[i % len(groups)], groups[(i + 1) % len(groups)]],
+            "room": [rooms[i % len(rooms)]],
+            "lecturer": [lecturers[i % len(lecturers)]],
+        }
+        for i in range(EVENTS)
+    ]
+
+
+async def through_response_model(model, content) -> bytes:
+    """Путь FastAPI для возвращённого объекта: проверка по response_model, затем json.dumps"""
+    field = create_response_field(name="response", type_=model, mode="serialization")
+    if isinstance(content, model):
+        content = content.model_dump()
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+
+async def timed(render) -> tuple[bytes, float]:
+    body = await render()
+    started = time.process_time()
+    for _ in range(REPEAT):
+        await render()
+    return body, (time.process_time() - started) / REPEAT
+
+
+async def compare(title: str, before, after) -> None:
+    old, old_cpu = await timed(before)
+    new, new_cpu = await timed(after)
+    assert json.loads(old) == json.loads(new), f"{title}: responses differ"
+    print(
+        f"{title:>10}: response_model {old_cpu * 1000:7.2f} ms, ModelResponse {new_cpu * 1000:7.2f} ms CPU, "
+        f"{len(new) / 2**10:7.1f} KiB"
+    )
+
+
+async def main():
+    groups, rooms, lecturers = references()
+    rows = event_rows(groups, rooms, lecturers)
+    page = {"limit": EVENTS, "offset": 0, "total": EVENTS, "has_more": False}
+    lecturer_page = {**page, "limit": LECTURERS, "total": LECTURERS}
+
+    async def events_before():
+        return await through_response_model(GetListEvent, GetListEvent(items=rows, **page))
+
+    async def events_after():
+        items = [EventItem.model_construct(**row) for row in rows]
+        return ModelResponse(GetListEvent.model_construct(items=items, **page)).body
+
+    async def lecturers_before():
+        return await through_response_model(GetListLecturer, {"items": lecturers, **lecturer_page})
+
+    async def lecturers_after():
+        return ModelResponse(GetListLecturer.model_construct(items=lecturers, **lecturer_page)).body
+
+    await compare("events", events_before, events_after)
+    await compare("lecturers", lecturers_before, lecturers_after)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
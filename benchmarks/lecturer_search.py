@@ -0,0 +1,101 @@
+"""Поиск преподавателей: цепочка `LIKE '%q%'` против полнотекстового индекса
+
+Засевает в транзакции LECTURERS преподавателей с сочетаниями настоящих фамилий, имён и отчеств,
+для нескольких запросов печатает число найденных, среднее время страницы `GET /lecturer/?query=`
+старым условием и `Lecturer.search` с сортировкой по релевантности и план нового запроса.
+Транзакция откатывается, так что скрипт можно запускать на любой базе после `alembic upgrade head`.
+
+Запуск: `python -m benchmarks.lecturer_search`
+"""
+
+import time
+
+from sqlalchemy import and_, create_engine, func, not_, or_, select, text, true
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from calendar_backend.models import Lecturer
+from calendar_backend.settings import get_settings
+
+
+LECTURERS = 10_000
+REPEAT = 20
+LAST_NAMES = [
+    "Иванов",
+    "Смирнов",
+    "Кузнецов",
+    "Попов",
+    "Васильев",
+    "Петров",
+    "Соколов",
+    "Михайлов",
+    "Новиков",
+    "Фёдоров",
+]
+FIRST_NAMES = ["Алексей", "Артём", "Пётр", "Сергей", "Андрей", "Дмитрий", "Николай", "Михаил", "Иван", "Егор"]
+MIDDLE_NAMES = ["Алексеевич", "Петрович", "Сергеевич", "Андреевич", "Дмитриевич", "Николаевич", "Михайлович"]
+QUERIES = ["Иванов", "петров пётр", "Федоров Артем", "Сер", "Новиков Егор Михайлович", "Несуществующий"]
+
+
+def legacy_search(query: str):
+    """Условие поиска до полнотекстового индекса"""
+    condition = true()
+    for q in query.split(' '):
+        condition = and_(
+            condition,
+            or_(Lecturer.first_name.contains(q), Lecturer.middle_name.contains(q), Lecturer.last_name.contains(q)),
+        )
+    return condition
+
+
+def seed(session: Session) -> None:
+    session.execute(
+        text(
+            """
+            INSERT INTO lecturer (first_name, middle_name, last_name, is_deleted)
+            SELECT (:first)[1 + i % cardinality(:first)],
+                   (:middle)[1 + i / 7 % cardinality(:middle)],
+                   (:last)[1 + i / 49 % cardinality(:last)] || CASE WHEN i % 3 = 0 THEN 'а' ELSE '' END || '-' || i,
+                   false
+            FROM generate_series(1, :n) i
+            """
+        ),
+        {"first": FIRST_NAMES, "middle": MIDDLE_NAMES, "last": LAST_NAMES, "n": LECTURERS},
+    )
+    session.execute(text("ANALYZE lecturer"))
+
+
+def page(condition, order_by):
+    return select(Lecturer.id).where(not_(Lecturer.is_deleted), condition).order_by(*order_by, Lecturer.id).limit(10)
+
+
+def timed(session: Session, query) -> tuple[int, float]:
+    total = select(func.count()).select_from(query.limit(None).subquery())
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        found = session.execute(total).scalar()
+        session.execute(query).all()
+    return found, (time.perf_counter() - started) / REPEAT
+
+
+def main():
+    engine = create_engine(str(get_settings().DB_DSN))
+    with Session(engine) as session:
+        seed(session)
+        for query in QUERIES:
+            legacy_found, legacy = timed(session, page(legacy_search(query), []))
+            found, elapsed = timed(session, page(Lecturer.search(query), [Lecturer.search_rank(query).desc()]))
+            print(
+                f"{query!r:>28}: LIKE {legacy_found:5} found, {legacy * 1000:7.2f} ms; "
+                f"search {found:5} found, {elapsed * 1000:7.2f} ms"
+            )
+        sql = page(Lecturer.search(QUERIES[1]), [Lecturer.search_rank(QUERIES[1]).desc()]).compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+        for (line,) in session.execute(text(f"EXPLAIN (ANALYZE, COSTS OFF) {sql}")):
+            print(line)
+        session.rollback()
+
+
+if __name__ == "__main__":
+    main()
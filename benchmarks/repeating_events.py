@@ -0,0 +1,108 @@
+"""Создание повторяющейся пары: по событию за раз против пакетной вставки
+
+Создаёт еженедельную пару на три года (больше `/event/repeating` не разрешает) так,
+как это делалось раньше (`Event.create` на каждое повторение), и через `insert_events`,
+печатает время, число flush и число запросов к базе. Обе вставки откатываются.
+
+Запуск: `python -m benchmarks.repeating_events`
+"""
+
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session
+
+from calendar_backend.methods.event_import import expand_repeating, insert_events
+from calendar_backend.models import Event, Group, Lecturer, Room
+from calendar_backend.routes.models.event import EventRepeatedPost
+from calendar_backend.settings import get_settings
+
+
+START = datetime(2031, 9, 1, 10, 30)
+
+
+def create_one_by_one(session: Session, event: EventRepeatedPost) -> int:
+    """Цикл из `create_repeating_event` до пакетной вставки"""
+    rooms = [Room.get(room_id, session=session) for room_id in event.room_id]
+    lecturers = [Lecturer.get(lecturer_id, session=session) for lecturer_id in event.lecturer_id]
+    groups = [Group.get(group_id, session=session) for group_id in event.group_id]
+    step = timedelta(days=event.repeat_timedelta_days)
+    cur_start_ts, cur_end_ts, created = event.start_ts, event.end_ts, 0
+    while cur_start_ts <= event.repeat_until_ts:
+        Event.create(
+            name=event.name,
+            start_ts=cur_start_ts,
+            end_ts=cur_end_ts,
+            room=rooms,
+            lecturer=lecturers,
+            group=groups,
+            session=session,
+        )
+        created += 1
+        cur_start_ts += step
+        cur_end_ts += step
+    return created
+
+
+def create_batched(session: Session, event: EventRepeatedPost) -> int:
+    return len(insert_events(session, expand_repeating(event, timedelta(days=event.repeat_timedelta_days))))
+
+
+def measure(engine, title: str, create, event: EventRepeatedPost) -> None:
+    """Движок без AUTOCOMMIT, чтобы откат убрал созданные события"""
+    counters = {"flush": 0, "statements": 0}
+
+    def count_flush(session, flush_context):
+        counters["flush"] += 1
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        counters["statements"] += 1
+
+    with Session(engine) as session:
+        sa_event.listen(session, "after_flush", count_flush)
+        sa_event.listen(engine, "before_cursor_execute", count_statement)
+        try:
+            started = time.perf_counter()
+            created = create(session, event)
+            session.flush()
+            elapsed = time.perf_counter() - started
+        finally:
+            sa_event.remove(engine, "before_cursor_execute", count_statement)
+            session.rollback()
+    print(
+        f"{title:>12}: {elapsed:7.3f} s, {created} events, "
+        f"{counters['flush']} flushes, {counters['statements']} statements"
+    )
+
+
+def main():
+    engine = create_engine(str(get_settings().DB_DSN), isolation_level="AUTOCOMMIT")
+    tag = f"bench-repeating-{datetime.utcnow().isoformat()}"
+    with Session(engine) as session:
+        group = Group.create(name="", number=tag, session=session)
+        room = Room.create(name=tag, session=session)
+        lecturer = Lecturer.create(first_name="Имя", middle_name="Отчество", last_name=tag, session=session)
+        try:
+            event = EventRepeatedPost(
+                name=tag,
+                room_id=[room.id],
+                group_id=[group.id],
+                lecturer_id=[lecturer.id],
+                start_ts=START,
+                end_ts=START + timedelta(minutes=95),
+                repeat_timedelta_days=7,
+                repeat_until_ts=START + timedelta(days=1095),
+            )
+            transactional = create_engine(str(get_settings().DB_DSN))
+            measure(transactional, "one by one", create_one_by_one, event)
+            measure(transactional, "batched", create_batched, event)
+        finally:
+            for obj in (group, room, lecturer):
+                session.delete(obj)
+            session.commit()
+
+
+if __name__ == "__main__":
+    main()
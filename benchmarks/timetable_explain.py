@@ -0,0 +1,138 @@
+"""Планы запроса расписания с индексами и без них
+
+Засевает в транзакции семестр пар (18 недель, 5 дней, 6 пар в день для каждой группы),
+печатает `EXPLAIN ANALYZE` запроса из `GET /event/` для группы, преподавателя и аудитории,
+затем удаляет индексы в той же транзакции и печатает планы ещё раз. Транзакция откатывается,
+так что скрипт можно запускать на любой базе после `alembic upgrade head`.
+
+Запуск: `python -m benchmarks.timetable_explain`
+"""
+
+from datetime import date
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from calendar_backend.methods import utils
+from calendar_backend.settings import get_settings
+
+
+GROUPS = 150
+ROOMS = 80
+LECTURERS = 300
+SEMESTER_START = date(2030, 9, 2)
+WEEKS = 18
+SLOTS = 6
+
+DROP_INDEXES = (
+    "DROP INDEX ix_event_start_ts_end_ts",
+    "DROP INDEX ix_event_series_start_ts_repeat_until_ts",
+    "ALTER TABLE events_groups DROP CONSTRAINT uq_events_groups_group_id_event_id",
+    "ALTER TABLE events_lecturers DROP CONSTRAINT uq_events_lecturers_lecturer_id_event_id",
+    "ALTER TABLE events_rooms DROP CONSTRAINT uq_events_rooms_room_id_event_id",
+    "DROP INDEX ix_events_groups_event_id",
+    "DROP INDEX ix_events_lecturers_event_id",
+    "DROP INDEX ix_events_rooms_event_id",
+)
+
+
+def seed(session: Session) -> tuple[int, int, int]:
+    tag = "bench-" + SEMESTER_START.isoformat()
+    session.execute(
+        text(
+            "INSERT INTO \"group\" (name, number, is_deleted) SELECT '', :tag || '-' || i, false FROM generate_series(1, :n) i"
+        ),
+        {"tag": tag, "n": GROUPS},
+    )
+    session.execute(
+        text("INSERT INTO room (name, is_deleted) SELECT :tag || '-' || i, false FROM generate_series(1, :n) i"),
+        {"tag": tag, "n": ROOMS},
+    )
+    session.execute(
+        text(
+            "INSERT INTO lecturer (first_name, middle_name, last_name, is_deleted) "
+            "SELECT 'Имя', 'Отчество', :tag || '-' || i, false FROM generate_series(1, :n) i"
+        ),
+        {"tag": tag, "n": LECTURERS},
+    )
+    session.execute(
+        text(
+            """
+            INSERT INTO event (name, start_ts, end_ts, is_deleted)
+            SELECT :tag || '-' || g.id, d + make_interval(hours => 9 + 2 * s), d + make_interval(hours => 10 + 2 * s), false
+            FROM "group" g
+            CROSS JOIN generate_series(CAST(:start AS timestamp), CAST(:start AS timestamp) + make_interval(weeks => :weeks), '1 day') d
+            CROSS JOIN generate_series(0, :slots - 1) s
+            WHERE g.number LIKE :tag || '-%' AND extract(isodow FROM d) < 6
+            """
+        ),
+        {"tag": tag, "start": SEMESTER_START, "weeks": WEEKS, "slots": SLOTS},
+    )
+    session.execute(
+        text(
+            """
+            INSERT INTO events_groups (event_id, group_id)
+            SELECT e.id, g.id FROM event e JOIN "group" g ON e.name = :tag || '-' || g.id
+            """
+        ),
+        {"tag": tag},
+    )
+    for table, column, entity, count in (
+        ("events_rooms", "room_id", "room", ROOMS),
+        ("events_lecturers", "lecturer_id", "lecturer", LECTURERS),
+    ):
+        session.execute(
+            text(
+                f"""
+                INSERT INTO {table} (event_id, {column})
+                SELECT e.id, x.id
+                FROM event e
+                JOIN (SELECT id, row_number() OVER (ORDER BY id) - 1 AS rn FROM {entity} WHERE {entity}.is_deleted = false
+                      AND {'last_name' if entity == 'lecturer' else 'name'} LIKE :tag || '-%') x
+                  ON x.rn = e.id % :count
+                WHERE e.name LIKE :tag || '-%'
+                """
+            ),
+            {"tag": tag, "count": count},
+        )
+    session.execute(text("ANALYZE event, events_groups, events_lecturers, events_rooms"))
+    ids = []
+    for table, column in (("\"group\"", "number"), ("room", "name"), ("lecturer", "last_name")):
+        ids.append(
+            session.execute(
+                text(f"SELECT min(id) FROM {table} WHERE {column} LIKE :tag || '-%'"), {"tag": tag}
+            ).scalar()
+        )
+    return tuple(ids)
+
+
+def explain(session: Session, title: str, **entity_id) -> None:
+    start = SEMESTER_START
+    end = date.fromordinal(start.toordinal() + 7)
+    query, occurrence = utils.get_timetable_query(session, start, end, **entity_id)
+    sql = query.order_by(occurrence.c.start_ts).statement.compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+    print(f"--- {title} {entity_id}")
+    for (line,) in session.execute(text(f"EXPLAIN (ANALYZE, COSTS OFF) {sql}")):
+        print(line)
+
+
+def main():
+    engine = create_engine(str(get_settings().DB_DSN))
+    with Session(engine) as session:
+        group_id, room_id, lecturer_id = seed(session)
+        print(f"Seeded {session.execute(text('SELECT count(*) FROM event')).scalar()} events")
+        for title in ("with indexes", "without indexes"):
+            explain(session, title, group_id=group_id)
+            explain(session, title, lecturer_id=lecturer_id)
+            explain(session, title, room_id=room_id)
+            if title == "with indexes":
+                for statement in DROP_INDEXES:
+                    session.execute(text(statement))
+        session.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""Cache shared by the workers of the service
+
+Timetable pages, rendered .ics calendars and reference data (groups, rooms, lecturers) are stored
+as bytes by string key. Without CACHE_URL the storage lives in the memory of every worker; with
+CACHE_URL pointing to Redis (or anything speaking its protocol) all workers share one storage.
+
+Invalidation goes through `publish`: subscribers of the topic are called in this worker at once and,
+with Redis, in every other worker as soon as the message reaches them. Subscribers with `local` are
+called only in the publishing worker: they clean the storage, which is shared with Redis and must be
+cleaned once. The others drop the in-process state every worker keeps.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable
+
+import redis
+
+from calendar_backend.models import changes
+from calendar_backend.settings import get_settings
+
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    def __init__(self):
+        self._subscribers: dict[str, list[tuple[Callable[[Any], None], bool]]] = {}
+
+    @abstractmethod
+    def get(self, key: str) -> bytes | None:
+        """Returns stored value or None if it is missing or expired"""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        """Stores value for `ttl` seconds"""
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None:
+        """Drops `keys`"""
+
+    @abstractmethod
+    def delete_prefix(self, *prefixes: str) -> None:
+        """Drops every key starting with one of `prefixes`"""
+
+    @abstractmethod
+    def _broadcast(self, topic: str, payload: Any) -> None:
+        """Delivers message to the other workers"""
+
+    def subscribe(self, topic: str, callback: Callable[[Any], None], local: bool = False) -> Callable[[Any], None]:
+        """
+        Call `callback` with the payload of every message published to `topic`; with `local`, only of
+        the messages this worker published
+        """
+        self._subscribers.setdefault(topic, []).append((callback, local))
+        return callback
+
+    def publish(self, topic: str, payload: Any = None) -> None:
+        """
+        Sends JSON-serializable `payload` to subscribers of `topic` in all workers, this one included
+        """
+        # Свой воркер получает сообщение сразу: следующий запрос к нему уже не увидит старых данных
+        self._deliver(topic, payload)
+        self._broadcast(topic, payload)
+
+    def _deliver(self, topic: str, payload: Any, remote: bool = False) -> None:
+        for callback, local in self._subscribers.get(topic, []):
+            if local and remote:
+                continue
+            try:
+                callback(payload)
+            except Exception as e:
+                logger.error(f"Failed to deliver '{topic}' to {callback}: {e}")
+
+    def resync(self) -> None:
+        """Drops in-process state of every topic, as if a message of other worker was missed"""
+        for topic in list(self._subscribers):
+            self._deliver(topic, None, remote=True)
+
+    def listen(self) -> None:
+        """Starts receiving messages of other workers"""
+
+    def close(self) -> None:
+        """Stops receiving messages"""
+
+
+class MemoryCache(CacheBackend):
+    """
+    LRU in the memory of this worker. Other workers have their own copies, messages do not reach them
+    """
+
+    def __init__(self, max_items: int):
+        super().__init__()
+        self.max_items = max_items
+        self._items: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._items[key] = (time.monotonic() + ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._items.pop(key, None)
+
+    def delete_prefix(self, *prefixes: str) -> None:
+        with self._lock:
+            for key in [key for key in self._items if key.startswith(prefixes)]:
+                del self._items[key]
+
+    def _broadcast(self, topic: str, payload: Any) -> None:
+        pass
+
+
+class RedisCache(CacheBackend):
+    """
+    Storage and pub/sub channel in Redis shared by all workers
+
+    Redis errors are logged and treated as a cache miss: the service keeps working from the database
+    """
+
+    def __init__(self, client: redis.Redis, namespace: str = "timetable"):
+        super().__init__()
+        self.client = client
+        self.namespace = namespace
+        self.channel = f"{namespace}:invalidate"
+        # Своё сообщение воркер уже доставил в publish, из канала оно пропускается
+        self.sender = uuid.uuid4().hex
+        self._listener: redis.client.PubSubWorkerThread | None = None
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            return self.client.get(self._key(key))
+        except redis.RedisError as e:
+            logger.warning(f"Cache read failed: {e}")
+            return None
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        try:
+            self.client.set(self._key(key), value, px=max(int(ttl * 1000), 1))
+        except redis.RedisError as e:
+            logger.warning(f"Cache write failed: {e}")
+
+    def delete(self, *keys: str) -> None:
+        try:
+            self.client.unlink(*(self._key(key) for key in keys))
+        except redis.RedisError as e:
+            logger.warning(f"Cache invalidation failed: {e}")
+
+    def delete_prefix(self, *prefixes: str) -> None:
+        try:
+            for prefix in prefixes:
+                keys = list(self.client.scan_iter(match=f"{self._key(prefix)}*", count=1000))
+                if keys:
+                    self.client.unlink(*keys)
+        except redis.RedisError as e:
+            logger.warning(f"Cache invalidation failed: {e}")
+
+    def _broadcast(self, topic: str, payload: Any) -> None:
+        message = json.dumps({"sender": self.sender, "topic": topic, "payload": payload})
+        try:
+            self.client.publish(self.channel, message)
+        except redis.RedisError as e:
+            logger.error(f"Failed to broadcast '{topic}': {e}")
+
+    def _on_message(self, message: dict) -> None:
+        try:
+            message = json.loads(message["data"])
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Malformed cache message: {e}")
+            return
+        if message.get("sender") != self.sender:
+            self._deliver(message.get("topic"), message.get("payload"), remote=True)
+
+    def listen(self) -> None:
+        # Поток, а не задача цикла событий: подписчики синхронные, а gunicorn запускает lifespan в каждом воркере
+        if self._listener is not None:
+            return
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self.channel: self._on_message})
+        self._listener = pubsub.run_in_thread(sleep_time=1, daemon=True, exception_handler=self._on_error)
+
+    def _on_error(self, e: Exception, pubsub: redis.client.PubSub, thread: redis.client.PubSubWorkerThread) -> None:
+        # Без обработчика поток завершается на первой ошибке соединения. Общее хранилище чистит отправитель,
+        # а состояние в памяти воркера могло пропустить сообщения, пока канала не было: сбрасываем его
+        logger.warning(f"Cache channel failed, reconnecting: {e}")
+        time.sleep(1)
+        self.resync()
+
+    def close(self) -> None:
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+
+def create_cache(url: str | None) -> CacheBackend:
+    if url:
+        return RedisCache(redis.Redis.from_url(url, socket_timeout=settings.CACHE_SOCKET_TIMEOUT))
+    return MemoryCache(max_items=settings.CACHE_MEMORY_ITEMS)
+
+
+cache = create_cache(settings.CACHE_URL and str(settings.CACHE_URL))
+
+
+@changes.subscribe
+def _broadcast_timetable_changes(timetable_changes: changes.TimetableChanges) -> None:
+    cache.publish("timetable", {entity: sorted(ids) for entity, ids in timetable_changes.items()})
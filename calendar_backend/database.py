@@ -0,0 +1,183 @@
+import threading
+import time
+from collections.abc import AsyncIterator
+from contextvars import ContextVar
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from calendar_backend.settings import get_settings
+
+
+settings = get_settings()
+
+
+class PoolStats:
+    """
+    Checkout counters of one connection pool, current occupancy is read from the pool itself
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def stats(self, pool: QueuePool) -> dict[str, int | float]:
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            # Пока соединений меньше pool_size, счётчик SQLAlchemy отрицательный
+            "overflow": max(pool.overflow(), 0),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_total_seconds": round(self.wait_total, 6),
+            "wait_max_seconds": round(self.wait_max, 6),
+        }
+
+
+def timed_pool(base: type[QueuePool], stats: PoolStats) -> type[QueuePool]:
+    """
+    Pool class `base` recording into `stats` how long every checkout waited for a connection
+    """
+
+    # Класс, а не событие пула: SQLAlchemy сообщает только о выданном соединении, а не о начале ожидания.
+    # stats в замыкании переживает dispose(), который пересоздаёт пул тем же классом
+    class TimedPool(base):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except PoolTimeoutError:
+                stats.record(time.perf_counter() - started, timed_out=True)
+                raise
+            stats.record(time.perf_counter() - started)
+            return connection
+
+    return TimedPool
+
+
+def pool_args(base: type[QueuePool], stats: PoolStats) -> dict:
+    return {
+        "poolclass": timed_pool(base, stats),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def async_dsn(dsn: str) -> str:
+    """
+    Same database through asyncpg driver, whatever driver DB_DSN names
+    """
+    return make_url(dsn).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+
+def create_read_engine(dsn: str, stats: PoolStats) -> AsyncEngine:
+    # Соединения asyncpg привязаны к циклу событий, движок закрывается при остановке приложения
+    return create_async_engine(async_dsn(dsn), isolation_level="AUTOCOMMIT", **pool_args(AsyncAdaptedQueuePool, stats))
+
+
+# Запись и чтение сразу после неё (обработчики POST/PATCH/DELETE через db.session) -- только основная база
+pool_stats = PoolStats()
+engine = create_engine(str(settings.DB_DSN), isolation_level="AUTOCOMMIT", **pool_args(QueuePool, pool_stats))
+session_factory = sessionmaker(bind=engine)
+
+# Обработчики только для чтения идут в реплику, если она задана
+read_dsn = str(settings.DB_READ_DSN or settings.DB_DSN)
+async_pool_stats = PoolStats()
+async_engine = create_read_engine(read_dsn, async_pool_stats)
+async_session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+# Блокирующий движок реплики нужен только потоковому рендеру .ics
+read_pool_stats = PoolStats()
+read_engine = (
+    create_engine(read_dsn, isolation_level="AUTOCOMMIT", **pool_args(QueuePool, read_pool_stats))
+    if settings.DB_READ_DSN
+    else engine
+)
+
+
+def pools_stats() -> dict[str, dict[str, int | float]]:
+    stats = {"blocking": pool_stats.stats(engine.pool), "asyncpg": async_pool_stats.stats(async_engine.pool)}
+    if read_engine is not engine:
+        stats["blocking_read"] = read_pool_stats.stats(read_engine.pool)
+    return stats
+
+
+class _RequestSession:
+    """Session of one request, created on first access"""
+
+    __slots__ = ("session",)
+
+    def __init__(self):
+        self.session: Session | None = None
+
+
+_request_session: ContextVar[_RequestSession | None] = ContextVar("_request_session", default=None)
+
+
+class DBSession:
+    @property
+    def session(self) -> Session:
+        """
+        Session of the current request, created when a handler touches it for the first time
+        """
+        request_session = _request_session.get()
+        if request_session is None:
+            raise RuntimeError("Database session is available only inside a request")
+        if request_session.session is None:
+            request_session.session = session_factory()
+        return request_session.session
+
+
+db = DBSession()
+
+
+class DBSessionMiddleware:
+    """
+    Scope of `db.session` for every HTTP request
+
+    Plain ASGI middleware: no session is created for requests that never touch `db.session`
+    (static files, CORS preflight, async read handlers), and the used one is closed after the response is sent
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_session = _RequestSession()
+        token = _request_session.set(request_session)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_session.reset(token)
+            # close() откатывает незафиксированную транзакцию, если обработчик упал до commit
+            if request_session.session is not None:
+                request_session.session.close()
+
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """
+    FastAPI dependency: session for read-only handlers, on DB_READ_DSN replica if it is set.
+    Queries in it do not block the event loop
+    """
+    async with async_session_factory() as session:
+        yield session
@@ -0,0 +1,150 @@
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+from datetime import date
+
+from calendar_backend.cache import CacheBackend, cache
+from calendar_backend.settings import get_settings
+
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+# Время создания календаря перед его содержимым: по нему запись сверяется с файлом
+STAMP = struct.Struct("!d")
+
+
+class CalendarCache:
+    """
+    Rendered calendars: cache of the service in front of files in the cache directory
+
+    Files are only used without CACHE_URL, when each worker has its own memory cache and the
+    directory is what they share. Shared cache makes the files redundant
+    """
+
+    def __init__(self, backend: CacheBackend, directory: str | None, ttl: int):
+        self.backend = backend
+        self.directory = directory
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.generation = 0
+
+    @staticmethod
+    def key(entity: str, id: int, start: date, end: date) -> str:
+        return f"{entity}_{id}_{start.isoformat()}_{end.isoformat()}.ics"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _remember(self, key: str, created: float, content: bytes) -> None:
+        ttl = self.ttl - (time.time() - created)
+        if ttl > 0:
+            self.backend.set(f"ics:{key}", STAMP.pack(created) + content, ttl)
+
+    def get(self, key: str) -> bytes | None:
+        """
+        Returns cached calendar or None if it is missing or older than ttl
+        """
+        now = time.time()
+        disk_created = None
+        if self.directory:
+            try:
+                disk_created = os.path.getmtime(self._path(key))
+            except OSError:
+                pass
+        cached = self.backend.get(f"ics:{key}")
+        # Файлы общие для всех воркеров: запись в памяти верна, пока файл не удалили и не перезаписали
+        if cached is not None and (not self.directory or STAMP.unpack_from(cached)[0] == disk_created):
+            with self._lock:
+                self.hits += 1
+            return cached[STAMP.size :]
+        if disk_created is not None and now - disk_created < self.ttl:
+            try:
+                with open(self._path(key), "rb") as f:
+                    content = f.read()
+                self._remember(key, disk_created, content)
+                with self._lock:
+                    self.disk_hits += 1
+                return content
+            except OSError:
+                pass
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, content: bytes, generation: int | None = None) -> None:
+        """
+        Stores rendered calendar. Pass `generation` read before rendering
+        to skip storing it if the timetable was invalidated meanwhile
+        """
+        if generation is not None and generation != self.generation:
+            return
+        created = time.time()
+        if self.directory:
+            # Пишем во временный файл и переименовываем, чтобы читатели не видели недописанный календарь
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(content)
+                os.replace(tmp_path, self._path(key))
+                created = os.path.getmtime(self._path(key))
+            except OSError as e:
+                logger.info(f"The error '{e}' occurred")
+                return
+        self._remember(key, created, content)
+
+    def discard(self, key: str) -> None:
+        """
+        Drops one cached calendar
+        """
+        self.backend.delete(f"ics:{key}")
+        if self.directory:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def forget(self, _=None) -> None:
+        """
+        Makes calendars being rendered in this worker skip the cache
+        """
+        with self._lock:
+            self.generation += 1
+
+    def drop(self, changes: dict[str, list[int]]) -> None:
+        """
+        Drops every cached calendar of the changed groups, lecturers and rooms
+        """
+        prefixes = tuple(f"{entity}_{id}_" for entity, ids in changes.items() for id in ids)
+        if not prefixes:
+            return
+        self.backend.delete_prefix(*(f"ics:{prefix}" for prefix in prefixes))
+        if not self.directory:
+            return
+        for name in os.listdir(self.directory):
+            if name.startswith(prefixes):
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    pass
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses}
+
+
+calendar_cache = CalendarCache(
+    backend=cache,
+    directory=os.path.join(settings.STATIC_PATH, "cache") if settings.STATIC_PATH and not settings.CACHE_URL else None,
+    ttl=settings.ICS_CACHE_TTL,
+)
+# Изменения расписания приходят от всех воркеров, а не только от сессий этого. Сохранённые календари
+# удаляет только воркер, сделавший изменение: хранилище и каталог общие
+cache.subscribe("timetable", calendar_cache.forget)
+cache.subscribe("timetable", calendar_cache.drop, local=True)
@@ -0,0 +1,80 @@
+import hashlib
+from datetime import date, datetime, timezone
+from email.utils import format_datetime
+
+from fastapi import Request
+from sqlalchemy import Select, Text, cast, func, not_
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from calendar_backend.models import CommentEvent, Event
+
+from . import utils
+
+
+def timetable_state(
+    start: date, end: date, group_id: int | None, lecturer_id: int | None, room_id: int | None
+) -> Select:
+    """
+    (count, last_modified) of the timetable: its events and the last change of them, deleted ones included
+    """
+    events, _ = utils.get_timetable_select(start, end, group_id, lecturer_id, room_id, with_deleted=True)
+    return events.with_only_columns(
+        func.count(Event.id).filter(not_(Event.is_deleted)).label("count"),
+        func.max(Event.update_ts).label("last_modified"),
+    )
+
+
+async def timetable_validator(
+    session: AsyncSession,
+    start: date,
+    end: date,
+    group_id: int | None,
+    lecturer_id: int | None,
+    room_id: int | None,
+    *params,
+    comments: bool = False,
+) -> tuple[str, datetime | None]:
+    """
+    Returns ETag and Last-Modified of the timetable without loading it
+
+    Both come from one aggregate over the same filter as the timetable itself. Deleted events are
+    counted in `max(update_ts)`, so removing an event changes the validator too. `params` are the
+    remaining request parameters that change the response body (format, page, detail). With `comments`
+    the ETag also follows the set of visible comments of the events
+    """
+    count, last_modified = (await session.execute(timetable_state(start, end, group_id, lecturer_id, room_id))).one()
+    visible_comments = None
+    if comments:
+        # Комментарий не меняет update_ts события, а видимым становится после модерации: учитывается набор id
+        events, _ = utils.get_timetable_select(start, end, group_id, lecturer_id, room_id, with_deleted=True)
+        comment_ids = func.array_agg(aggregate_order_by(CommentEvent.id, CommentEvent.id))
+        visible_comments = await session.scalar(
+            CommentEvent.select_all()
+            .with_only_columns(func.md5(cast(comment_ids, Text)))
+            .where(CommentEvent.event_id.in_(events.with_only_columns(Event.id)))
+        )
+    fingerprint = repr((start, end, group_id, lecturer_id, room_id, params, count, last_modified, visible_comments))
+    return f'W/"{hashlib.sha1(fingerprint.encode()).hexdigest()}"', last_modified
+
+
+def validator_headers(etag: str, last_modified: datetime | None) -> dict[str, str]:
+    # no-cache: клиент может хранить ответ, но обязан перепроверять его условным запросом
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    Checks If-None-Match (RFC 9110, 13.1.2)
+
+    If-Modified-Since is not answered with 304: Last-Modified is only the last change of the events
+    in the window, while an event leaving the window or an approved comment changes the response too
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
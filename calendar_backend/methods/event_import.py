@@ -0,0 +1,179 @@
+import logging
+from collections.abc import Iterable, Sequence
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from sqlalchemy import func, insert, not_, select
+from sqlalchemy.orm import Session
+
+from calendar_backend.exceptions import ObjectNotFound
+from calendar_backend.models import Event, EventsGroups, EventsLecturers, EventsRooms, Group, Lecturer, Room
+
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 1000
+
+# Поле EventPost, связанная модель и таблица связи с событием
+LINKS = (
+    ("room_id", Room, EventsRooms),
+    ("group_id", Group, EventsGroups),
+    ("lecturer_id", Lecturer, EventsLecturers),
+)
+
+Fingerprint = tuple[str, datetime, datetime, frozenset[int], frozenset[int], frozenset[int]]
+
+
+class ImportedEvent(NamedTuple):
+    id: int
+    name: str
+    start_ts: datetime
+    end_ts: datetime
+    room: list[Room]
+    group: list[Group]
+    lecturer: list[Lecturer]
+
+
+class ImportResult(NamedTuple):
+    events: list[ImportedEvent]
+    skipped: int
+
+
+def _naive(ts: datetime) -> datetime:
+    # Колонки без часового пояса хранят UTC, приводим так же до сравнения с сохранёнными событиями
+    if ts.tzinfo is None:
+        return ts
+    return ts.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _chunks(items: Sequence, size: int = IMPORT_CHUNK_SIZE) -> Iterable[Sequence]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def fingerprint(event) -> Fingerprint:
+    return (
+        event.name,
+        _naive(event.start_ts),
+        _naive(event.end_ts),
+        *(frozenset(getattr(event, field)) for field, *_ in LINKS),
+    )
+
+
+def _resolve(session: Session, model, ids: set[int]) -> dict:
+    """
+    Loads all referenced objects with one IN query, raises ObjectNotFound listing the missing ids
+    """
+    found = {}
+    for chunk in _chunks(sorted(ids)):
+        for obj in session.scalars(select(model).where(model.id.in_(chunk), not_(model.is_deleted))):
+            found[obj.id] = obj
+    if missing := ids - found.keys():
+        raise ObjectNotFound(model, sorted(missing))
+    return found
+
+
+def _existing_fingerprints(session: Session, events: Sequence) -> set[Fingerprint]:
+    """
+    Fingerprints of stored events sharing name and time with any of `events`, link ids aggregated in SQL
+    """
+    linked = [
+        select(func.array_agg(getattr(link, field)))
+        .join(model, model.id == getattr(link, field))
+        .where(link.event_id == Event.id, not_(model.is_deleted))
+        .scalar_subquery()
+        for field, model, link in LINKS
+    ]
+    keys = {(event.name, _naive(event.start_ts), _naive(event.end_ts)) for event in events}
+    existing = set()
+    # Список кортежей в IN планировщик проверяет перебором, а start_ts = ANY(...) идёт по индексу
+    for chunk in _chunks(sorted({start_ts for _, start_ts, _ in keys})):
+        query = select(Event.name, Event.start_ts, Event.end_ts, *linked).where(
+            not_(Event.is_deleted), Event.start_ts.in_(chunk)
+        )
+        for name, start_ts, end_ts, *ids in session.execute(query):
+            if (name, start_ts, end_ts) in keys:
+                existing.add((name, start_ts, end_ts, *(frozenset(row or ()) for row in ids)))
+    return existing
+
+
+def _begin(session: Session) -> None:
+    # Движок работает в AUTOCOMMIT: без явной транзакции каждая пачка фиксировалась бы отдельно
+    session.connection(execution_options={"isolation_level": "READ COMMITTED"})
+
+
+def _insert(session: Session, events: Sequence) -> list[ImportedEvent]:
+    resolved = {
+        field: _resolve(session, model, {id for event in events for id in getattr(event, field)})
+        for field, model, _ in LINKS
+    }
+    result = []
+    for chunk in _chunks(events):
+        ids = session.scalars(
+            insert(Event).returning(Event.id, sort_by_parameter_order=True),
+            [
+                {"name": event.name, "start_ts": _naive(event.start_ts), "end_ts": _naive(event.end_ts)}
+                for event in chunk
+            ],
+        ).all()
+        for field, _, link in LINKS:
+            rows = [
+                {"event_id": id, field: link_id}
+                for id, event in zip(ids, chunk)
+                for link_id in dict.fromkeys(getattr(event, field))
+            ]
+            if rows:
+                session.execute(insert(link), rows)
+        for id, event in zip(ids, chunk):
+            result.append(
+                ImportedEvent(
+                    id=id,
+                    name=event.name,
+                    start_ts=_naive(event.start_ts),
+                    end_ts=_naive(event.end_ts),
+                    room=[resolved["room_id"][i] for i in dict.fromkeys(event.room_id)],
+                    group=[resolved["group_id"][i] for i in dict.fromkeys(event.group_id)],
+                    lecturer=[resolved["lecturer_id"][i] for i in dict.fromkeys(event.lecturer_id)],
+                )
+            )
+    return result
+
+
+def insert_events(session: Session, events: Sequence) -> list[ImportedEvent]:
+    """
+    Inserts `events` (EventPost or anything with the same attributes) with a few batched statements.
+    Must be called before anything else runs in `session`, changes are applied by a single commit
+    """
+    _begin(session)
+    return _insert(session, events)
+
+
+def import_events(session: Session, events: Sequence) -> ImportResult:
+    """
+    Same as `insert_events`, but skips events equal (same name, time, rooms, groups and lecturers)
+    to a stored one or to an earlier one in `events`
+    """
+    _begin(session)
+    seen = _existing_fingerprints(session, events)
+    new_events = []
+    for event in events:
+        key = fingerprint(event)
+        if key not in seen:
+            seen.add(key)
+            new_events.append(event)
+    result = _insert(session, new_events)
+    logger.debug(f"Imported {len(result)} events, skipped {len(events) - len(new_events)} duplicates")
+    return ImportResult(events=result, skipped=len(events) - len(new_events))
+
+
+def expand_repeating(event, step: timedelta) -> list:
+    """
+    Occurrences of `event` (EventRepeatedPost) every `step` from its start up to `repeat_until_ts`
+    """
+    occurrences, offset = [], timedelta(0)
+    while event.start_ts + offset <= event.repeat_until_ts:
+        occurrences.append(
+            event.model_copy(update={"start_ts": event.start_ts + offset, "end_ts": event.end_ts + offset})
+        )
+        offset += step
+    return occurrences
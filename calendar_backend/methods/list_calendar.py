@@ -1,67 +1,148 @@
-import asyncio
 import logging
-import os
-import time
+from collections.abc import Iterator
 from datetime import date as date_
 from datetime import datetime
 
-import pytz
-from fastapi import HTTPException
-from fastapi.responses import FileResponse
-from icalendar import Calendar, Event, vText
-from sqlalchemy.orm import Session
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
-from calendar_backend.models import Group
+from calendar_backend.exceptions import NotEnoughCriteria
+from calendar_backend.models import Event, Group, Lecturer, Room
 from calendar_backend.settings import get_settings
 
 from . import utils
+from .calendar_cache import calendar_cache
+from .conditional import timetable_state
 
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+CALENDAR_HEADER = b"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//profcomff//timetable-api//RU\r\n"
+ICS_BATCH_SIZE = 500
+ICS_CHUNK_SIZE = 64 * 1024
 
-async def get_user_calendar(group_id: int, session: Session, start_date: date_, end_date: date_) -> Calendar:
+
+def escape_text(value: str) -> str:
     """
-    Returns event iCalendar object
+    Escapes TEXT property value (RFC 5545, 3.3.11)
     """
-    logger.debug(f"Getting user calendar (iCal) for group {group_id}")
-    group = Group.get(group_id, session=session)
-    user_calendar = Calendar()
-    timetable = await utils.get_group_lessons_in_daterange(group, start_date, end_date)
-    for lesson in timetable:
-        teacher = (
-            str([f"{row.first_name} {row.middle_name} {row.last_name}" for row in lesson.lecturer])
-            if lesson.lecturer
-            else "-"
-        )
-        place = str([row.name for row in lesson.room]) if lesson.room else "-"
-        event = Event()
-        event.add("summary", f"{lesson.name}, {teacher}")
-        event.add(
-            "dtstart",
-            lesson.start_ts.replace(tzinfo=pytz.UTC),
-        )
-        event.add(
-            "dtend",
-            lesson.end_ts.replace(tzinfo=pytz.UTC),
+    # Одиночный CR в значении разорвал бы строку календаря: любой перевод строки становится \n
+    value = value.replace("\r\n", "\n").replace("\r", "\n")
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def fold_line(line: str) -> bytes:
+    """
+    Splits content line into 75 octets long parts (RFC 5545, 3.1) without breaking UTF-8 characters
+    """
+    data = line.encode()
+    parts, limit = [], 75
+    while len(data) > limit:
+        cut = limit
+        while data[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(data[:cut])
+        data, limit = data[cut:], 74
+    parts.append(data)
+    return b"\r\n ".join(parts) + b"\r\n"
+
+
+def format_ts(ts: datetime) -> str:
+    return ts.strftime("%Y%m%dT%H%M%SZ")
+
+
+def render_vevent(
+    lesson: Event, dtstamp: str, start_ts: datetime, end_ts: datetime, last_start_ts: datetime | None = None
+) -> bytes:
+    """
+    Renders event, or a series from its occurrence at `start_ts` to the one at `last_start_ts`
+    as a single VEVENT with RRULE and EXDATE
+    """
+    teacher = (
+        str([f"{row.first_name} {row.middle_name} {row.last_name}" for row in lesson.lecturer])
+        if lesson.lecturer
+        else "-"
+    )
+    place = str([row.name for row in lesson.room]) if lesson.room else "-"
+    lines = [
+        b"BEGIN:VEVENT\r\n",
+        fold_line(f"UID:event-{lesson.id}@timetable"),
+        fold_line(f"DTSTAMP:{dtstamp}"),
+        fold_line(f"SUMMARY:{escape_text(f'{lesson.name}, {teacher}')}"),
+        fold_line(f"DTSTART:{format_ts(start_ts)}"),
+        fold_line(f"DTEND:{format_ts(end_ts)}"),
+        fold_line(f"LOCATION:{escape_text(place)}"),
+    ]
+    if lesson.repeat_timedelta_days and last_start_ts and last_start_ts > start_ts:
+        lines.append(
+            fold_line(f"RRULE:FREQ=DAILY;INTERVAL={lesson.repeat_timedelta_days};UNTIL={format_ts(last_start_ts)}")
         )
-        event["location"] = vText(place)
-        user_calendar.add_component(event)
-    return user_calendar
+        exdates = sorted(ts for ts in lesson.exdates if start_ts < ts < last_start_ts)
+        if exdates:
+            lines.append(fold_line(f"EXDATE:{','.join(format_ts(ts) for ts in exdates)}"))
+    lines.append(b"END:VEVENT\r\n")
+    return b"".join(lines)
 
 
-async def create_user_calendar_file(user_calendar: Calendar, group: str) -> str:
+def stream_ics(
+    bind: Engine,
+    key: str,
+    start: date_,
+    end: date_,
+    group_id: int | None = None,
+    lecturer_id: int | None = None,
+    room_id: int | None = None,
+    primary: Engine | None = None,
+) -> Iterator[bytes]:
     """
-    Creating .ics file from iCalendar object
+    Yields .ics calendar in chunks straight from a server-side cursor and stores the result in cache
+
+    `bind` may be a lagging replica. The calendar stays in cache only if its timetable state matches
+    the one of the `primary` (defaults to `bind`) checked after storing it
     """
-    logger.debug(f"Creating .ics file from iCalendar {user_calendar.name}")
-    try:
-        with open(f"{settings.STATIC_PATH}/cache/{group}", "wb") as f:
-            f.write(user_calendar.to_ical())
-        return f"{settings.STATIC_PATH}/cache/{group}"
-    except OSError as e:
-        logger.info(f"The error {e} occurred")
+    logger.debug(f"Streaming calendar (iCal) '{key}'")
+    dtstamp = format_ts(datetime.utcnow())
+    generation = calendar_cache.generation
+    rendered, buffer = [], bytearray(CALENDAR_HEADER)
+    # Сессия своя: сессия запроса закрывается раньше, чем отдан ответ
+    with Session(bind=bind) as session:
+        # Серверный курсор работает только внутри транзакции, а движок по умолчанию в AUTOCOMMIT
+        session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        # Первый запрос фиксирует снимок: состояние то же, из которого рендерится календарь
+        state = session.execute(timetable_state(start, end, group_id, lecturer_id, room_id)).one()
+        events, occurrence = utils.get_timetable_query(session, start, end, group_id, lecturer_id, room_id)
+        # Серия попадает в календарь одним VEVENT: первое и последнее повторение в окне
+        timetable = (
+            events.with_entities(
+                Event,
+                func.min(occurrence.c.start_ts).label("start_ts"),
+                func.min(occurrence.c.end_ts).label("end_ts"),
+                func.max(occurrence.c.start_ts).label("last_start_ts"),
+            )
+            .group_by(Event.id)
+            .options(selectinload(Event.room), selectinload(Event.lecturer))
+            .order_by(func.min(occurrence.c.start_ts), Event.id)
+            .yield_per(ICS_BATCH_SIZE)
+        )
+        for row in timetable:
+            buffer += render_vevent(row.Event, dtstamp, row.start_ts, row.end_ts, row.last_start_ts)
+            if len(buffer) >= ICS_CHUNK_SIZE:
+                rendered.append(bytes(buffer))
+                buffer.clear()
+                yield rendered[-1]
+    buffer += b"END:VCALENDAR\r\n"
+    rendered.append(bytes(buffer))
+    yield rendered[-1]
+    calendar_cache.put(key, b"".join(rendered), generation)
+    # Сверка после записи: изменение, закоммиченное позже, само сбросит запись, а более раннее видно здесь
+    with Session(bind=primary or bind) as session:
+        if session.execute(timetable_state(start, end, group_id, lecturer_id, room_id)).one() != state:
+            logger.debug(f"Calendar '{key}' rendered from stale data, dropping it")
+            calendar_cache.discard(key)
 
 
 def get_end_of_semester_date() -> date_:
@@ -76,38 +157,33 @@ def get_end_of_semester_date() -> date_:
         return date_.today()
 
 
-def check_file_for_creation_date(path_file: str) -> bool:
+async def create_ics(
+    start: date_,
+    end: date_,
+    session: AsyncSession,
+    bind: Engine,
+    group_id: int | None = None,
+    lecturer_id: int | None = None,
+    room_id: int | None = None,
+    primary: Engine | None = None,
+) -> Response | StreamingResponse:
     """
-    Checks that the file was created no more than one day ago
-    True: if the file needs to be recreated/created
-    False: if file exists and created last day
-    """
-    logger.debug(f"Checking file {path_file} for creation date/existing...")
-    if os.path.exists(path_file):
-        try:
-            c_time = os.path.getctime(path_file)
-            date_time_of_creation = datetime.strptime(time.ctime(c_time), "%c")
-            if (datetime.today() - date_time_of_creation).days >= 1:
-                return True
-            else:
-                return False
-        except OSError as e:
-            logger.info(f"The error '{e}' occurred")
-            return False
-    else:
-        return True
-
+    Returns .ics calendar for the group, lecturer or room, rendering it only on cache miss
 
-async def create_ics(group_id: int, start: datetime.date, end: datetime.date, session: Session):
-    if check_file_for_creation_date(f"{settings.STATIC_PATH}/cache/{group_id}") is False:
-        logger.debug(f"Calendar for group '{group_id}' found in cache")
-        return FileResponse(f"{settings.STATIC_PATH}/cache/{group_id}")
-    else:
-        async with asyncio.Lock():
-            logger.debug("Getting user calendar...")
-            user_calendar = await get_user_calendar(group_id, session=session, start_date=start, end_date=end)
-            if not user_calendar:
-                logger.info(f"Failed to create .ics file for group {group_id} (500)")
-                raise HTTPException(status_code=500, detail="Failed to create .ics file")
-            logger.debug("Creating .ics file OK")
-            return FileResponse(await create_user_calendar_file(user_calendar, group_id))
+    Calendar is rendered from a server-side cursor of the blocking engine `bind`: StreamingResponse
+    iterates a synchronous generator in the threadpool, so the event loop is not blocked. When `bind`
+    is a replica, pass the `primary` engine: calendar rendered from stale data is not kept in cache
+    """
+    entities = {"group": (Group, group_id), "lecturer": (Lecturer, lecturer_id), "room": (Room, room_id)}
+    if sum(bool(id) for _, id in entities.values()) != 1:
+        raise NotEnoughCriteria("Exactly one argument group_id, lecturer_id or room_id required")
+    entity, (model, id) = next((entity, value) for entity, value in entities.items() if value[1])
+    key = calendar_cache.key(entity, id, start, end)
+    content = calendar_cache.get(key)
+    if content is not None:
+        logger.debug(f"Calendar '{key}' found in cache")
+        return Response(content=content, media_type="text/calendar")
+    await model.get_async(id, session=session)
+    return StreamingResponse(
+        stream_ics(bind, key, start, end, group_id, lecturer_id, room_id, primary), media_type="text/calendar"
+    )
@@ -0,0 +1,93 @@
+import base64
+import json
+from datetime import datetime
+from typing import Literal, NamedTuple
+
+from fastapi import HTTPException
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+# Что клиенту нужно от total: точное число, оценка планировщика или только признак следующей страницы
+TotalMode = Literal["exact", "estimate", "none"]
+
+
+def encode_cursor(start_ts: datetime, id: int) -> str:
+    """
+    Packs the position of the last returned event into an opaque string
+    """
+    raw = json.dumps([start_ts.isoformat(), id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Unpacks a cursor produced by `encode_cursor`
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        start_ts, id = json.loads(raw)
+        return datetime.fromisoformat(start_ts), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+
+
+class Page(NamedTuple):
+    items: list
+    total: int | None
+    has_more: bool
+
+
+async def estimate_count(session: AsyncSession, query: Select) -> int:
+    """
+    Planner's estimate of the number of rows of `query`: no rows are read, statistics may be stale
+    """
+    sql = query.compile(dialect=session.bind.dialect, compile_kwargs={"literal_binds": True})
+    connection = await session.connection()
+    # exec_driver_sql: текст запроса уходит в базу как есть, двоеточия в значениях не считаются параметрами
+    plan = (await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def paginate(session: AsyncSession, query: Select, limit: int, offset: int, total: TotalMode = "exact") -> Page:
+    """
+    Page of `query` (`limit` 0 means no limit) with the total the client asked for
+
+    exact -- `count(*) over ()` in the page query itself, a separate count only for a page past the end;
+    estimate -- planner's estimate of the filtered query, exact when the last page is reached;
+    none -- no total at all. Without exact total one extra row tells whether there is a next page.
+    Items are entities or scalars for a single-column `query` and rows otherwise
+    """
+    page = query
+    if total == "exact":
+        page = page.add_columns(func.count().over().label("total"))
+    if limit:
+        page = page.limit(limit if total == "exact" else limit + 1)
+    rows = (await session.execute(page.offset(offset))).all()
+    if total == "exact":
+        if rows:
+            count = rows[0].total
+        elif offset:
+            count = await session.scalar(select(func.count()).select_from(query.subquery()))
+        else:
+            count = 0
+        has_more = count > offset + len(rows)
+    else:
+        has_more = bool(limit) and len(rows) > limit
+        rows = rows[:limit] if limit else rows
+        count = None
+        if total == "estimate" and not has_more and (rows or not offset):
+            # На последней странице число строк известно точно
+            count = offset + len(rows)
+        elif total == "estimate":
+            count = await estimate_count(session, query)
+            if has_more:
+                count = max(count, offset + len(rows) + 1)
+            else:
+                # Страница за концом выборки: строк не больше, чем offset
+                count = min(count, offset + len(rows))
+    if len(query.column_descriptions) == 1:
+        return Page([row[0] for row in rows], count, has_more)
+    return Page(rows, count, has_more)
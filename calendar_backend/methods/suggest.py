@@ -0,0 +1,69 @@
+"""Prefix search over short titles kept in memory"""
+
+from bisect import bisect_left, bisect_right
+from itertools import chain
+from typing import Generic, Iterable, TypeVar
+
+from calendar_backend.models.db import search_words
+
+
+T = TypeVar("T")
+# Сколько кандидатов сортировать; при большем числе записи проверяются подряд
+SCAN_THRESHOLD = 256
+
+
+class PrefixIndex(Generic[T]):
+    """
+    Items found by the beginnings of the words of their titles, as `Lecturer.search` finds lecturers
+
+    Every word of every title is kept in one sorted array, so the items having a word with the given
+    prefix are a contiguous range of it found by two bisections
+    """
+
+    def __init__(self, entries: Iterable[tuple[str, T]]):
+        self._items: list[T] = []
+        self._words: list[frozenset[str]] = []
+        keys = []
+        for position, (title, item) in enumerate(entries):
+            words = frozenset(search_words(title))
+            self._items.append(item)
+            self._words.append(words)
+            keys.extend((word, position) for word in words)
+        keys.sort()
+        self._keys = [word for word, _ in keys]
+        self._positions = [position for _, position in keys]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _matches(self, position: int, prefixes: list[str]) -> bool:
+        return all(any(word.startswith(prefix) for word in self._words[position]) for prefix in prefixes)
+
+    def search(self, query: str, limit: int) -> list[T]:
+        """
+        Items whose every query word starts a word of the title, in the order of entries. Items having
+        the longest query word as a whole word go first
+        """
+        prefixes = search_words(query)
+        if not prefixes:
+            return []
+        # Самый длинный префикс даёт самый узкий диапазон, остальные проверяются по словам кандидатов
+        longest = max(prefixes, key=len)
+        start = bisect_left(self._keys, longest)
+        whole_end = bisect_right(self._keys, longest, start)
+        end = bisect_left(self._keys, longest + "\U0010ffff", whole_end)
+        # Пары отсортированы по слову, затем по позиции: целые слова уже идут в порядке записей
+        whole = self._positions[start:whole_end]
+        if end - whole_end > SCAN_THRESHOLD:
+            # Короткий префикс есть у большинства записей: проход по порядку быстро набирает limit
+            skip = set(whole)
+            rest = (position for position in range(len(self._items)) if position not in skip)
+        else:
+            rest = iter(sorted(set(self._positions[whole_end:end])))
+        found = []
+        for position in chain(whole, rest):
+            if self._matches(position, prefixes):
+                found.append(self._items[position])
+                if len(found) == limit:
+                    break
+        return found
@@ -1,6 +1,27 @@
 import datetime
+from collections.abc import Iterator
 
-from calendar_backend.models.db import Event, Group, Lecturer, Room
+from sqlalchemy import (
+    DateTime,
+    Integer,
+    Interval,
+    Select,
+    Subquery,
+    all_,
+    case,
+    cast,
+    func,
+    literal_column,
+    not_,
+    or_,
+    select,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import TSRANGE
+from sqlalchemy.orm import Query, Session
+
+from calendar_backend.exceptions import NotEnoughCriteria
+from calendar_backend.models.db import Event, EventsGroups, EventsLecturers, EventsRooms, Group, Lecturer, Room
 from calendar_backend.settings import get_settings
 
 
@@ -28,29 +49,161 @@ async def get_lessons_by_group_from_date(group: Group, date: datetime.date) -> l
     return events_from_date
 
 
-async def get_group_lessons_in_daterange(
-    group: Group, date_start: datetime.date, date_end: datetime.date
-) -> list[Event]:
-    events_list = []
-    for lesson in group.events:
-        if lesson.start_ts.date() >= date_start and lesson.end_ts.date() < date_end:
-            events_list.append(lesson)
-    return events_list
-
-
-async def get_room_lessons_in_daterange(room: Room, date_start: datetime.date, date_end: datetime.date) -> list[Event]:
-    events_list = []
-    for lesson in room.events:
-        if lesson.start_ts.date() >= date_start and lesson.end_ts.date() < date_end:
-            events_list.append(lesson)
-    return events_list
-
-
-async def get_lecturer_lessons_in_daterange(
-    lecturer: Lecturer, date_start: datetime.date, date_end: datetime.date
-) -> list[Event]:
-    events_list = []
-    for lesson in lecturer.events:
-        if lesson.start_ts.date() >= date_start and lesson.end_ts.date() < date_end:
-            events_list.append(lesson)
-    return events_list
+def series_starts(event: Event) -> Iterator[datetime.datetime]:
+    """Starts of all occurrences of series `event`, the ones in `exdates` included"""
+    step = datetime.timedelta(days=event.repeat_timedelta_days)
+    start = event.start_ts
+    while start <= event.repeat_until_ts:
+        yield start
+        start += step
+
+
+DAY = literal_column("INTERVAL '1 day'", Interval)
+
+
+def get_occurrences(
+    date_start: datetime.date, date_end: datetime.date, *criteria, with_deleted: bool = False
+) -> Subquery:
+    """
+    Occurrences in [date_start, date_end) of events matching `criteria` as (event_id, start_ts, end_ts):
+    single events as they are and series expanded with generate_series only inside the window
+    """
+    window_start, window_end = cast(date_start, DateTime), cast(date_end, DateTime)
+    single = select(Event.id.label("event_id"), Event.start_ts, Event.end_ts).where(
+        Event.repeat_timedelta_days.is_(None), Event.start_ts >= date_start, Event.end_ts < date_end
+    )
+    # Номера повторений, попадающих в окно: от первого не раньше date_start до последнего не позже repeat_until_ts
+    step_seconds = Event.repeat_timedelta_days * 86400
+    first = func.greatest(0, func.ceil(func.extract("epoch", window_start - Event.start_ts) / step_seconds))
+    last = func.floor(
+        func.extract("epoch", func.least(Event.repeat_until_ts, window_end) - Event.start_ts) / step_seconds
+    )
+    number = func.generate_series(cast(first, Integer), cast(last, Integer)).column_valued("number")
+    shift = number * Event.repeat_timedelta_days * DAY
+    series = select(
+        Event.id.label("event_id"), (Event.start_ts + shift).label("start_ts"), (Event.end_ts + shift).label("end_ts")
+    ).where(
+        Event.repeat_timedelta_days.is_not(None),
+        Event.start_ts < date_end,
+        Event.repeat_until_ts >= date_start,
+        Event.end_ts + shift < date_end,
+        Event.start_ts + shift != all_(Event.exdates),
+    )
+    if not with_deleted:
+        criteria += (not_(Event.is_deleted),)
+    # Условия повторяются в обеих ветках: через UNION ALL Postgres их не протолкнёт
+    return union_all(single.where(*criteria), series.where(*criteria)).subquery("occurrence")
+
+
+def _entity_criterion(group_id: int | None, lecturer_id: int | None, room_id: int | None):
+    if bool(group_id) + bool(lecturer_id) + bool(room_id) != 1:
+        raise NotEnoughCriteria("Exactly one argument group_id, lecturer_id or room_id required")
+    if group_id:
+        return Event.group.any(Group.id == group_id)
+    elif lecturer_id:
+        return Event.lecturer.any(Lecturer.id == lecturer_id)
+    return Event.room.any(Room.id == room_id)
+
+
+def get_timetable_query(
+    session: Session,
+    date_start: datetime.date,
+    date_end: datetime.date,
+    group_id: int | None = None,
+    lecturer_id: int | None = None,
+    room_id: int | None = None,
+    *,
+    with_deleted: bool = False,
+) -> tuple[Query, Subquery]:
+    """
+    Occurrences of events of exactly one group, lecturer or room in [date_start, date_end)
+
+    Returns query of (Event, start_ts, end_ts) rows and the occurrences subquery, whose `start_ts`
+    and `end_ts` columns are the times of the occurrence, not of the (series) event
+    """
+    criterion = _entity_criterion(group_id, lecturer_id, room_id)
+    occurrence = get_occurrences(date_start, date_end, criterion, with_deleted=with_deleted)
+    events = session.query(Event, occurrence.c.start_ts, occurrence.c.end_ts).join(
+        occurrence, occurrence.c.event_id == Event.id
+    )
+    return events, occurrence
+
+
+def get_timetable_select(
+    date_start: datetime.date,
+    date_end: datetime.date,
+    group_id: int | None = None,
+    lecturer_id: int | None = None,
+    room_id: int | None = None,
+    *,
+    with_deleted: bool = False,
+) -> tuple[Select, Subquery]:
+    """
+    Same as `get_timetable_query`, but as a statement for AsyncSession
+    """
+    criterion = _entity_criterion(group_id, lecturer_id, room_id)
+    occurrence = get_occurrences(date_start, date_end, criterion, with_deleted=with_deleted)
+    events = select(Event, occurrence.c.start_ts, occurrence.c.end_ts).join(
+        occurrence, occurrence.c.event_id == Event.id
+    )
+    return events, occurrence
+
+
+def get_timetable_batch_select(
+    date_start: datetime.date,
+    date_end: datetime.date,
+    group_ids: list[int] = (),
+    lecturer_ids: list[int] = (),
+    room_ids: list[int] = (),
+) -> tuple[Select, Subquery, Subquery]:
+    """
+    Same as `get_timetable_select` for events of any of the given groups, lecturers and rooms at once
+
+    Also returns the `timetable` subquery, which repeats an occurrence for every requested object it is
+    linked to with the `position` of that object: groups first, then lecturers and rooms, in the order of ids
+    """
+    requested = [
+        (relationship, model, link, column, list(dict.fromkeys(ids)))
+        for relationship, model, link, column, ids in (
+            (Event.group, Group, EventsGroups, EventsGroups.group_id, group_ids),
+            (Event.lecturer, Lecturer, EventsLecturers, EventsLecturers.lecturer_id, lecturer_ids),
+            (Event.room, Room, EventsRooms, EventsRooms.room_id, room_ids),
+        )
+        if ids
+    ]
+    if not requested:
+        raise NotEnoughCriteria("At least one group_id, lecturer_id or room_id required")
+    links, offset = [], 0
+    for _, _, link, column, ids in requested:
+        position = case({id: offset + number for number, id in enumerate(ids)}, value=column)
+        links.append(select(link.event_id, position.label("position")).where(column.in_(ids)))
+        offset += len(ids)
+    timetable = union_all(*links).subquery("timetable")
+    occurrence = get_occurrences(
+        date_start, date_end, or_(*(relationship.any(model.id.in_(ids)) for relationship, model, *_, ids in requested))
+    )
+    events = (
+        select(Event, occurrence.c.start_ts, occurrence.c.end_ts)
+        .join(occurrence, occurrence.c.event_id == Event.id)
+        .join(timetable, timetable.c.event_id == Event.id)
+    )
+    return events, occurrence, timetable
+
+
+def get_rooms_busy_select(start: datetime.datetime, end: datetime.datetime, room_ids: list[int]) -> Select:
+    """
+    (room_id, event_id, start_ts, end_ts) of occurrences in rooms `room_ids` overlapping [start, end)
+
+    Occurrences are expanded for whole days of the interval and one more day on each side, so that
+    lessons crossing midnight or ending at 00:00 after the interval are found too. `Event.span` lets
+    the GiST index skip events, single or series, that cannot overlap the interval at all
+    """
+    interval = func.tsrange(start, end, type_=TSRANGE)
+    day = datetime.timedelta(days=1)
+    occurrence = get_occurrences(start.date() - day, end.date() + 2 * day, Event.span.op("&&")(interval))
+    return (
+        select(EventsRooms.room_id, occurrence.c.event_id, occurrence.c.start_ts, occurrence.c.end_ts)
+        .join(EventsRooms, EventsRooms.event_id == occurrence.c.event_id)
+        .where(EventsRooms.room_id.in_(room_ids), occurrence.c.start_ts < end, occurrence.c.end_ts > start)
+        .order_by(EventsRooms.room_id, occurrence.c.start_ts, occurrence.c.event_id)
+    )
@@ -1,3 +1,4 @@
+from . import changes
 from .db import (
     ApproveStatuses,
     CommentEvent,
@@ -11,14 +12,17 @@ from .db import (
     EventUser,
     EventUserStatus,
     Group,
+    GroupWeek,
     Lecturer,
     Room,
 )
 
 
 __all__ = [
+    "changes",
     "Credentials",
     "Group",
+    "GroupWeek",
     "Lecturer",
     "Event",
     "Room",
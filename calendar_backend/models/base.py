@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 import re
+from collections.abc import Sequence
 from enum import Enum
 
-from sqlalchemy import Integer, not_
+from sqlalchemy import Integer, Select, not_, select
 from sqlalchemy.exc import NoResultFound
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.declarative import as_declarative, declared_attr
 from sqlalchemy.orm import Mapped, Query, Session, mapped_column
 
@@ -69,6 +71,33 @@ class BaseDbModel(DeclarativeBase):
         except NoResultFound:
             raise ObjectNotFound(cls, id)
 
+    @classmethod
+    def select_all(cls, *, with_deleted: bool = False, only_approved: bool = True) -> Select:
+        """Same as `get_all`, but as a statement for AsyncSession"""
+        objs = select(cls)
+        if not with_deleted and hasattr(cls, "is_deleted"):
+            objs = objs.where(not_(cls.is_deleted))
+        if only_approved and hasattr(cls, "approve_status"):
+            objs = objs.where(cls.approve_status == ApproveStatuses.APPROVED)
+        return objs
+
+    @classmethod
+    async def get_async(
+        cls,
+        id: int,
+        *,
+        with_deleted=False,
+        only_approved: bool = True,
+        options: Sequence = (),
+        session: AsyncSession,
+    ) -> BaseDbModel:
+        """Same as `get` for AsyncSession, relationships used later must be loaded through `options`"""
+        objs = cls.select_all(with_deleted=with_deleted, only_approved=only_approved)
+        obj = (await session.scalars(objs.where(cls.id == id).options(*options))).one_or_none()
+        if obj is None:
+            raise ObjectNotFound(cls, id)
+        return obj
+
     @classmethod
     def update(cls, id: int, *, session: Session, **kwargs) -> BaseDbModel:
         obj: cls = cls.get(id, only_approved=False, session=session)
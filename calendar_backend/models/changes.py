@@ -0,0 +1,128 @@
+"""Tracking of timetable changes
+
+Collects ids of groups, lecturers and rooms whose timetable was touched by a flush or
+by a bulk ORM statement and passes them to subscribers once the session commits.
+Events whose links or linked rooms, groups and lecturers changed get a fresh `update_ts`,
+so validators of conditional requests change as well.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from itertools import chain
+from typing import Callable
+
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from .db import Event, EventsGroups, EventsLecturers, EventsRooms, Group, Lecturer, Room
+
+
+logger = logging.getLogger(__name__)
+
+TimetableChanges = dict[str, set[int]]
+
+LINKS = {
+    "group": (EventsGroups, EventsGroups.group_id, Group),
+    "lecturer": (EventsLecturers, EventsLecturers.lecturer_id, Lecturer),
+    "room": (EventsRooms, EventsRooms.room_id, Room),
+}
+
+_subscribers: list[Callable[[TimetableChanges], None]] = []
+
+
+def subscribe(callback: Callable[[TimetableChanges], None]) -> Callable[[TimetableChanges], None]:
+    """Call `callback` with affected ids after every commit that changed the timetable"""
+    _subscribers.append(callback)
+    return callback
+
+
+def _pending(session: Session) -> TimetableChanges:
+    return session.info.setdefault("timetable_changes", {entity: set() for entity in LINKS})
+
+
+def _collect_linked(session: Session, event_ids) -> None:
+    """Add every group, lecturer and room linked to `event_ids` (a collection or a select of ids)"""
+    changes = _pending(session)
+    connection = session.connection()
+    for entity, (link, column, _) in LINKS.items():
+        query = select(column).where(link.event_id.in_(event_ids)).distinct()
+        changes[entity].update(connection.execute(query).scalars())
+
+
+def _touch(session: Session, event_ids) -> None:
+    """Bump `Event.update_ts` of events whose rendering changed without an UPDATE of their own row"""
+    session.connection().execute(
+        update(Event.__table__).where(Event.id.in_(event_ids)).values(update_ts=datetime.utcnow())
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, flush_context) -> None:
+    changes = _pending(session)
+    event_ids, touched = set(), set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Event):
+            event_ids.add(obj.id)
+            state = inspect(obj)
+            for entity in LINKS:
+                linked = state.attrs[entity].history.sum()
+                changes[entity].update(row.id for row in linked)
+                if linked and obj not in session.new:
+                    touched.add(obj.id)
+        for entity, (link, column, model) in LINKS.items():
+            if isinstance(obj, link):
+                changes[entity].add(getattr(obj, column.key))
+                event_ids.add(obj.event_id)
+                touched.add(obj.event_id)
+            elif isinstance(obj, model) and (
+                obj in session.deleted or session.is_modified(obj, include_collections=False)
+            ):
+                # Переименованная аудитория или преподаватель меняет все календари, где они встречаются
+                changes[entity].add(obj.id)
+                linked = select(link.event_id).where(column == obj.id)
+                _collect_linked(session, linked)
+                _touch(session, linked)
+    if event_ids:
+        _collect_linked(session, event_ids)
+    if touched:
+        _touch(session, touched)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _do_orm_execute(orm_execute_state: ORMExecuteState) -> None:
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+    session = orm_execute_state.session
+    if mapper.class_ is Event and (orm_execute_state.is_update or orm_execute_state.is_delete):
+        # До выполнения массового UPDATE находим затронутые события по тому же условию
+        event_ids = select(Event.id)
+        if orm_execute_state.statement.whereclause is not None:
+            event_ids = event_ids.where(orm_execute_state.statement.whereclause)
+        _collect_linked(session, event_ids)
+    elif orm_execute_state.is_insert:
+        for entity, (link, column, _) in LINKS.items():
+            if mapper.class_ is link:
+                parameters = orm_execute_state.parameters
+                rows = parameters if isinstance(parameters, list) else [parameters or {}]
+                _pending(session)[entity].update(row[column.key] for row in rows if column.key in row)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    changes = session.info.pop("timetable_changes", None)
+    if not changes or not any(changes.values()):
+        return
+    logger.debug(f"Timetable changed: {changes}")
+    for callback in _subscribers:
+        try:
+            callback(changes)
+        except Exception as e:
+            logger.error(f"Failed to deliver timetable changes to {callback}: {e}")
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _after_rollback(session: Session, previous_transaction) -> None:
+    session.info.pop("timetable_changes", None)
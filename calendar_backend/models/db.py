@@ -2,16 +2,63 @@
 
 from __future__ import annotations
 
-from datetime import datetime
+import re
+from datetime import date, datetime
 from enum import Enum
 
-from sqlalchemy import JSON, Boolean, DateTime
+from sqlalchemy import (
+    ARRAY,
+    JSON,
+    Boolean,
+    ColumnElement,
+    Computed,
+    Date,
+    DateTime,
+)
 from sqlalchemy import Enum as DbEnum
-from sqlalchemy import ForeignKey, Integer, String, Text, and_, or_, true
+from sqlalchemy import (
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    UniqueConstraint,
+    func,
+    literal_column,
+    text,
+    true,
+)
+from sqlalchemy.dialects.postgresql import TSRANGE, TSVECTOR, Range
 from sqlalchemy.ext.hybrid import hybrid_method, hybrid_property
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from .base import ApproveStatuses, BaseDbModel
+from .base import ApproveStatuses, BaseDbModel, DeclarativeBase
+
+
+# Время, которое занимают все повторения события: для серии -- до конца последнего возможного.
+# Закрытый справа диапазон: событие нулевой длины тоже пересекается с интервалом вокруг него
+EVENT_SPAN = "tsrange(start_ts, greatest(start_ts, end_ts, repeat_until_ts + (end_ts - start_ts)), '[]')"
+
+# Полное имя для поиска. Кириллица приводится к нижнему регистру и ё к е до to_tsvector:
+# lower() базы с локалью C кириллицу не меняет. Конфигурация simple только разбивает на слова
+SEARCH_DOCUMENT = (
+    "to_tsvector('simple', translate(last_name || ' ' || first_name || ' ' || middle_name, "
+    "'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯё', 'абвгдеежзийклмнопрстуфхцчшщъыьэюяе'))"
+)
+
+
+def search_words(text: str) -> list[str]:
+    """Words of `text` as the search compares them: lowercase, ё replaced by е"""
+    return re.findall(r"[^\W_]+", text.lower().replace("ё", "е"))
+
+
+def search_tsquery(query: str) -> ColumnElement | None:
+    """Text search query matching documents where every word of `query` starts some word"""
+    words = search_words(query)
+    if not words:
+        return None
+    return func.to_tsquery(literal_column("'simple'"), " & ".join(f"{word}:*" for word in words))
 
 
 class EventUserStatus(str, Enum):
@@ -57,9 +104,13 @@ class Room(BaseDbModel):
 
 
 class Lecturer(BaseDbModel):
+    __table_args__ = (Index("ix_lecturer_search", "search_vector", postgresql_using="gin"),)
+
     first_name: Mapped[str] = mapped_column(String, nullable=False)
     middle_name: Mapped[str] = mapped_column(String, nullable=False)
     last_name: Mapped[str] = mapped_column(String, nullable=False)
+    # Хранимая колонка: ни проверка найденных строк, ни ts_rank не пересчитывают to_tsvector
+    search_vector: Mapped[str] = mapped_column(TSVECTOR, Computed(SEARCH_DOCUMENT, persisted=True), deferred=True)
     avatar_id: Mapped[int] = mapped_column(Integer, ForeignKey("photo.id"), nullable=True)
     description: Mapped[str] = mapped_column(Text, nullable=True)
     is_deleted: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
@@ -93,13 +144,21 @@ class Lecturer(BaseDbModel):
 
     @hybrid_method
     def search(self, query: str) -> bool:
-        response = true
-        query = query.split(' ')
-        for q in query:
-            response = and_(
-                response, or_(self.first_name.contains(q), self.middle_name.contains(q), self.last_name.contains(q))
-            )
-        return response
+        """Every word of `query` starts a word of the full name, case and ё/е insensitive"""
+        words = search_words(f"{self.last_name} {self.first_name} {self.middle_name}")
+        return all(any(word.startswith(prefix) for word in words) for prefix in search_words(query))
+
+    @search.expression
+    @classmethod
+    def _search_expression(cls, query: str) -> ColumnElement[bool]:
+        tsquery = search_tsquery(query)
+        return true() if tsquery is None else cls.search_vector.bool_op("@@")(tsquery)
+
+    @classmethod
+    def search_rank(cls, query: str) -> ColumnElement[float]:
+        """Relevance of the lecturer to `query` for ordering search results"""
+        tsquery = search_tsquery(query)
+        return literal_column("0") if tsquery is None else func.ts_rank(cls.search_vector, tsquery)
 
     @hybrid_property
     def last_photo(self) -> Photo | None:
@@ -121,10 +180,41 @@ class Group(BaseDbModel):
 
 
 class Event(BaseDbModel):
+    __table_args__ = (
+        Index(
+            "ix_event_start_ts_end_ts",
+            "start_ts",
+            "end_ts",
+            postgresql_where=text("NOT is_deleted"),
+        ),
+        Index(
+            "ix_event_series_start_ts_repeat_until_ts",
+            "start_ts",
+            "repeat_until_ts",
+            postgresql_where=text("repeat_timedelta_days IS NOT NULL"),
+        ),
+        Index("ix_event_span", "span", postgresql_using="gist", postgresql_where=text("NOT is_deleted")),
+    )
+
     name: Mapped[str] = mapped_column(String, nullable=False)
     start_ts: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     end_ts: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     is_deleted: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    # Серия: событие повторяется каждые repeat_timedelta_days дней, пока начало не позже repeat_until_ts,
+    # кроме повторений, начинающихся в exdates. start_ts и end_ts серии -- её первое повторение
+    repeat_timedelta_days: Mapped[int] = mapped_column(Integer, nullable=True)
+    repeat_until_ts: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    exdates: Mapped[list[datetime]] = mapped_column(
+        ARRAY(DateTime), nullable=False, default=list, server_default=text("'{}'")
+    )
+    update_ts: Mapped[datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        server_default=text("timezone('utc', now())"),
+    )
+    span: Mapped[Range[datetime]] = mapped_column(TSRANGE, Computed(EVENT_SPAN, persisted=True), deferred=True)
 
     room: Mapped[list[Room]] = relationship(
         "Room",
@@ -153,20 +243,46 @@ class Event(BaseDbModel):
 
 
 class EventsLecturers(BaseDbModel):
+    __table_args__ = (
+        UniqueConstraint("lecturer_id", "event_id", name="uq_events_lecturers_lecturer_id_event_id"),
+        Index("ix_events_lecturers_event_id", "event_id"),
+    )
+
     event_id: Mapped[int] = mapped_column(Integer, ForeignKey("event.id"), nullable=False)
     lecturer_id: Mapped[int] = mapped_column(Integer, ForeignKey("lecturer.id"), nullable=False)
 
 
 class EventsRooms(BaseDbModel):
+    __table_args__ = (
+        UniqueConstraint("room_id", "event_id", name="uq_events_rooms_room_id_event_id"),
+        Index("ix_events_rooms_event_id", "event_id"),
+    )
+
     event_id: Mapped[int] = mapped_column(Integer, ForeignKey("event.id"), nullable=False)
     room_id: Mapped[int] = mapped_column(Integer, ForeignKey("room.id"), nullable=False)
 
 
 class EventsGroups(BaseDbModel):
+    __table_args__ = (
+        UniqueConstraint("group_id", "event_id", name="uq_events_groups_group_id_event_id"),
+        Index("ix_events_groups_event_id", "event_id"),
+    )
+
     event_id: Mapped[int] = mapped_column(Integer, ForeignKey("event.id"), nullable=False)
     group_id: Mapped[int] = mapped_column(Integer, ForeignKey("group.id"), nullable=False)
 
 
+class GroupWeek(DeclarativeBase):
+    """Rendered timetable of a group for one ISO week, dropped when the timetable of the group changes"""
+
+    group_id: Mapped[int] = mapped_column(Integer, ForeignKey("group.id", ondelete="CASCADE"), primary_key=True)
+    week: Mapped[date] = mapped_column(Date, primary_key=True)  # понедельник недели
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    update_ts: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    # Отпечаток справочников, с которыми отрендерена неделя
+    references_stamp: Mapped[str] = mapped_column(String, nullable=False)
+
+
 class Photo(BaseDbModel):
     lecturer_id: Mapped[int] = mapped_column(Integer, ForeignKey("lecturer.id"), nullable=False)
     link: Mapped[str] = mapped_column(String, unique=True, nullable=False)
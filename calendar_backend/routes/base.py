@@ -1,4 +1,5 @@
 import logging
+from contextlib import asynccontextmanager
 from textwrap import dedent
 
 import starlette.requests
@@ -6,7 +7,6 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi_sqlalchemy import DBSessionMiddleware
 from starlette import status
 from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 from starlette.requests import Request
@@ -14,6 +14,8 @@ from starlette.responses import Response
 from starlette.types import ASGIApp
 
 from calendar_backend import __version__
+from calendar_backend.cache import cache
+from calendar_backend.database import DBSessionMiddleware, async_engine, engine, read_engine
 from calendar_backend.exceptions import ForbiddenAction, NotEnoughCriteria, ObjectNotFound
 from calendar_backend.settings import get_settings
 
@@ -22,16 +24,32 @@ from .event.comment_review import router as event_comment_review_router
 from .event.event import router as event_router
 from .event.user_event import router as user_event_router
 from .group.group import router as group_router
+from .group.week import router as group_week_router
 from .lecturer.comment import router as lecturer_comment_router
 from .lecturer.comment_review import router as lecturer_comment_review_router
 from .lecturer.lecturer import router as lecturer_router
 from .lecturer.photo import router as lecturer_photo_router
 from .lecturer.photo_review import router as lecturer_photo_review_router
+from .metrics.metrics import router as metrics_router
 from .room.room import router as room_router
+from .search.search import router as search_router
 
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # В каждом воркере: поток подписки не переживает fork мастера gunicorn
+    cache.listen()
+    yield
+    cache.close()
+    await async_engine.dispose()
+    engine.dispose()
+    read_engine.dispose()
+
+
 app = FastAPI(
     title='Сервис расписания',
     description=dedent(
@@ -57,6 +75,7 @@ app = FastAPI(
     root_path=settings.ROOT_PATH if __version__ != 'dev' else '',
     docs_url=None if __version__ != 'dev' else '/docs',
     redoc_url=None,
+    lifespan=lifespan,
 )
 
 
@@ -102,11 +121,7 @@ class LimitUploadSize(BaseHTTPMiddleware):
         return await call_next(request)
 
 
-app.add_middleware(
-    DBSessionMiddleware,
-    db_url=str(settings.DB_DSN),
-    engine_args={"pool_pre_ping": True, "isolation_level": "AUTOCOMMIT"},
-)
+app.add_middleware(DBSessionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ALLOW_ORIGINS,
@@ -125,8 +140,11 @@ app.include_router(lecturer_comment_review_router)
 app.include_router(lecturer_photo_router)
 app.include_router(lecturer_photo_review_router)
 app.include_router(group_router)
+app.include_router(group_week_router)
 app.include_router(room_router)
 app.include_router(event_router)
 app.include_router(event_comment_router)
 app.include_router(event_comment_review_router)
 app.include_router(user_event_router)
+app.include_router(search_router)
+app.include_router(metrics_router)
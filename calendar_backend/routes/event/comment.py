@@ -1,8 +1,10 @@
 from auth_lib.fastapi import UnionAuth
 from fastapi import APIRouter, Depends
-from fastapi_sqlalchemy import db
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from calendar_backend.database import db, get_async_session
 from calendar_backend.exceptions import ForbiddenAction, ObjectNotFound
+from calendar_backend.methods.pagination import TotalMode, paginate
 from calendar_backend.models import ApproveStatuses
 from calendar_backend.models import CommentEvent as DbCommentEvent
 from calendar_backend.routes.models.event import CommentEventGet, EventCommentPatch, EventCommentPost, EventComments
@@ -36,8 +38,8 @@ async def update_comment(id: int, event_id: int, comment_inp: EventCommentPatch)
 
 
 @router.get("/{id}", response_model=CommentEventGet)
-async def get_comment(id: int, event_id: int) -> CommentEventGet:
-    comment = DbCommentEvent.get(id, session=db.session)
+async def get_comment(id: int, event_id: int, session: AsyncSession = Depends(get_async_session)) -> CommentEventGet:
+    comment = await DbCommentEvent.get_async(id, session=session)
     if not comment.event_id == event_id or comment.approve_status != ApproveStatuses.APPROVED:
         raise ObjectNotFound(DbCommentEvent, id)
     return CommentEventGet.model_validate(comment)
@@ -56,10 +58,15 @@ async def delete_comment(
 
 
 @router.get("/", response_model=EventComments)
-async def get_event_comments(event_id: int, limit: int = 10, offset: int = 0) -> EventComments:
-    res = DbCommentEvent.get_all(session=db.session).filter(DbCommentEvent.event_id == event_id)
-    if limit:
-        cnt, res = res.count(), res.offset(offset).limit(limit).all()
-    else:
-        cnt, res = res.count(), res.offset(offset).all()
-    return EventComments(**{"items": res, "limit": limit, "offset": offset, "total": cnt})
+async def get_event_comments(
+    event_id: int,
+    limit: int = 10,
+    offset: int = 0,
+    total: TotalMode = "exact",
+    session: AsyncSession = Depends(get_async_session),
+) -> EventComments:
+    res = DbCommentEvent.select_all().where(DbCommentEvent.event_id == event_id)
+    page = await paginate(session, res, limit, offset, total)
+    return EventComments(
+        **{"items": page.items, "limit": limit, "offset": offset, "total": page.total, "has_more": page.has_more}
+    )
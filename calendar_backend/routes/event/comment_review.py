@@ -2,9 +2,10 @@ from typing import Literal
 
 from auth_lib.fastapi import UnionAuth
 from fastapi import APIRouter, Depends
-from fastapi_sqlalchemy import db
 from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from calendar_backend.database import db, get_async_session
 from calendar_backend.exceptions import ObjectNotFound
 from calendar_backend.models import ApproveStatuses
 from calendar_backend.models import CommentEvent as DbCommentEvent
@@ -18,13 +19,17 @@ router = APIRouter(prefix="/event/{event_id}/comment", tags=["Event: Comment Rev
 
 @router.get("/review/", response_model=list[CommentEventGet])
 async def get_unreviewed_comments(
-    event_id: int, _=Depends(UnionAuth(scopes=["timetable.event.comment.review"]))
+    event_id: int,
+    _=Depends(UnionAuth(scopes=["timetable.event.comment.review"])),
+    session: AsyncSession = Depends(get_async_session),
 ) -> list[CommentEventGet]:
     comments = (
-        DbCommentEvent.get_all(session=db.session, only_approved=False)
-        .filter(DbCommentEvent.event_id == event_id, DbCommentEvent.approve_status == ApproveStatuses.PENDING)
-        .all()
-    )
+        await session.scalars(
+            DbCommentEvent.select_all(only_approved=False).where(
+                DbCommentEvent.event_id == event_id, DbCommentEvent.approve_status == ApproveStatuses.PENDING
+            )
+        )
+    ).all()
     adapter = TypeAdapter(list[CommentEventGet])
     return adapter.validate_python(comments)
 
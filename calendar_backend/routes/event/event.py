@@ -1,74 +1,154 @@
 import logging
-from datetime import date, timedelta
+from collections.abc import Iterator
+from datetime import date, datetime, time, timedelta
+from itertools import groupby
+from operator import attrgetter
 from typing import Literal
 
 from auth_lib.fastapi import UnionAuth
-from fastapi import APIRouter, Depends, Query, status
-from fastapi.responses import FileResponse, JSONResponse
-from fastapi_sqlalchemy import db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
-from calendar_backend.exceptions import NotEnoughCriteria
-from calendar_backend.methods import list_calendar
+from calendar_backend.cache import cache
+from calendar_backend.database import db, engine, get_async_session, read_engine
+from calendar_backend.exceptions import NotEnoughCriteria, ObjectNotFound
+from calendar_backend.methods import list_calendar, utils
+from calendar_backend.methods.conditional import is_not_modified, timetable_validator, validator_headers
+from calendar_backend.methods.event_import import expand_repeating, import_events, insert_events
+from calendar_backend.methods.pagination import TotalMode
 from calendar_backend.models import Event, Group, Lecturer, Room
 from calendar_backend.routes.models import EventGet
+from calendar_backend.routes.models.event import Event as EventItem
 from calendar_backend.routes.models.event import (
+    EventCompact,
     EventPatch,
     EventPatchName,
     EventPatchResult,
     EventPost,
     EventRepeatedPost,
+    EventSeriesGet,
+    EventSeriesPost,
+    EventsOf,
     GetListEvent,
+    GetListEventCompact,
 )
+from calendar_backend.routes.reference_cache import References, link_columns, reference_cache
+from calendar_backend.routes.timetable import get_timetable_page
 from calendar_backend.settings import get_settings
 
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/event", tags=["Event"])
+# Страницы со старыми справочниками больше не будут запрошены: их ETag содержит отпечаток справочников.
+# Хранилище общее, поэтому чистит его только воркер, изменивший справочники
+cache.subscribe("references", lambda _: cache.delete_prefix("page:"), local=True)
+BATCH_MAX_IDS = 100
+BATCH_MAX_DAYS = 31
+BATCH_YIELD_PER = 1000
 
 
-@router.get("/{id}", response_model=EventGet)
-async def get_event_by_id(id: int) -> EventGet:
-    return EventGet.model_validate(Event.get(id, session=db.session))
+async def _get_event(session: AsyncSession, id: int, *columns):
+    """
+    Event `id` with ids of its rooms, groups and lecturers, which are attached from the reference cache
+    """
+    row = (
+        await session.execute(
+            Event.select_all()
+            .with_only_columns(Event.id, Event.name, Event.start_ts, Event.end_ts, *columns, *link_columns())
+            .where(Event.id == id)
+        )
+    ).one_or_none()
+    if row is None:
+        raise ObjectNotFound(Event, id)
+    return row
 
 
-async def _get_timetable(start: date, end: date, group_id, lecturer_id, room_id, detail, limit, offset):
-    if bool(group_id) + bool(lecturer_id) + bool(room_id) != 1:
-        raise NotEnoughCriteria("Exactly one argument group_id, lecturer_id or room_id required")
-    events = Event.get_all(session=db.session).filter(
-        Event.start_ts >= start,
-        Event.end_ts < end,
+@router.get("/batch", response_model=EventsOf, summary="Timetables of many groups, lecturers and rooms")
+async def get_events_batch(
+    start: date | None = Query(default=None, description="Default: Today"),
+    end: date | None = Query(default=None, description="Default: Tomorrow"),
+    group_id: list[int] = Query(default=[]),
+    lecturer_id: list[int] = Query(default=[]),
+    room_id: list[int] = Query(default=[]),
+    view: Literal["full", "compact"] = "full",
+    session: AsyncSession = Depends(get_async_session),
+) -> StreamingResponse:
+    """
+    One query for all requested timetables, streamed as NDJSON: a line `EventsOf` per requested id,
+    groups first, then lecturers and rooms, in the order of the ids. The interval is at most
+    BATCH_MAX_DAYS long
+    """
+    requested = {"group": group_id, "lecturer": lecturer_id, "room": room_id}
+    if sum(len(ids) for ids in requested.values()) > BATCH_MAX_IDS:
+        raise NotEnoughCriteria(f"At most {BATCH_MAX_IDS} ids in one request")
+    start = start or date.today()
+    end = end or date.today() + timedelta(days=1)
+    if not start < end <= start + timedelta(days=BATCH_MAX_DAYS):
+        raise HTTPException(status_code=422, detail=f"Interval must be non-empty and at most {BATCH_MAX_DAYS} days")
+    events, occurrence, timetable = utils.get_timetable_batch_select(start, end, group_id, lecturer_id, room_id)
+    statement = events.with_only_columns(
+        timetable.c.position, Event.id, Event.name, occurrence.c.start_ts, occurrence.c.end_ts, *link_columns()
+    ).order_by(timetable.c.position, occurrence.c.start_ts, Event.id)
+    references = await reference_cache.get(session)
+    timetables = list(dict.fromkeys((entity, id) for entity, ids in requested.items() for id in ids))
+    return StreamingResponse(
+        _stream_batch(statement, timetables, references, compact=view == "compact"), media_type="application/x-ndjson"
     )
-    if group_id:
-        events = events.filter(Event.group.any(Group.id == group_id))
-    elif lecturer_id:
-        events = events.filter(Event.lecturer.any(Lecturer.id == lecturer_id))
-    elif room_id:
-        events = events.filter(Event.room.any(Room.id == room_id))
-    cnt = events.count()
-    if limit:
-        events = events.order_by(Event.start_ts).limit(limit).offset(offset).all()
-    else:
-        events = events.order_by(Event.start_ts).offset(offset).all()
-
-    fmt = {}
-    if detail and "comment" not in detail:
-        fmt["comments"] = ...
-    if detail and "description" not in detail:
-        fmt["lecturer"] = [
-            {
-                "avatar_id": ...,
-                "description": ...,
-                "is_deleted": ...,
-            }
+
+
+def _stream_batch(
+    statement, timetables: list[tuple[str, int]], references: References, compact: bool
+) -> Iterator[bytes]:
+    """
+    Yields a line `EventsOf` per requested timetable, reading rows ordered by `position` from a server-side cursor
+    """
+    item_model = EventCompact if compact else EventItem
+
+    def line(position: int, rows) -> bytes:
+        items = [
+            item_model.model_construct(
+                id=row.id,
+                name=row.name,
+                start_ts=row.start_ts,
+                end_ts=row.end_ts,
+                **references.links(row, compact=compact),
+            )
+            for row in rows
         ]
+        entity, id = timetables[position]
+        timetable = EventsOf.model_construct(type=entity, id=id, items=items)
+        return timetable.model_dump_json(exclude={"items": {"__all__": {"comments"}}}).encode() + b"\n"
 
-    return GetListEvent(items=events, limit=limit, offset=offset, total=cnt).model_dump(exclude=fmt)
+    # Сессия своя: сессия запроса закрывается раньше, чем отдан ответ
+    with Session(bind=read_engine) as session:
+        # Серверный курсор работает только внутри транзакции, а движок по умолчанию в AUTOCOMMIT
+        session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        rows = session.execute(statement.execution_options(yield_per=BATCH_YIELD_PER))
+        # Расписания без событий в выборку не попадают
+        empty = 0
+        for position, timetable_rows in groupby(rows, key=attrgetter("position")):
+            for skipped in range(empty, position):
+                yield line(skipped, ())
+            yield line(position, timetable_rows)
+            empty = position + 1
+    for skipped in range(empty, len(timetables)):
+        yield line(skipped, ())
 
 
-@router.get("/", response_model=GetListEvent | None)
+@router.get("/{id}", response_model=EventGet)
+async def get_event_by_id(id: int, session: AsyncSession = Depends(get_async_session)) -> EventGet:
+    row = await _get_event(session, id)
+    references = await reference_cache.get(session)
+    return EventGet(**row._mapping, **references.links(row))
+
+
+@router.get("/", response_model=GetListEvent | GetListEventCompact | None)
 async def get_events(
+    request: Request,
     start: date | None = Query(default=None, description="Default: Today"),
     end: date | None = Query(default=None, description="Default: Tomorrow"),
     group_id: int | None = None,
@@ -78,14 +158,51 @@ async def get_events(
     format: Literal["json", "ics"] = "json",
     limit: int = 100,
     offset: int = 0,
-) -> GetListEvent | FileResponse:
+    cursor: str | None = Query(default=None, description="next_cursor из предыдущей страницы, offset игнорируется"),
+    total: TotalMode = Query(default="exact", description="exact, estimate (оценка планировщика) или none"),
+    view: Literal["full", "compact"] = Query(default="full", description="compact: связи только с id и названием"),
+    session: AsyncSession = Depends(get_async_session),
+) -> GetListEvent | Response:
     start = start or date.today()
     end = end or date.today() + timedelta(days=1)
-    fmt_cases = {
-        "ics": lambda: list_calendar.create_ics(group_id, start, end, db.session),
-        "json": lambda: _get_timetable(start, end, group_id, lecturer_id, room_id, detail, limit, offset),
-    }
-    return await fmt_cases[format]()
+    with_comments = format == "json" and view == "full" and "comment" in (detail or ())
+    # Страница собирается из этих справочников, их отпечаток входит в ETag
+    references = await reference_cache.get(session)
+    etag, last_modified = await timetable_validator(
+        session,
+        start,
+        end,
+        group_id,
+        lecturer_id,
+        room_id,
+        format,
+        detail,
+        limit,
+        offset,
+        cursor,
+        total,
+        view,
+        references.stamp,
+        comments=with_comments,
+    )
+    headers = validator_headers(etag, last_modified)
+    if is_not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if format == "ics":
+        calendar = await list_calendar.create_ics(
+            start, end, session, read_engine, group_id, lecturer_id, room_id, primary=engine
+        )
+        calendar.headers.update(headers)
+        return calendar
+    # ETag учитывает все параметры, изменения событий и справочники, поэтому годится ключом кэша
+    key = f"page:{etag}"
+    content = cache.get(key)
+    if content is None:
+        content = await get_timetable_page(
+            session, start, end, group_id, lecturer_id, room_id, detail, limit, offset, cursor, total, view, references
+        )
+        cache.set(key, content, settings.TIMETABLE_CACHE_TTL)
+    return Response(content=content, media_type="application/json", headers=headers)
 
 
 @router.post("/", response_model=EventGet)
@@ -118,70 +235,58 @@ async def create_repeating_event(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={"detail": "Due to disk utilization limits, events with duration > 3 years is restricted"},
         )
-    events = []
+    created = insert_events(db.session, expand_repeating(event, timedelta(days=event.repeat_timedelta_days)))
+    db.session.commit()
+    adapter = TypeAdapter(list[EventGet])
+    return adapter.validate_python(created)
+
+
+@router.post("/series", response_model=EventSeriesGet)
+async def create_event_series(
+    event: EventSeriesPost, _=Depends(UnionAuth(scopes=["timetable.event.create"]))
+) -> EventSeriesGet:
+    if event.repeat_timedelta_days <= 0:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST, content={"detail": "Timedelta must be a positive integer"}
+        )
+    if event.repeat_until_ts < event.start_ts:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST, content={"detail": "Series must end after its first occurrence"}
+        )
     event_dict = event.model_dump()
     rooms = [Room.get(room_id, session=db.session) for room_id in event_dict.pop("room_id", [])]
     lecturers = [Lecturer.get(lecturer_id, session=db.session) for lecturer_id in event_dict.pop("lecturer_id", [])]
     groups = [Group.get(group_id, session=db.session) for group_id in event_dict.pop("group_id", [])]
-    repeat_timedelta_days = timedelta(days=event.repeat_timedelta_days)
-    cur_start_ts = event_dict["start_ts"]
-    cur_end_ts = event_dict["end_ts"]
-    while cur_start_ts <= event.repeat_until_ts:
-        event_get = Event.create(
-            name=event_dict["name"],
-            start_ts=cur_start_ts,
-            end_ts=cur_end_ts,
-            room=rooms,
-            lecturer=lecturers,
-            group=groups,
-            session=db.session,
-        )
-        events.append(event_get)
-        cur_start_ts += repeat_timedelta_days
-        cur_end_ts += repeat_timedelta_days
-    adapter = TypeAdapter(list[EventGet])
-    return adapter.validate_python(events)
+    event_get = Event.create(
+        **event_dict,
+        room=rooms,
+        lecturer=lecturers,
+        group=groups,
+        session=db.session,
+    )
+    db.session.commit()
+    return EventSeriesGet.model_validate(event_get)
+
+
+@router.get("/series/{id}", response_model=EventSeriesGet)
+async def get_event_series(id: int, session: AsyncSession = Depends(get_async_session)) -> EventSeriesGet:
+    row = await _get_event(session, id, Event.repeat_timedelta_days, Event.repeat_until_ts, Event.exdates)
+    if row.repeat_timedelta_days is None:
+        raise ObjectNotFound(Event, id)
+    references = await reference_cache.get(session)
+    return EventSeriesGet(**row._mapping, **references.links(row))
 
 
 @router.post("/bulk", response_model=list[EventGet])
 async def create_events(
-    events: list[EventPost], _=Depends(UnionAuth(scopes=["timetable.event.create"]))
+    events: list[EventPost], response: Response, _=Depends(UnionAuth(scopes=["timetable.event.create"]))
 ) -> list[EventGet]:
-    result = []
-    for event in events:
-        event_dict = event.model_dump()
-        existing_events_query = (
-            Event.get_all(session=db.session)
-            .filter(Event.name == event_dict.get("name"))
-            .filter(Event.start_ts == event_dict.get("start_ts"))
-            .filter(Event.end_ts == event_dict.get("end_ts"))
-        )
-        is_unique = True
-        for existing_event in existing_events_query.all():
-            if (
-                {column.id for column in existing_event.group} == set(event_dict["group_id"])
-                and {column.id for column in existing_event.room} == set(event_dict["room_id"])
-                and {column.id for column in existing_event.lecturer} == set(event_dict["lecturer_id"])
-            ):
-                is_unique = False
-        if is_unique:
-            rooms = [Room.get(room_id, session=db.session) for room_id in event_dict.pop("room_id", [])]
-            lecturers = [
-                Lecturer.get(lecturer_id, session=db.session) for lecturer_id in event_dict.pop("lecturer_id", [])
-            ]
-            groups = [Group.get(group_id, session=db.session) for group_id in event_dict.pop("group_id", [])]
-            result.append(
-                Event.create(
-                    **event_dict,
-                    room=rooms,
-                    lecturer=lecturers,
-                    group=groups,
-                    session=db.session,
-                )
-            )
+    imported = import_events(db.session, events)
     db.session.commit()
+    response.headers["X-Inserted-Count"] = str(len(imported.events))
+    response.headers["X-Skipped-Count"] = str(imported.skipped)
     adapter = TypeAdapter(list[EventGet])
-    return adapter.validate_python(result)
+    return adapter.validate_python(imported.events)
 
 
 @router.patch("/patch_name", response_model=EventPatchResult, summary="Batch update events by name")
@@ -199,14 +304,37 @@ async def patch_event_by_name(
 async def patch_event(
     id: int, event_inp: EventPatch, _=Depends(UnionAuth(scopes=["timetable.event.update"]))
 ) -> EventGet:
-    patched = Event.update(id, session=db.session, **event_inp.model_dump(exclude_unset=True))
+    fields = event_inp.model_dump(exclude_unset=True)
+    # У одиночного события нет повторений, которые эти поля могли бы описать
+    if (
+        fields.keys() & {"repeat_until_ts", "exdates"}
+        and Event.get(id, session=db.session).repeat_timedelta_days is None
+    ):
+        raise HTTPException(status_code=422, detail="repeat_until_ts and exdates can be set only for a series")
+    patched = Event.update(id, session=db.session, **fields)
     db.session.commit()
     return EventGet.model_validate(patched)
 
 
 @router.delete("/bulk", response_model=None)
 async def delete_events(start: date, end: date, _=Depends(UnionAuth(scopes=["timetable.event.delete"]))) -> None:
-    db.session.query(Event).filter(Event.start_ts >= start, Event.end_ts < end).update(values={"is_deleted": True})
+    db.session.query(Event).filter(
+        Event.repeat_timedelta_days.is_(None), Event.start_ts >= start, Event.end_ts < end
+    ).update(values={"is_deleted": True})
+    # У серии удаляются только повторения из интервала, вся серия -- когда других не осталось
+    window_start, window_end = datetime.combine(start, time()), datetime.combine(end, time())
+    series = db.session.scalars(
+        Event.select_all().where(
+            Event.repeat_timedelta_days.is_not(None), Event.start_ts < end, Event.repeat_until_ts >= start
+        )
+    )
+    for event in series:
+        starts = list(utils.series_starts(event))
+        duration = event.end_ts - event.start_ts
+        removed = [ts for ts in starts if window_start <= ts and ts + duration < window_end and ts not in event.exdates]
+        if removed:
+            event.exdates = event.exdates + removed
+            event.is_deleted = set(starts) <= set(event.exdates)
     db.session.commit()
 
 
@@ -1,7 +1,7 @@
 from auth_lib.fastapi import UnionAuth
 from fastapi import APIRouter, Depends, Query
-from fastapi_sqlalchemy import db
 
+from calendar_backend.database import db
 from calendar_backend.models import Event, EventUser
 from calendar_backend.routes.models.visit import VisitResponse
 
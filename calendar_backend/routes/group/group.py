@@ -2,10 +2,16 @@ import logging
 
 from auth_lib.fastapi import UnionAuth
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi_sqlalchemy import db
+from sqlalchemy import not_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from calendar_backend.database import db, get_async_session
+from calendar_backend.exceptions import ObjectNotFound
+from calendar_backend.methods.pagination import paginate
 from calendar_backend.models import Group
 from calendar_backend.routes.models import GetListGroup, GroupGet, GroupPatch, GroupPost
+from calendar_backend.routes.reference_cache import load_groups, reference_cache, with_uncached
+from calendar_backend.routes.response import ModelResponse
 from calendar_backend.settings import get_settings
 
 
@@ -15,24 +21,24 @@ router = APIRouter(prefix="/group", tags=["Group"])
 
 
 @router.get("/{id}", response_model=GroupGet)
-async def get_group_by_id(id: int) -> GroupGet:
-    return GroupGet.model_validate(Group.get(id, session=db.session))
+async def get_group_by_id(id: int, session: AsyncSession = Depends(get_async_session)) -> GroupGet:
+    groups = await with_uncached(session, (await reference_cache.get(session)).groups, [id], load_groups)
+    if id not in groups:
+        raise ObjectNotFound(Group, id)
+    return groups[id]
 
 
 @router.get("/", response_model=GetListGroup)
-async def get_groups(query: str = "", limit: int = 10, offset: int = 0) -> GetListGroup:
-    res = Group.get_all(session=db.session).filter(Group.number.contains(query))
-    if limit:
-        cnt, res = res.count(), res.offset(offset).limit(limit).all()
-    else:
-        cnt, res = res.count(), res.offset(offset).all()
-    return GetListGroup(
-        **{
-            "items": res,
-            "limit": limit,
-            "offset": offset,
-            "total": cnt,
-        }
+async def get_groups(
+    query: str = "", limit: int = 10, offset: int = 0, session: AsyncSession = Depends(get_async_session)
+) -> ModelResponse:
+    # Отбор и страница -- в базе, сами группы берутся из кэша
+    ids = select(Group.id).where(not_(Group.is_deleted), Group.number.contains(query, autoescape=True))
+    page = await paginate(session, ids.order_by(Group.id), limit, offset)
+    groups = await with_uncached(session, (await reference_cache.get(session)).groups, page.items, load_groups)
+    res = [groups[id] for id in page.items if id in groups]
+    return ModelResponse(
+        GetListGroup.model_construct(items=res, limit=limit, offset=offset, total=page.total, has_more=page.has_more)
     )
 
 
@@ -0,0 +1,101 @@
+"""Timetable of a group for one ISO week, stored rendered
+
+Most students ask for this week of their group. The rendered page is kept in `group_week` by
+`(group_id, week)`, so serving it is one primary key lookup. A commit that changes the timetable
+drops the stored weeks of the affected groups only; the next request renders the week again.
+A week is stored only if the primary still has the events the replica rendered it from, and is
+served only with the same references (groups, rooms, lecturers) it was rendered with.
+GROUP_WEEK_TTL bounds how long a week can stay stale if something still slips through.
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from sqlalchemy import delete, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from calendar_backend.database import engine, get_async_session
+from calendar_backend.exceptions import ObjectNotFound
+from calendar_backend.methods.conditional import timetable_state
+from calendar_backend.models import Group, GroupWeek, changes
+from calendar_backend.routes.models import GetListEvent
+from calendar_backend.routes.reference_cache import reference_cache
+from calendar_backend.routes.timetable import get_timetable_page
+from calendar_backend.settings import get_settings
+
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/group/{group_id}/week", tags=["Group"])
+
+
+def week_start(iso_week: str) -> date:
+    """Monday of ISO week `YYYY-Www`"""
+    year, week = iso_week.split("-W")
+    try:
+        return date.fromisocalendar(int(year), int(week), 1)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"No week {iso_week}")
+
+
+@router.get("/{iso_week}", response_model=GetListEvent)
+async def get_group_week(
+    group_id: int,
+    iso_week: str = Path(pattern=r"^\d{4}-W\d{2}$", description="ISO неделя, например 2024-W36"),
+    session: AsyncSession = Depends(get_async_session),
+) -> Response:
+    week = week_start(iso_week)
+    end = week + timedelta(days=7)
+    references = await reference_cache.get(session)
+    stored = await session.get(GroupWeek, (group_id, week))
+    if (
+        stored
+        and stored.references_stamp == references.stamp
+        and datetime.utcnow() - stored.update_ts < timedelta(seconds=settings.GROUP_WEEK_TTL)
+    ):
+        return Response(content=stored.payload, media_type="application/json")
+    if group_id not in references.groups:
+        raise ObjectNotFound(Group, group_id)
+    state = timetable_state(week, end, group_id, None, None)
+    count, last_modified = (await session.execute(state)).one()
+    payload = await get_timetable_page(session, week, end, group_id, None, None, None, 0, 0, references=references)
+    # Запись в основную базу одним запросом и только если события недели там те же, что видела реплика:
+    # иначе изменение, закоммиченное во время рендера, уже удалило неделю, и записывать её нельзя
+    primary = state.subquery("state")
+    row = {
+        "group_id": group_id,
+        "week": week,
+        "payload": payload,
+        "update_ts": datetime.utcnow(),
+        "references_stamp": references.stamp,
+    }
+    rendered = select(*(literal(value, GroupWeek.__table__.c[key].type).label(key) for key, value in row.items()))
+    statement = insert(GroupWeek).from_select(
+        list(row),
+        rendered.where(primary.c.count == count, primary.c.last_modified.is_not_distinct_from(last_modified)),
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[GroupWeek.group_id, GroupWeek.week],
+        set_={key: statement.excluded[key] for key in ("payload", "update_ts", "references_stamp")},
+    )
+    # Блокирующий драйвер основной базы -- в пуле потоков, не в цикле событий
+    await run_in_threadpool(_store, statement)
+    return Response(content=payload, media_type="application/json")
+
+
+def _store(statement) -> None:
+    with engine.begin() as connection:
+        connection.execute(statement)
+
+
+@changes.subscribe
+def _drop_changed_groups(timetable_changes: changes.TimetableChanges) -> None:
+    if not timetable_changes["group"]:
+        return
+    # Коммит уже сохранён: недели удаляются отдельной транзакцией и только у затронутых групп
+    with engine.begin() as connection:
+        connection.execute(delete(GroupWeek).where(GroupWeek.group_id.in_(timetable_changes["group"])))
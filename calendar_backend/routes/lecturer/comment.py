@@ -1,8 +1,10 @@
 from auth_lib.fastapi import UnionAuth
 from fastapi import APIRouter, Depends
-from fastapi_sqlalchemy import db
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from calendar_backend.database import db, get_async_session
 from calendar_backend.exceptions import ForbiddenAction, ObjectNotFound
+from calendar_backend.methods.pagination import TotalMode, paginate
 from calendar_backend.models.db import ApproveStatuses
 from calendar_backend.models.db import CommentLecturer as DbCommentLecturer
 from calendar_backend.routes.models import CommentLecturer, LecturerCommentPatch, LecturerCommentPost, LecturerComments
@@ -52,8 +54,8 @@ async def delete_comment(
 
 
 @router.get("/comment/{id}", response_model=CommentLecturer)
-async def get_comment(id: int, lecturer_id: int) -> CommentLecturer:
-    comment = DbCommentLecturer.get(id, session=db.session)
+async def get_comment(id: int, lecturer_id: int, session: AsyncSession = Depends(get_async_session)) -> CommentLecturer:
+    comment = await DbCommentLecturer.get_async(id, session=session)
     if not comment.lecturer_id == lecturer_id:
         raise ObjectNotFound(DbCommentLecturer, id)
     if comment.approve_status is not None:
@@ -62,10 +64,15 @@ async def get_comment(id: int, lecturer_id: int) -> CommentLecturer:
 
 
 @router.get("/comment/", response_model=LecturerComments)
-async def get_all_lecturer_comments(lecturer_id: int, limit: int = 10, offset: int = 0) -> LecturerComments:
-    res = DbCommentLecturer.get_all(session=db.session).filter(DbCommentLecturer.lecturer_id == lecturer_id)
-    if limit:
-        cnt, res = res.count(), res.offset(offset).limit(limit).all()
-    else:
-        cnt, res = res.count(), res.offset(offset).all()
-    return LecturerComments(**{"items": res, "limit": limit, "offset": offset, "total": cnt})
+async def get_all_lecturer_comments(
+    lecturer_id: int,
+    limit: int = 10,
+    offset: int = 0,
+    total: TotalMode = "exact",
+    session: AsyncSession = Depends(get_async_session),
+) -> LecturerComments:
+    res = DbCommentLecturer.select_all().where(DbCommentLecturer.lecturer_id == lecturer_id)
+    page = await paginate(session, res, limit, offset, total)
+    return LecturerComments(
+        **{"items": page.items, "limit": limit, "offset": offset, "total": page.total, "has_more": page.has_more}
+    )
@@ -2,9 +2,10 @@ from typing import Literal
 
 from auth_lib.fastapi import UnionAuth
 from fastapi import APIRouter, Depends
-from fastapi_sqlalchemy import db
 from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from calendar_backend.database import db, get_async_session
 from calendar_backend.exceptions import ObjectNotFound
 from calendar_backend.models.db import ApproveStatuses
 from calendar_backend.models.db import CommentLecturer as DbCommentLecturer
@@ -16,15 +17,18 @@ router = APIRouter(prefix="/lecturer/{lecturer_id}/comment", tags=["Lecturer: Co
 
 @router.get("/review/", response_model=list[CommentLecturer])
 async def get_unreviewed_comments(
-    lecturer_id: int, _=Depends(UnionAuth(scopes=["timetable.lecturer.comment.review"]))
+    lecturer_id: int,
+    _=Depends(UnionAuth(scopes=["timetable.lecturer.comment.review"])),
+    session: AsyncSession = Depends(get_async_session),
 ) -> list[CommentLecturer]:
     comments = (
-        DbCommentLecturer.get_all(session=db.session, only_approved=False)
-        .filter(
-            DbCommentLecturer.lecturer_id == lecturer_id, DbCommentLecturer.approve_status == ApproveStatuses.PENDING
+        await session.scalars(
+            DbCommentLecturer.select_all(only_approved=False).where(
+                DbCommentLecturer.lecturer_id == lecturer_id,
+                DbCommentLecturer.approve_status == ApproveStatuses.PENDING,
+            )
         )
-        .all()
-    )
+    ).all()
     adapter = TypeAdapter(list[CommentLecturer])
     return adapter.validate_python(comments)
 
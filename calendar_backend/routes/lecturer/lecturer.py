@@ -1,16 +1,20 @@
 import logging
-from typing import Any, Literal
+from typing import Literal
 
 from auth_lib.fastapi import UnionAuth
 from fastapi import APIRouter, Depends
-from fastapi_sqlalchemy import db
-from sqlalchemy.orm import Query, joinedload
+from sqlalchemy import Select, not_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from calendar_backend.database import db, get_async_session
 from calendar_backend.exceptions import ObjectNotFound
 from calendar_backend.methods.image import get_photo_webpath
+from calendar_backend.methods.pagination import TotalMode, paginate
 from calendar_backend.models.db import ApproveStatuses, Lecturer
 from calendar_backend.models.db import Photo as DbPhoto
 from calendar_backend.routes.models import GetListLecturer, LecturerGet, LecturerPatch, LecturerPost
+from calendar_backend.routes.reference_cache import load_lecturers, reference_cache, with_uncached
+from calendar_backend.routes.response import ModelResponse
 from calendar_backend.settings import get_settings
 
 
@@ -20,12 +24,11 @@ router = APIRouter(prefix="/lecturer", tags=["Lecturer"])
 
 
 @router.get("/{id}", response_model=LecturerGet)
-async def get_lecturer_by_id(id: int) -> LecturerGet:
-    lecturer = Lecturer.get(id, session=db.session)
-    result = LecturerGet.model_validate(Lecturer.get(id, session=db.session))
-    if lecturer.avatar_id:
-        result.avatar_link = get_photo_webpath(lecturer.avatar.link)
-    return result
+async def get_lecturer_by_id(id: int, session: AsyncSession = Depends(get_async_session)) -> LecturerGet:
+    lecturers = await with_uncached(session, (await reference_cache.get(session)).lecturers, [id], load_lecturers)
+    if id not in lecturers:
+        raise ObjectNotFound(Lecturer, id)
+    return lecturers[id]
 
 
 @router.get("/", response_model=GetListLecturer)
@@ -34,31 +37,27 @@ async def get_lecturers(
     limit: int = 10,
     offset: int = 0,
     order_by: Literal['first_name', 'last_name'] | None = None,
-) -> dict[str, Any]:
-    query: Query = Lecturer.get_all(session=db.session).filter(Lecturer.search(query))
-    query = query.options(joinedload(Lecturer.avatar))  # Сразу загружаем аватарки
+    total: TotalMode = "exact",
+    session: AsyncSession = Depends(get_async_session),
+) -> ModelResponse:
+    # Поиск и сортировка по правилам сравнения базы, сами преподаватели берутся из кэша
+    search = query
+    query: Select = select(Lecturer.id).where(not_(Lecturer.is_deleted), Lecturer.search(search))
     if order_by:
-        query = query.order_by(order_by)
-    query = query.order_by('id')
-    if limit:
-        cnt, query = query.count(), query.offset(offset).limit(limit)
-    else:
-        cnt, query = query.count(), query.offset(offset)
-    query = query.all()
-    logger.debug(query)
+        query = query.order_by(getattr(Lecturer, order_by))
+    elif search:
+        query = query.order_by(Lecturer.search_rank(search).desc())
+    query = query.order_by(Lecturer.id)
+    page = await paginate(session, query, limit, offset, total)
+    logger.debug(page.items)
 
-    result = []
-    for row in query:
-        row_get = LecturerGet.model_validate(row)
-        if row.avatar:
-            row_get.avatar_link = get_photo_webpath(row.avatar.link)
-        result.append(row_get)
-    return {
-        "items": result,
-        "limit": limit,
-        "offset": offset,
-        "total": cnt,
-    }
+    lecturers = await with_uncached(session, (await reference_cache.get(session)).lecturers, page.items, load_lecturers)
+    result = [lecturers[id] for id in page.items if id in lecturers]
+    return ModelResponse(
+        GetListLecturer.model_construct(
+            items=result, limit=limit, offset=offset, total=page.total, has_more=page.has_more
+        )
+    )
 
 
 @router.post("/", response_model=LecturerGet)
@@ -1,9 +1,11 @@
 from auth_lib.fastapi import UnionAuth
 from fastapi import APIRouter, Depends, File, UploadFile
-from fastapi_sqlalchemy import db
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from calendar_backend.database import db, get_async_session
 from calendar_backend.exceptions import ObjectNotFound
 from calendar_backend.methods.image import get_photo_webpath, upload_lecturer_photo
+from calendar_backend.methods.pagination import TotalMode, paginate
 from calendar_backend.models.db import ApproveStatuses, Lecturer
 from calendar_backend.models.db import Photo as DbPhoto
 from calendar_backend.routes.models import LecturerPhotos, Photo
@@ -38,19 +40,22 @@ async def upload_photo(
 
 
 @router.get("/photo", response_model=LecturerPhotos)
-async def get_lecturer_photos(lecturer_id: int, limit: int = 10, offset: int = 0) -> LecturerPhotos:
-    if not Lecturer.get(id=lecturer_id, session=db.session):
-        raise ObjectNotFound(Lecturer, lecturer_id)
-    res = DbPhoto.get_all(session=db.session).filter(DbPhoto.lecturer_id == lecturer_id)
-    if limit:
-        cnt, res = res.count(), res.offset(offset).limit(limit).all()
-    else:
-        cnt, res = res.count(), res.offset(offset).all()
+async def get_lecturer_photos(
+    lecturer_id: int,
+    limit: int = 10,
+    offset: int = 0,
+    total: TotalMode = "exact",
+    session: AsyncSession = Depends(get_async_session),
+) -> LecturerPhotos:
+    await Lecturer.get_async(lecturer_id, session=session)
+    res = DbPhoto.select_all().where(DbPhoto.lecturer_id == lecturer_id)
+    page = await paginate(session, res, limit, offset, total)
     return LecturerPhotos(
-        items=[get_photo_webpath(row.link) for row in res],
+        items=[get_photo_webpath(row.link) for row in page.items],
         limit=limit,
         offset=offset,
-        total=cnt,
+        total=page.total,
+        has_more=page.has_more,
     )
 
 
@@ -71,10 +76,9 @@ async def delete_photo(
 
 
 @router.get("/photo/{id}", response_model=Photo)
-async def get_photo(id: int, lecturer_id: int) -> Photo:
-    if not Lecturer.get(id=lecturer_id, session=db.session):
-        raise ObjectNotFound(Lecturer, lecturer_id)
-    photo = DbPhoto.get(id, session=db.session)
+async def get_photo(id: int, lecturer_id: int, session: AsyncSession = Depends(get_async_session)) -> Photo:
+    await Lecturer.get_async(lecturer_id, session=session)
+    photo = await DbPhoto.get_async(id, session=session)
     if photo.lecturer_id != lecturer_id or photo.approve_status != ApproveStatuses.APPROVED:
         raise ObjectNotFound(DbPhoto, id)
     return Photo.model_validate(photo)
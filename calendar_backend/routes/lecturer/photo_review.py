@@ -2,10 +2,12 @@ from typing import Literal
 
 from auth_lib.fastapi import UnionAuth
 from fastapi import APIRouter, Depends
-from fastapi_sqlalchemy import db
-from sqlalchemy.orm import Query
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from calendar_backend.database import db, get_async_session
 from calendar_backend.methods.image import get_photo_webpath
+from calendar_backend.methods.pagination import TotalMode, paginate
 from calendar_backend.models.db import ApproveStatuses
 from calendar_backend.models.db import Photo as DbPhoto
 from calendar_backend.routes.models import Action, Photo
@@ -25,7 +27,8 @@ class PhotoListResponse(BaseSchema):
     items: list[Photo]
     limit: int
     offset: int
-    total: int
+    total: int | None  # None with total=none
+    has_more: bool = False
 
 
 @router.get("", response_model=PhotoListResponse)
@@ -34,23 +37,21 @@ async def get_unreviewed_photos(
     offset: int = 0,
     order_by: Literal['lecturer_id'] | None = None,
     lecturer_id: int = None,
+    total: TotalMode = "exact",
     _=Depends(UnionAuth(scopes=["timetable.lecturer.photo.review"])),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    query: Query = DbPhoto.get_all(session=db.session, only_approved=False)
-    query = query.filter(DbPhoto.approve_status == ApproveStatuses.PENDING)
+    query: Select = DbPhoto.select_all(only_approved=False)
+    query = query.where(DbPhoto.approve_status == ApproveStatuses.PENDING)
     if lecturer_id:
-        query = query.filter(DbPhoto.lecturer_id == lecturer_id)
+        query = query.where(DbPhoto.lecturer_id == lecturer_id)
     if order_by:
-        query = query.order_by(order_by)
-    query = query.order_by('id')
-    if limit:
-        cnt, query = query.count(), query.offset(offset).limit(limit)
-    else:
-        cnt, query = query.count(), query.offset(offset)
-    query = query.all()
+        query = query.order_by(getattr(DbPhoto, order_by))
+    query = query.order_by(DbPhoto.id)
+    page = await paginate(session, query, limit, offset, total)
 
     result = []
-    for row in query:
+    for row in page.items:
         get_row = Photo.model_validate(row)
         get_row.link = get_photo_webpath(row.link)
         result.append(get_row)
@@ -59,7 +60,8 @@ async def get_unreviewed_photos(
         items=result,
         limit=limit,
         offset=offset,
-        total=cnt,
+        total=page.total,
+        has_more=page.has_more,
     )
 
 
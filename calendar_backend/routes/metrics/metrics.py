@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+
+from calendar_backend.database import pools_stats
+from calendar_backend.methods.calendar_cache import calendar_cache
+from calendar_backend.routes.models.metrics import Metrics
+from calendar_backend.routes.reference_cache import reference_cache
+
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("/", response_model=Metrics)
+async def get_metrics() -> Metrics:
+    """
+    Counters of this worker: connection pools (occupancy and checkout waits), .ics and reference caches
+    """
+    return Metrics(db_pool=pools_stats(), ics_cache=calendar_cache.stats(), reference_cache=reference_cache.stats())
@@ -1,6 +1,7 @@
 import datetime
+from typing import Literal
 
-from .base import Base, CommentEventGet, GroupGet, LecturerGet, RoomGet
+from .base import Base, CommentEventGet, EventGet, GroupGet, LecturerGet, RoomGet
 
 
 class EventPatch(Base):
@@ -10,6 +11,8 @@ class EventPatch(Base):
     lecturer_id: list[int] | None = None
     start_ts: datetime.datetime | None = None
     end_ts: datetime.datetime | None = None
+    repeat_until_ts: datetime.datetime | None = None
+    exdates: list[datetime.datetime] = []
 
     def __repr__(self):
         return (
@@ -65,6 +68,16 @@ class EventRepeatedPost(Base):
         )
 
 
+class EventSeriesPost(EventRepeatedPost):
+    exdates: list[datetime.datetime] = []
+
+
+class EventSeriesGet(EventGet):
+    repeat_timedelta_days: int
+    repeat_until_ts: datetime.datetime
+    exdates: list[datetime.datetime]
+
+
 class Event(Base):
     id: int
     name: str
@@ -73,13 +86,45 @@ class Event(Base):
     lecturer: list[LecturerGet]
     start_ts: datetime.datetime
     end_ts: datetime.datetime
+    comments: list[CommentEventGet] = []  # only with detail=comment
 
 
 class GetListEvent(Base):
     items: list[Event]
     limit: int
     offset: int
-    total: int
+    total: int | None  # None with total=none
+    has_more: bool = False
+    next_cursor: str | None = None
+
+
+class EventLink(Base):
+    """Room, group or lecturer of an event in the compact view: its id and what the timetable shows"""
+
+    id: int
+    name: str
+
+
+class EventCompact(Base):
+    id: int
+    name: str
+    room: list[EventLink]
+    group: list[EventLink]
+    lecturer: list[EventLink]
+    start_ts: datetime.datetime
+    end_ts: datetime.datetime
+
+
+class GetListEventCompact(GetListEvent):
+    items: list[EventCompact]
+
+
+class EventsOf(Base):
+    """Timetable of one group, lecturer or room, a line of the batch response"""
+
+    type: Literal["group", "lecturer", "room"]
+    id: int
+    items: list[Event] | list[EventCompact]
 
 
 class EventCommentPost(Base):
@@ -96,4 +141,5 @@ class EventComments(Base):
     items: list[CommentEventGet]
     limit: int
     offset: int
-    total: int
+    total: int | None  # None with total=none
+    has_more: bool = False
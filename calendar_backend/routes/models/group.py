@@ -46,6 +46,7 @@ class GetListGroup(Base):
     limit: int
     offset: int
     total: int
+    has_more: bool = False
 
 
 class GroupEvents(GroupGet):
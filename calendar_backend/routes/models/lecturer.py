@@ -7,7 +7,8 @@ class LecturerPhotos(Base):
     items: list[str]
     limit: int
     offset: int
-    total: int
+    total: int | None  # None with total=none
+    has_more: bool = False
 
 
 class LecturerPatch(Base):
@@ -35,7 +36,8 @@ class GetListLecturer(Base):
     items: list[LecturerGet]
     limit: int
     offset: int
-    total: int
+    total: int | None  # None with total=none
+    has_more: bool = False
 
 
 class Photo(Base):
@@ -62,7 +64,8 @@ class LecturerComments(Base):
     items: list[CommentLecturer]
     limit: int
     offset: int
-    total: int
+    total: int | None  # None with total=none
+    has_more: bool = False
 
 
 class Action(Base):
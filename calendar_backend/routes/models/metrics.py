@@ -0,0 +1,35 @@
+from .base import Base
+
+
+class PoolMetrics(Base):
+    size: int
+    checked_out: int
+    overflow: int
+    checkouts: int
+    timeouts: int
+    wait_total_seconds: float
+    wait_max_seconds: float
+
+
+class DbPoolsMetrics(Base):
+    blocking: PoolMetrics
+    asyncpg: PoolMetrics
+    blocking_read: PoolMetrics | None = None  # only with DB_READ_DSN
+
+
+class IcsCacheMetrics(Base):
+    hits: int
+    disk_hits: int
+    misses: int
+
+
+class ReferenceCacheMetrics(Base):
+    version: int
+    hits: int
+    loads: int
+
+
+class Metrics(Base):
+    db_pool: DbPoolsMetrics
+    ics_cache: IcsCacheMetrics
+    reference_cache: ReferenceCacheMetrics
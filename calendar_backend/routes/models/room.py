@@ -1,3 +1,5 @@
+import datetime
+
 from calendar_backend.models import Direction
 
 from .base import Base, EventGet, RoomGet
@@ -29,3 +31,15 @@ class GetListRoom(Base):
     limit: int
     offset: int
     total: int
+    has_more: bool = False
+
+
+class BusyInterval(Base):
+    event_id: int
+    start_ts: datetime.datetime
+    end_ts: datetime.datetime
+
+
+class RoomBusy(Base):
+    id: int
+    busy: list[BusyInterval]
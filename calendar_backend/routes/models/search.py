@@ -0,0 +1,13 @@
+from typing import Literal
+
+from .base import Base
+
+
+class Suggestion(Base):
+    type: Literal["group", "room", "lecturer"]
+    id: int
+    title: str
+
+
+class GetListSuggestion(Base):
+    items: list[Suggestion]
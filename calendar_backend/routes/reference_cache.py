@@ -0,0 +1,276 @@
+"""Groups, rooms and lecturers served from memory
+
+They change a few times per semester, but every timetable page needs them. The cache keeps
+ready `GroupGet`, `RoomGet` and `LecturerGet` of all of them in the memory of the worker and,
+serialized, in the service cache, so a worker reloading them usually skips the database.
+A commit that changed one of them drops both in every worker; REFERENCE_CACHE_TTL bounds
+how long a lost invalidation message can keep them stale. The stamp of the references is a part
+of the timetable ETag, so a stale worker never serves old names under the current ETag.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from collections.abc import Collection, Iterable
+from itertools import chain
+from typing import NamedTuple, TypeVar
+
+from sqlalchemy import Select, event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+
+from calendar_backend.cache import CacheBackend, cache
+from calendar_backend.methods.image import get_photo_webpath
+from calendar_backend.methods.suggest import PrefixIndex
+from calendar_backend.models import Event, EventsGroups, EventsLecturers, EventsRooms, Group, Lecturer, Room
+from calendar_backend.models.db import Photo
+from calendar_backend.settings import get_settings
+
+from .models import GroupGet, LecturerGet, RoomGet
+from .models.base import Base
+from .models.event import EventLink
+from .models.search import Suggestion
+
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Поле события, таблица связи и колонка с id связанного объекта
+LINKS = (
+    ("room", EventsRooms, EventsRooms.room_id),
+    ("group", EventsGroups, EventsGroups.group_id),
+    ("lecturer", EventsLecturers, EventsLecturers.lecturer_id),
+)
+REFERENCE_MODELS = (Group, Room, Lecturer, Photo)
+CACHE_KEY = "references"
+T = TypeVar("T")
+
+
+def link_columns() -> list:
+    """
+    Columns `room_ids`, `group_ids` and `lecturer_ids` of an event, to select next to `Event`
+    """
+    return [
+        select(func.array_agg(column)).where(link.event_id == Event.id).scalar_subquery().label(f"{field}_ids")
+        for field, link, column in LINKS
+    ]
+
+
+def _select_all(model, ids: Collection[int] | None) -> Select:
+    query = model.select_all().order_by(model.id)
+    return query if ids is None else query.where(model.id.in_(ids))
+
+
+async def load_groups(session: AsyncSession, ids: Collection[int] | None = None) -> dict[int, GroupGet]:
+    """
+    Groups `ids`, all of them by default, from the database
+    """
+    return {group.id: GroupGet.model_validate(group) for group in await session.scalars(_select_all(Group, ids))}
+
+
+async def load_rooms(session: AsyncSession, ids: Collection[int] | None = None) -> dict[int, RoomGet]:
+    """
+    Rooms `ids`, all of them by default, from the database
+    """
+    return {room.id: RoomGet.model_validate(room) for room in await session.scalars(_select_all(Room, ids))}
+
+
+async def load_lecturers(session: AsyncSession, ids: Collection[int] | None = None) -> dict[int, LecturerGet]:
+    """
+    Lecturers `ids`, all of them by default, from the database, with links to their avatars
+    """
+    lecturers = await session.scalars(_select_all(Lecturer, ids).options(joinedload(Lecturer.avatar)))
+    lecturers_get = {}
+    for lecturer in lecturers:
+        lecturers_get[lecturer.id] = LecturerGet.model_validate(lecturer)
+        if lecturer.avatar:
+            lecturers_get[lecturer.id].avatar_link = get_photo_webpath(lecturer.avatar.link)
+    return lecturers_get
+
+
+async def with_uncached(session: AsyncSession, cached: dict[int, T], ids: Iterable[int], load) -> dict[int, T]:
+    """
+    `cached` objects and the ones of `ids` missing from them, loaded with `load`: the cache of this worker
+    learns about objects created through other workers only with the invalidation message
+    """
+    missing = [id for id in ids if id not in cached]
+    return cached | await load(session, missing) if missing else cached
+
+
+class References(NamedTuple):
+    version: int
+    loaded: float
+    groups: dict[int, GroupGet]
+    rooms: dict[int, RoomGet]
+    lecturers: dict[int, LecturerGet]
+    suggest: PrefixIndex[Suggestion]
+    # Те же объекты для view=compact, собираются один раз на загрузку, а не на каждое событие
+    compact: dict[str, dict[int, EventLink]]
+    # Отпечаток содержимого: у одинаковых справочников он один в любом воркере и входит в ETag страниц
+    stamp: str
+
+    @classmethod
+    def build(
+        cls,
+        version: int,
+        loaded: float,
+        groups: dict[int, GroupGet],
+        rooms: dict[int, RoomGet],
+        lecturers: dict[int, LecturerGet],
+    ) -> References:
+        """References with the typeahead index and compact links, rebuilt together with every reload"""
+        entries = [
+            (f"{group.number} {group.name or ''}", Suggestion(type="group", id=group.id, title=group.number))
+            for group in sorted(groups.values(), key=lambda group: group.number)
+        ]
+        entries += [
+            (room.name, Suggestion(type="room", id=room.id, title=room.name))
+            for room in sorted(rooms.values(), key=lambda room: room.name)
+        ]
+        for lecturer in sorted(lecturers.values(), key=lambda lecturer: lecturer.last_name):
+            title = f"{lecturer.last_name} {lecturer.first_name} {lecturer.middle_name}"
+            entries.append((title, Suggestion(type="lecturer", id=lecturer.id, title=title)))
+        compact = {
+            "room": {room.id: EventLink(id=room.id, name=room.name) for room in rooms.values()},
+            "group": {group.id: EventLink(id=group.id, name=group.number) for group in groups.values()},
+            "lecturer": {
+                lecturer.id: EventLink(
+                    id=lecturer.id, name=f"{lecturer.last_name} {lecturer.first_name} {lecturer.middle_name}"
+                )
+                for lecturer in lecturers.values()
+            },
+        }
+        stamp = hashlib.sha1(StoredReferences.dump(groups, rooms, lecturers)).hexdigest()
+        return cls(version, loaded, groups, rooms, lecturers, PrefixIndex(entries), compact, stamp)
+
+    def links(self, row, compact: bool = False) -> dict[str, list]:
+        """
+        Rooms, groups and lecturers of an event row with `link_columns()`, deleted ones are skipped.
+        With `compact` they are `EventLink`s
+        """
+        loaded = self.compact if compact else {"room": self.rooms, "group": self.groups, "lecturer": self.lecturers}
+        return {
+            field: [loaded[field][id] for id in sorted(getattr(row, f"{field}_ids") or ()) if id in loaded[field]]
+            for field, *_ in LINKS
+        }
+
+
+class ReferenceCache:
+    def __init__(self, backend: CacheBackend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self.version = 0
+        self._lock = threading.Lock()
+        self._references: References | None = None
+        self.hits = 0
+        self.loads = 0
+
+    def forget(self, _=None) -> None:
+        """Drops references kept by this worker"""
+        with self._lock:
+            self.version += 1
+            self._references = None
+
+    def drop(self, _=None) -> None:
+        """Drops references stored in the service cache"""
+        self.backend.delete(CACHE_KEY)
+
+    def invalidate(self, _=None) -> None:
+        self.forget()
+        self.drop()
+
+    async def get(self, session: AsyncSession) -> References:
+        """
+        Returns current references, reloading stale ones from the service cache or with three queries
+        """
+        references = self._references
+        if references and references.version == self.version and time.monotonic() - references.loaded < self.ttl:
+            self.hits += 1
+            return references
+        # Загрузки не блокируют друг друга: параллельные запросы загрузят одно и то же
+        version = self.version
+        loaded = time.monotonic()
+        stored = self.backend.get(CACHE_KEY)
+        if stored is not None:
+            references = StoredReferences.model_validate_json(stored).references(version, loaded)
+        else:
+            references = await self._load(session, version, loaded)
+            with self._lock:
+                self.loads += 1
+        with self._lock:
+            # Изменение во время загрузки: отдаём загруженное, но не запоминаем
+            if version != self.version:
+                return references
+            self._references = references
+        if stored is None:
+            self.backend.set(
+                CACHE_KEY, StoredReferences.dump(references.groups, references.rooms, references.lecturers), self.ttl
+            )
+        return references
+
+    @staticmethod
+    async def _load(session: AsyncSession, version: int, loaded: float) -> References:
+        return References.build(
+            version=version,
+            loaded=loaded,
+            groups=await load_groups(session),
+            rooms=await load_rooms(session),
+            lecturers=await load_lecturers(session),
+        )
+
+    def stats(self) -> dict[str, int]:
+        return {"version": self.version, "hits": self.hits, "loads": self.loads}
+
+
+class StoredReferences(Base):
+    """References as they are kept in the service cache"""
+
+    groups: list[GroupGet]
+    rooms: list[RoomGet]
+    lecturers: list[LecturerGet]
+
+    @classmethod
+    def dump(cls, groups: dict[int, GroupGet], rooms: dict[int, RoomGet], lecturers: dict[int, LecturerGet]) -> bytes:
+        stored = cls.model_construct(
+            groups=list(groups.values()), rooms=list(rooms.values()), lecturers=list(lecturers.values())
+        )
+        return stored.model_dump_json().encode()
+
+    def references(self, version: int, loaded: float) -> References:
+        return References.build(
+            version=version,
+            loaded=loaded,
+            groups={group.id: group for group in self.groups},
+            rooms={room.id: room for room in self.rooms},
+            lecturers={lecturer.id: lecturer for lecturer in self.lecturers},
+        )
+
+
+reference_cache = ReferenceCache(backend=cache, ttl=settings.REFERENCE_CACHE_TTL)
+cache.subscribe("references", reference_cache.forget)
+cache.subscribe("references", reference_cache.drop, local=True)
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, flush_context) -> None:
+    # Связь с новым событием меняет только коллекцию events, такие объекты кэш не сбрасывают
+    if any(isinstance(obj, REFERENCE_MODELS) for obj in chain(session.new, session.deleted)) or any(
+        isinstance(obj, REFERENCE_MODELS) and session.is_modified(obj, include_collections=False)
+        for obj in session.dirty
+    ):
+        session.info["references_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    if session.info.pop("references_changed", False):
+        logger.debug("Groups, rooms or lecturers changed, dropping reference cache")
+        cache.publish("references")
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _after_rollback(session: Session, previous_transaction) -> None:
+    session.info.pop("references_changed", None)
@@ -0,0 +1,20 @@
+"""Responses serialized straight from pydantic models"""
+
+from typing import Any
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+
+class ModelResponse(Response):
+    """
+    JSON of a model that is already valid, serialized to bytes by pydantic in one pass
+
+    FastAPI sends a returned Response as is, without validating it against `response_model` and
+    without `jsonable_encoder`; `response_model` of the route is left for the schema only
+    """
+
+    media_type = "application/json"
+
+    def __init__(self, model: BaseModel, exclude: Any = None, **kwargs):
+        super().__init__(model.model_dump_json(exclude=exclude).encode(), **kwargs)
@@ -1,38 +1,99 @@
 import logging
+from datetime import datetime, timedelta, timezone
 
 from auth_lib.fastapi import UnionAuth
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi_sqlalchemy import db
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import not_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from calendar_backend.database import db, get_async_session
+from calendar_backend.exceptions import ObjectNotFound
+from calendar_backend.methods import utils
+from calendar_backend.methods.pagination import paginate
 from calendar_backend.models import Room
 from calendar_backend.routes.models import GetListRoom, RoomGet, RoomPatch, RoomPost
+from calendar_backend.routes.models.room import BusyInterval, RoomBusy
+from calendar_backend.routes.reference_cache import load_rooms, reference_cache, with_uncached
+from calendar_backend.routes.response import ModelResponse
 from calendar_backend.settings import get_settings
 
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/room", tags=["Room"])
+BUSY_MAX_DAYS = 31
+
+
+async def _busy(
+    session: AsyncSession, start: datetime, end: datetime, room_id: list[int], building: str | None
+) -> tuple[list[RoomGet], dict[int, list[BusyInterval]]]:
+    """
+    Selected rooms and the occurrences occupying each of them in [start, end), in one query
+    """
+    # События хранятся во времени UTC без часового пояса
+    start, end = (ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts for ts in (start, end))
+    if not start < end <= start + timedelta(days=BUSY_MAX_DAYS):
+        raise HTTPException(status_code=422, detail=f"Interval must be non-empty and at most {BUSY_MAX_DAYS} days")
+    ids = select(Room.id).where(not_(Room.is_deleted)).order_by(Room.id)
+    if room_id:
+        ids = ids.where(Room.id.in_(room_id))
+    if building is not None:
+        ids = ids.where(Room.building == building)
+    ids = (await session.scalars(ids)).all()
+    cached = await with_uncached(session, (await reference_cache.get(session)).rooms, ids, load_rooms)
+    rooms = [cached[id] for id in ids if id in cached]
+    busy = {room.id: [] for room in rooms}
+    if busy:
+        for row in await session.execute(utils.get_rooms_busy_select(start, end, list(busy))):
+            busy[row.room_id].append(BusyInterval(event_id=row.event_id, start_ts=row.start_ts, end_ts=row.end_ts))
+    return rooms, busy
+
+
+@router.get("/busy", response_model=list[RoomBusy])
+async def get_rooms_busy(
+    start: datetime,
+    end: datetime,
+    room_id: list[int] = Query(default=[]),
+    building: str | None = None,
+    session: AsyncSession = Depends(get_async_session),
+) -> list[RoomBusy]:
+    """Occupied intervals of every selected room, all rooms if neither room_id nor building is given"""
+    _, busy = await _busy(session, start, end, room_id, building)
+    return [RoomBusy(id=id, busy=intervals) for id, intervals in busy.items()]
+
+
+@router.get("/free", response_model=list[RoomGet])
+async def get_rooms_free(
+    start: datetime,
+    end: datetime,
+    room_id: list[int] = Query(default=[]),
+    building: str | None = None,
+    session: AsyncSession = Depends(get_async_session),
+) -> list[RoomGet]:
+    """Selected rooms with no event overlapping [start, end)"""
+    rooms, busy = await _busy(session, start, end, room_id, building)
+    return [room for room in rooms if not busy[room.id]]
 
 
 @router.get("/{id}", response_model=RoomGet)
-async def get_room_by_id(id: int) -> RoomGet:
-    return RoomGet.from_orm(Room.get(id, session=db.session))
+async def get_room_by_id(id: int, session: AsyncSession = Depends(get_async_session)) -> RoomGet:
+    rooms = await with_uncached(session, (await reference_cache.get(session)).rooms, [id], load_rooms)
+    if id not in rooms:
+        raise ObjectNotFound(Room, id)
+    return rooms[id]
 
 
 @router.get("/", response_model=GetListRoom)
-async def get_rooms(query: str = "", limit: int = 10, offset: int = 0) -> GetListRoom:
-    res = Room.get_all(session=db.session).filter(Room.name.contains(query))
-    if limit:
-        cnt, res = res.count(), res.offset(offset).limit(limit).all()
-    else:
-        cnt, res = res.count(), res.offset(offset).all()
-    return GetListRoom(
-        **{
-            "items": res,
-            "limit": limit,
-            "offset": offset,
-            "total": cnt,
-        }
+async def get_rooms(
+    query: str = "", limit: int = 10, offset: int = 0, session: AsyncSession = Depends(get_async_session)
+) -> ModelResponse:
+    # Отбор и страница -- в базе, сами аудитории берутся из кэша
+    ids = select(Room.id).where(not_(Room.is_deleted), Room.name.contains(query, autoescape=True))
+    page = await paginate(session, ids.order_by(Room.id), limit, offset)
+    rooms = await with_uncached(session, (await reference_cache.get(session)).rooms, page.items, load_rooms)
+    res = [rooms[id] for id in page.items if id in rooms]
+    return ModelResponse(
+        GetListRoom.model_construct(items=res, limit=limit, offset=offset, total=page.total, has_more=page.has_more)
     )
 
 
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from calendar_backend.database import get_async_session
+from calendar_backend.routes.models.search import GetListSuggestion
+from calendar_backend.routes.reference_cache import reference_cache
+
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+
+@router.get("/suggest", response_model=GetListSuggestion)
+async def suggest(
+    query: str, limit: int = Query(default=10, ge=1, le=100), session: AsyncSession = Depends(get_async_session)
+) -> GetListSuggestion:
+    """
+    Groups, rooms and lecturers for a search box: every word of `query` starts a word of the number, name
+    or full name. Answered from memory, the database is queried only to reload changed references
+    """
+    references = await reference_cache.get(session)
+    return GetListSuggestion(items=references.suggest.search(query, limit))
@@ -0,0 +1,89 @@
+"""Timetable page of one group, lecturer or room, shared by the routers that serve it"""
+
+from datetime import date
+from typing import Literal
+
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from calendar_backend.methods import utils
+from calendar_backend.methods.pagination import TotalMode, decode_cursor, encode_cursor, paginate
+from calendar_backend.models import CommentEvent, Event
+from calendar_backend.routes.models import CommentEventGet
+from calendar_backend.routes.models.event import Event as EventItem
+from calendar_backend.routes.models.event import EventCompact, GetListEvent, GetListEventCompact
+from calendar_backend.routes.reference_cache import References, link_columns, reference_cache
+
+
+async def _get_comments(session: AsyncSession, event_ids: set[int]) -> dict[int, list[CommentEventGet]]:
+    comments = await session.scalars(
+        CommentEvent.select_all().where(CommentEvent.event_id.in_(event_ids)).order_by(CommentEvent.id)
+    )
+    by_event = {}
+    for comment in comments:
+        by_event.setdefault(comment.event_id, []).append(CommentEventGet.model_validate(comment))
+    return by_event
+
+
+async def get_timetable_page(
+    session: AsyncSession,
+    start: date,
+    end: date,
+    group_id,
+    lecturer_id,
+    room_id,
+    detail,
+    limit,
+    offset,
+    cursor=None,
+    total: TotalMode = "exact",
+    view: Literal["full", "compact"] = "full",
+    references: References | None = None,
+) -> bytes:
+    """Timetable page as JSON, the way `GET /event/` returns it, with `references` if they are given"""
+    events, occurrence = utils.get_timetable_select(start, end, group_id, lecturer_id, room_id)
+    if cursor:
+        # В режиме курсора total -- количество событий, оставшихся после курсора
+        events = events.where(tuple_(occurrence.c.start_ts, Event.id) > decode_cursor(cursor))
+        offset = 0
+    # Повторения серии -- один и тот же Event, время берётся из повторения.
+    # Вместо связей -- их id, сами объекты берутся из кэша
+    page = await paginate(
+        session,
+        events.with_only_columns(
+            Event.id, Event.name, occurrence.c.start_ts, occurrence.c.end_ts, *link_columns()
+        ).order_by(occurrence.c.start_ts, Event.id),
+        limit,
+        offset,
+        total,
+    )
+    rows = page.items
+    next_cursor = encode_cursor(rows[-1].start_ts, rows[-1].id) if page.has_more else None
+    if references is None:
+        references = await reference_cache.get(session)
+    page_args = dict(limit=limit, offset=offset, total=page.total, has_more=page.has_more, next_cursor=next_cursor)
+    if view == "compact":
+        # Описаний и аватаров в ответе нет вовсе, detail не нужен
+        items = [EventCompact.model_construct(**row._mapping, **references.links(row, compact=True)) for row in rows]
+        return GetListEventCompact.model_construct(items=items, **page_args).model_dump_json().encode()
+
+    # Исключения относятся к событиям, а не к самому списку
+    fmt = {}
+    comments = {}
+    if detail and "comment" in detail:
+        # Комментарии всех событий страницы одним запросом и только по запросу
+        comments = await _get_comments(session, {row.id for row in rows})
+    else:
+        fmt["comments"] = ...
+    if detail and "description" not in detail:
+        fmt["lecturer"] = {"__all__": {"avatar_id", "description"}}
+
+    # Строки из базы и объекты из кэша уже проверены, модель собирается без валидации
+    result = GetListEvent.model_construct(
+        items=[
+            EventItem.model_construct(**row._mapping, **references.links(row), comments=comments.get(row.id, []))
+            for row in rows
+        ],
+        **page_args,
+    )
+    return result.model_dump_json(exclude={"items": {"__all__": fmt}}).encode()
@@ -2,7 +2,7 @@ import os
 from functools import lru_cache
 
 from auth_lib.fastapi import UnionAuthSettings
-from pydantic import AnyHttpUrl, ConfigDict, DirectoryPath, PostgresDsn
+from pydantic import AnyHttpUrl, ConfigDict, DirectoryPath, PostgresDsn, RedisDsn
 from pydantic_settings import BaseSettings
 
 
@@ -10,6 +10,12 @@ class Settings(UnionAuthSettings, BaseSettings):
     """Application settings"""
 
     DB_DSN: PostgresDsn = 'postgresql://postgres@localhost:5432/postgres'
+    DB_READ_DSN: PostgresDsn | None = None  # replica for read-only handlers, DB_DSN if not set
+    DB_POOL_SIZE: int = 5  # per engine, a worker holds a blocking and an asyncpg pool
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 30 * 60  # seconds, older connections are reopened instead of pinged
+    DB_POOL_PRE_PING: bool = False
     ROOT_PATH: str = '/' + os.getenv('APP_NAME', '')
 
     REDIRECT_URL: AnyHttpUrl = "https://www.profcomff.com"
@@ -27,6 +33,13 @@ class Settings(UnionAuthSettings, BaseSettings):
     CORS_ALLOW_METHODS: list[str] = ['*']
     CORS_ALLOW_HEADERS: list[str] = ['*']
     SUPPORTED_FILE_EXTENSIONS: list[str] = ["png", "svg", "jpg", "jpeg", "webp"]
+    CACHE_URL: RedisDsn | None = None  # cache shared by all workers, per-worker memory if not set
+    CACHE_SOCKET_TIMEOUT: float = 0.5  # seconds, a slower cache is treated as a miss
+    CACHE_MEMORY_ITEMS: int = 1024  # without CACHE_URL
+    ICS_CACHE_TTL: int = 7 * 24 * 60 * 60  # seconds, calendars are also dropped on every timetable change
+    TIMETABLE_CACHE_TTL: int = 10 * 60  # seconds, pages are keyed by their ETag and never get stale
+    REFERENCE_CACHE_TTL: int = 60  # seconds, changes made by other workers become visible after it
+    GROUP_WEEK_TTL: int = 24 * 60 * 60  # seconds, stored weeks are also dropped on every change of the group
 
     model_config = ConfigDict(case_sensitive=True, env_file='.env', extra='ignore')
 
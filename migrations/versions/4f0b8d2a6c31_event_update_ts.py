@@ -0,0 +1,28 @@
+"""Event update_ts
+
+Revision ID: 4f0b8d2a6c31
+Revises: 7a3c1e9d2b40
+Create Date: 2026-10-18 15:41:27.093114
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '4f0b8d2a6c31'
+down_revision = '7a3c1e9d2b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'event',
+        sa.Column('update_ts', sa.DateTime(), server_default=sa.text("timezone('utc', now())"), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_column('event', 'update_ts')
@@ -0,0 +1,51 @@
+"""Timetable indexes
+
+Revision ID: 7a3c1e9d2b40
+Revises: b060027b11b3
+Create Date: 2026-10-18 12:04:11.518203
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7a3c1e9d2b40'
+down_revision = 'b060027b11b3'
+branch_labels = None
+depends_on = None
+
+LINK_TABLES = (
+    ('events_groups', 'group_id'),
+    ('events_lecturers', 'lecturer_id'),
+    ('events_rooms', 'room_id'),
+)
+
+
+def upgrade():
+    op.create_index(
+        'ix_event_start_ts_end_ts',
+        'event',
+        ['start_ts', 'end_ts'],
+        unique=False,
+        postgresql_where=sa.text('NOT is_deleted'),
+    )
+    for table, column in LINK_TABLES:
+        # Повторяющиеся связи ничего не значат, удаляем их перед созданием ограничения уникальности
+        op.execute(
+            f"""
+            DELETE FROM {table} a
+            USING {table} b
+            WHERE a.id > b.id AND a.event_id = b.event_id AND a.{column} = b.{column}
+            """
+        )
+        op.create_unique_constraint(f'uq_{table}_{column}_event_id', table, [column, 'event_id'])
+        op.create_index(f'ix_{table}_event_id', table, ['event_id'], unique=False)
+
+
+def downgrade():
+    for table, column in LINK_TABLES:
+        op.drop_index(f'ix_{table}_event_id', table_name=table)
+        op.drop_constraint(f'uq_{table}_{column}_event_id', table, type_='unique')
+    op.drop_index('ix_event_start_ts_end_ts', table_name='event', postgresql_where=sa.text('NOT is_deleted'))
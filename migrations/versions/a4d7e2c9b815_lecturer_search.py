@@ -0,0 +1,36 @@
+"""Lecturer search
+
+Revision ID: a4d7e2c9b815
+Revises: c2e5a9f1d7b3
+Create Date: 2026-10-18 23:41:07.362915
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d7e2c9b815'
+down_revision = 'c2e5a9f1d7b3'
+branch_labels = None
+depends_on = None
+
+SEARCH_DOCUMENT = (
+    "to_tsvector('simple', translate(last_name || ' ' || first_name || ' ' || middle_name, "
+    "'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯё', 'абвгдеежзийклмнопрстуфхцчшщъыьэюяе'))"
+)
+
+
+def upgrade():
+    op.add_column(
+        'lecturer',
+        sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_DOCUMENT, persisted=True), nullable=True),
+    )
+    op.create_index('ix_lecturer_search', 'lecturer', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_lecturer_search', table_name='lecturer')
+    op.drop_column('lecturer', 'search_vector')
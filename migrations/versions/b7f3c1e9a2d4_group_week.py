@@ -0,0 +1,34 @@
+"""Group week
+
+Revision ID: b7f3c1e9a2d4
+Revises: a4d7e2c9b815
+Create Date: 2026-10-19 14:12:51.904217
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7f3c1e9a2d4'
+down_revision = 'a4d7e2c9b815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'group_week',
+        sa.Column('group_id', sa.Integer(), nullable=False),
+        sa.Column('week', sa.Date(), nullable=False),
+        sa.Column('payload', sa.LargeBinary(), nullable=False),
+        sa.Column('update_ts', sa.DateTime(), nullable=False),
+        sa.Column('references_stamp', sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(['group_id'], ['group.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('group_id', 'week'),
+    )
+
+
+def downgrade():
+    op.drop_table('group_week')
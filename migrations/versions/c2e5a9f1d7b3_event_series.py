@@ -0,0 +1,40 @@
+"""Event series
+
+Revision ID: c2e5a9f1d7b3
+Revises: 4f0b8d2a6c31
+Create Date: 2026-10-18 20:12:53.604417
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e5a9f1d7b3'
+down_revision = '4f0b8d2a6c31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('event', sa.Column('repeat_timedelta_days', sa.Integer(), nullable=True))
+    op.add_column('event', sa.Column('repeat_until_ts', sa.DateTime(), nullable=True))
+    op.add_column(
+        'event',
+        sa.Column('exdates', postgresql.ARRAY(sa.DateTime()), server_default=sa.text("'{}'"), nullable=False),
+    )
+    op.create_index(
+        'ix_event_series_start_ts_repeat_until_ts',
+        'event',
+        ['start_ts', 'repeat_until_ts'],
+        postgresql_where=sa.text('repeat_timedelta_days IS NOT NULL'),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_event_series_start_ts_repeat_until_ts', table_name='event')
+    op.drop_column('event', 'exdates')
+    op.drop_column('event', 'repeat_until_ts')
+    op.drop_column('event', 'repeat_timedelta_days')
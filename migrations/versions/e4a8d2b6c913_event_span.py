@@ -0,0 +1,40 @@
+"""Event span
+
+Revision ID: e4a8d2b6c913
+Revises: b7f3c1e9a2d4
+Create Date: 2026-10-19 17:03:26.518942
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a8d2b6c913'
+down_revision = 'b7f3c1e9a2d4'
+branch_labels = None
+depends_on = None
+
+EVENT_SPAN = "tsrange(start_ts, greatest(start_ts, end_ts, repeat_until_ts + (end_ts - start_ts)), '[]')"
+
+
+def upgrade():
+    op.add_column(
+        'event',
+        sa.Column('span', postgresql.TSRANGE(), sa.Computed(EVENT_SPAN, persisted=True), nullable=True),
+    )
+    op.create_index(
+        'ix_event_span',
+        'event',
+        ['span'],
+        unique=False,
+        postgresql_using='gist',
+        postgresql_where=sa.text('NOT is_deleted'),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_event_span', table_name='event')
+    op.drop_column('event', 'span')
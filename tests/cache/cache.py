@@ -0,0 +1,88 @@
+import threading
+
+import fakeredis
+import pytest
+
+from calendar_backend.cache import MemoryCache, RedisCache
+
+
+@pytest.fixture
+def workers():
+    """Two workers sharing one Redis"""
+    server = fakeredis.FakeServer()
+    caches = [RedisCache(fakeredis.FakeRedis(server=server)) for _ in range(2)]
+    for cache in caches:
+        cache.listen()
+    yield caches
+    for cache in caches:
+        cache.close()
+
+
+def test_memory():
+    cache = MemoryCache(max_items=2)
+    cache.set("a", b"1", ttl=60)
+    cache.set("b", b"2", ttl=60)
+    assert cache.get("a") == b"1"
+    cache.set("c", b"3", ttl=60)
+    # Вытесняется давно не читанный ключ
+    assert cache.get("b") is None
+    cache.set("d", b"4", ttl=0)
+    assert cache.get("d") is None
+    cache.delete_prefix("a", "x")
+    assert cache.get("a") is None
+    assert cache.get("c") == b"3"
+    cache.delete("c", "missing")
+    assert cache.get("c") is None
+
+
+def test_shared_storage(workers):
+    first, second = workers
+    first.set("ics:group_1_", b"calendar", ttl=60)
+    first.set("ics:room_1_", b"calendar", ttl=60)
+    assert second.get("ics:group_1_") == b"calendar"
+    second.delete_prefix("ics:group_")
+    assert first.get("ics:group_1_") is None
+    assert first.get("ics:room_1_") == b"calendar"
+
+
+def test_broadcast(workers):
+    first, second = workers
+    received, delivered = {0: [], 1: []}, threading.Event()
+    first.subscribe("timetable", received[0].append)
+
+    def on_message(payload):
+        received[1].append(payload)
+        delivered.set()
+
+    second.subscribe("timetable", on_message)
+
+    first.publish("timetable", {"group": [1]})
+    # Свой воркер -- сразу и один раз, остальные -- через канал
+    assert received[0] == [{"group": [1]}]
+    assert delivered.wait(timeout=5)
+    assert received[1] == [{"group": [1]}]
+    assert received[0] == [{"group": [1]}]
+
+
+def test_local_subscribers(workers):
+    first, second = workers
+    dropped, forgotten, delivered = {0: [], 1: []}, [], threading.Event()
+    for i, cache in enumerate(workers):
+        cache.subscribe("timetable", dropped[i].append, local=True)
+
+    def on_message(payload):
+        forgotten.append(payload)
+        delivered.set()
+
+    second.subscribe("timetable", on_message)
+
+    first.publish("timetable", {"group": [1]})
+    assert delivered.wait(timeout=5)
+    # Общее хранилище чистит только отправитель, остальные сбрасывают своё состояние
+    assert dropped == {0: [{"group": [1]}], 1: []}
+    assert forgotten == [{"group": [1]}]
+
+    # После потери канала состояние сбрасывается без сообщения
+    second.resync()
+    assert forgotten == [{"group": [1]}, None]
+    assert dropped[1] == []
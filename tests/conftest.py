@@ -3,20 +3,25 @@ from datetime import datetime
 import pytest
 from fastapi.testclient import TestClient
 from pytest_mock import MockerFixture
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.orm import Session, sessionmaker
 from starlette import status
 
+from calendar_backend import database
 from calendar_backend.models.base import DeclarativeBase
 from calendar_backend.models.db import Event, Group, Lecturer, Room
 from calendar_backend.routes import app
+from calendar_backend.routes.reference_cache import reference_cache
 from calendar_backend.settings import get_settings
 
 
 @pytest.fixture()
 def client():
-    client = TestClient(app)
-    return client
+    # Внутри with все запросы идут в одном цикле событий, к которому привязан пул asyncpg
+    with TestClient(app) as client:
+        yield client
 
 
 @pytest.fixture()
@@ -30,8 +35,8 @@ def client_auth(mocker: MockerFixture):
         "id": 0,
         "email": "string",
     }
-    client = TestClient(app)
-    return client
+    with TestClient(app) as client:
+        yield client
 
 
 @pytest.fixture()
@@ -184,3 +189,22 @@ def group_factory(dbsession: Session):
         response_model: Group = dbsession.query(Group).get(id)
         dbsession.delete(response_model)
         dbsession.commit()
+
+
+@pytest.fixture()
+def replica(client_auth: TestClient, dbsession: Session, mocker: MockerFixture):
+    """Read handlers switched to a second, empty database on the same server standing in for a replica"""
+    name = "timetable_replica_test"
+    if not dbsession.execute(text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": name}).scalar():
+        dbsession.execute(text(f"CREATE DATABASE {name}"))
+    dsn = make_url(str(get_settings().DB_DSN)).set(database=name).render_as_string(hide_password=False)
+    replica_engine = create_engine(dsn, isolation_level='AUTOCOMMIT')
+    DeclarativeBase.metadata.create_all(bind=replica_engine)
+    read_engine = database.create_read_engine(dsn, database.PoolStats())
+    mocker.patch.object(database, "async_session_factory", async_sessionmaker(read_engine, expire_on_commit=False))
+    # Кэш справочников не должен переносить данные между базами
+    reference_cache.invalidate()
+    yield replica_engine
+    reference_cache.invalidate()
+    client_auth.portal.call(read_engine.dispose)
+    replica_engine.dispose()
@@ -1,11 +1,21 @@
 import datetime
+import json
 from urllib.parse import urljoin
 
 from fastapi.testclient import TestClient
+from icalendar import Calendar
+from sqlalchemy import update
+from sqlalchemy.engine import Engine
+from sqlalchemy.event import listen, remove
 from sqlalchemy.orm import Session
 from starlette import status
 
-from calendar_backend.models import Event, Group, Lecturer, Room
+from calendar_backend.cache import cache
+from calendar_backend.database import async_engine, engine
+from calendar_backend.methods.calendar_cache import calendar_cache
+from calendar_backend.methods.list_calendar import stream_ics
+from calendar_backend.models import CommentEvent, Event, Group, Lecturer, Room
+from calendar_backend.routes.reference_cache import reference_cache
 
 
 RESOURCE = "/event/"
@@ -333,6 +343,48 @@ def test_delete_from_to(client_auth: TestClient, dbsession: Session, room_factor
     dbsession.commit()
 
 
+def test_delete_from_to_series(client_auth: TestClient, dbsession: Session, group_path):
+    group_id = int(group_path.split("/")[-1])
+    series = {
+        "name": f"delete_series_{datetime.datetime.utcnow().isoformat()}",
+        "room_id": [],
+        "group_id": [group_id],
+        "lecturer_id": [],
+        "start_ts": "2022-09-01T10:00:00",
+        "end_ts": "2022-09-01T11:35:00",
+        "repeat_timedelta_days": 7,
+        "repeat_until_ts": "2022-09-29T10:00:00",
+    }
+    id_ = client_auth.post(f"{RESOURCE}series", json=series).json()["id"]
+    inside = client_auth.post(
+        f"{RESOURCE}series",
+        json=series
+        | {
+            "start_ts": "2022-09-08T12:00:00",
+            "end_ts": "2022-09-08T13:35:00",
+            "repeat_until_ts": "2022-09-15T12:00:00",
+        },
+    ).json()["id"]
+    response = client_auth.delete(f"{RESOURCE}bulk", params={"start": "2022-09-07", "end": "2022-09-16"})
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert client_auth.get(f"{RESOURCE}series/{id_}").json()["exdates"] == [
+        "2022-09-08T10:00:00",
+        "2022-09-15T10:00:00",
+    ]
+    params = {"group_id": group_id, "start": "2022-09-01", "end": "2022-10-01"}
+    assert [row["start_ts"] for row in client_auth.get(RESOURCE, params=params).json()["items"]] == [
+        f"2022-09-{day:02}T10:00:00" for day in (1, 22, 29)
+    ]
+    # Серия целиком внутри интервала удаляется
+    assert client_auth.get(f"{RESOURCE}series/{inside}").status_code == status.HTTP_404_NOT_FOUND
+
+    response = client_auth.patch(f"{RESOURCE}{id_}", json={"exdates": None})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    for row in (id_, inside):
+        dbsession.delete(dbsession.query(Event).get(row))
+    dbsession.commit()
+
+
 def test_update_by_name(client_auth: TestClient, dbsession: Session, room_factory, group_factory, lecturer_factory):
     room_path1 = room_factory(client_auth)
     group_path1 = group_factory(client_auth)
@@ -400,3 +452,578 @@ def test_create_repeated_events(
     response = client_auth.post(f"{RESOURCE}repeating", json=request_obj)
     created = response.json()
     assert response.status_code == status.HTTP_200_OK, response.json()
+
+
+def test_create_repeated_events_batched(
+    client_auth: TestClient, dbsession: Session, room_factory, group_factory, lecturer_factory
+):
+    request_obj = {
+        "name": f"repeated_{datetime.datetime.utcnow().isoformat()}",
+        "room_id": [int(room_factory(client_auth).split("/")[-1])],
+        "group_id": [int(group_factory(client_auth).split("/")[-1])],
+        "lecturer_id": [int(lecturer_factory(client_auth).split("/")[-1])],
+        "start_ts": "2022-09-01T10:00:00",
+        "end_ts": "2022-09-01T11:35:00",
+        "repeat_timedelta_days": 7,
+    }
+    statements = []
+
+    def count_statements(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    listen(Engine, "before_cursor_execute", count_statements)
+    try:
+        response = client_auth.post(
+            f"{RESOURCE}repeating", json=request_obj | {"repeat_until_ts": "2022-09-08T10:00:00"}
+        )
+        assert response.status_code == status.HTTP_200_OK, response.json()
+        assert len(response.json()) == 2
+        few = len(statements)
+        statements.clear()
+        # Количество запросов не зависит от числа повторений
+        response = client_auth.post(
+            f"{RESOURCE}repeating", json=request_obj | {"repeat_until_ts": "2023-09-01T10:00:00"}
+        )
+        assert response.status_code == status.HTTP_200_OK, response.json()
+        assert len(response.json()) == 53
+        assert len(statements) == few
+    finally:
+        remove(Engine, "before_cursor_execute", count_statements)
+    assert response.json()[-1]["start_ts"] == "2023-08-31T10:00:00"
+    assert response.json()[-1]["room"][0]["id"] == request_obj["room_id"][0]
+
+    events = dbsession.query(Event).filter(Event.name == request_obj["name"]).all()
+    assert len(events) == 55
+    assert all([row.id for row in event.group] == request_obj["group_id"] for event in events)
+    for event in events:
+        dbsession.delete(event)
+    dbsession.commit()
+
+
+def test_read_all_query_count(
+    client_auth: TestClient, dbsession: Session, room_factory, group_factory, lecturer_factory
+):
+    room_id = int(room_factory(client_auth).split("/")[-1])
+    group_id = int(group_factory(client_auth).split("/")[-1])
+    lecturer_id = int(lecturer_factory(client_auth).split("/")[-1])
+    request_obj = [
+        {
+            "name": f"query_count_{i}",
+            "room_id": [room_id],
+            "group_id": [group_id],
+            "lecturer_id": [lecturer_id],
+            "start_ts": f"2022-08-26T{10 + i}:00:00",
+            "end_ts": f"2022-08-26T{10 + i}:30:00",
+        }
+        for i in range(5)
+    ]
+    response = client_auth.post(f"{RESOURCE}bulk", json=request_obj)
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    created = response.json()
+
+    statements = []
+
+    def count_statements(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # Чтение идёт через asyncpg: считаются запросы только асинхронного движка
+    # Группы, аудитории и преподаватели берутся из кэша, первый запрос его заполняет
+    client_auth.get(RESOURCE, params={"group_id": group_id, "start": "2022-08-26", "end": "2022-08-27"})
+    listen(async_engine.sync_engine, "before_cursor_execute", count_statements)
+    try:
+        for limit in (1, 5):
+            statements.clear()
+            response = client_auth.get(
+                RESOURCE, params={"group_id": group_id, "start": "2022-08-26", "end": "2022-08-27", "limit": limit}
+            )
+            assert response.status_code == status.HTTP_200_OK, response.json()
+            assert response.json()["total"] == 5
+            assert len(response.json()["items"]) == limit
+            # Валидатор для ETag и страница с total и id связей
+            assert len(statements) == 2, statements
+            item = response.json()["items"][0]
+            assert [room["id"] for room in item["room"]] == [room_id]
+            assert [group["id"] for group in item["group"]] == [group_id]
+            assert [lecturer["id"] for lecturer in item["lecturer"]] == [lecturer_id]
+    finally:
+        remove(async_engine.sync_engine, "before_cursor_execute", count_statements)
+
+    for row in created:
+        dbsession.delete(dbsession.query(Event).get(row["id"]))
+    dbsession.commit()
+
+
+def test_read_all_cursor(client_auth: TestClient, dbsession: Session, room_factory, group_factory, lecturer_factory):
+    room_id = int(room_factory(client_auth).split("/")[-1])
+    group_id = int(group_factory(client_auth).split("/")[-1])
+    lecturer_id = int(lecturer_factory(client_auth).split("/")[-1])
+    request_obj = [
+        {
+            "name": f"cursor_{i}",
+            "room_id": [room_id],
+            "group_id": [group_id],
+            "lecturer_id": [lecturer_id],
+            "start_ts": f"2022-08-26T{10 + i // 2}:00:00",
+            "end_ts": f"2022-08-26T{10 + i // 2}:30:00",
+        }
+        for i in range(5)
+    ]
+    response = client_auth.post(f"{RESOURCE}bulk", json=request_obj)
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    created = response.json()
+    params = {"group_id": group_id, "start": "2022-08-26", "end": "2022-08-27", "limit": 2}
+
+    response = client_auth.get(RESOURCE, params=params)
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    by_offset = [row["id"] for row in response.json()["items"]]
+    response = client_auth.get(RESOURCE, params=params | {"offset": 2})
+    by_offset += [row["id"] for row in response.json()["items"]]
+    response = client_auth.get(RESOURCE, params=params | {"offset": 4})
+    by_offset += [row["id"] for row in response.json()["items"]]
+    assert response.json()["next_cursor"] is None
+
+    by_cursor, cursor = [], None
+    for _ in range(3):
+        response = client_auth.get(RESOURCE, params=params | ({"cursor": cursor} if cursor else {}))
+        assert response.status_code == status.HTTP_200_OK, response.json()
+        by_cursor += [row["id"] for row in response.json()["items"]]
+        cursor = response.json()["next_cursor"]
+    assert cursor is None
+    assert by_cursor == by_offset
+    assert sorted(by_cursor) == sorted(row["id"] for row in created)
+
+    response = client_auth.get(RESOURCE, params=params | {"cursor": "not-a-cursor"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    for row in created:
+        dbsession.delete(dbsession.query(Event).get(row["id"]))
+    dbsession.commit()
+
+
+def test_read_all_total(client_auth: TestClient, dbsession: Session, group_factory):
+    group_id = int(group_factory(client_auth).split("/")[-1])
+    request_obj = [
+        {
+            "name": f"total_{i}",
+            "room_id": [],
+            "group_id": [group_id],
+            "lecturer_id": [],
+            "start_ts": f"2022-08-26T{10 + i}:00:00",
+            "end_ts": f"2022-08-26T{10 + i}:30:00",
+        }
+        for i in range(5)
+    ]
+    response = client_auth.post(f"{RESOURCE}bulk", json=request_obj)
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    created = response.json()
+    params = {"group_id": group_id, "start": "2022-08-26", "end": "2022-08-27", "limit": 2}
+
+    def page(**extra) -> tuple[int | None, bool, int]:
+        response = client_auth.get(RESOURCE, params=params | extra)
+        assert response.status_code == status.HTTP_200_OK, response.json()
+        return response.json()["total"], response.json()["has_more"], len(response.json()["items"])
+
+    assert page() == (5, True, 2)
+    assert page(offset=4) == (5, False, 1)
+    assert page(offset=6) == (5, False, 0)
+    # Без total следующая страница определяется по лишней строке
+    assert page(total="none") == (None, True, 2)
+    assert page(total="none", offset=3) == (None, False, 2)
+    # Оценка не меньше уже увиденного, на последней странице -- точное число
+    estimate, has_more, _ = page(total="estimate")
+    assert estimate >= 3 and has_more
+    assert page(total="estimate", offset=3) == (5, False, 2)
+    # За концом выборки оценка не больше offset
+    estimate, has_more, items = page(total="estimate", offset=50)
+    assert estimate <= 50 and not has_more and items == 0
+    assert client_auth.get(RESOURCE, params=params | {"total": "maybe"}).status_code == 422
+
+    for row in created:
+        dbsession.delete(dbsession.query(Event).get(row["id"]))
+    dbsession.commit()
+
+
+def test_read_compact(client_auth: TestClient, event_path, group_path, room_path, lecturer_path):
+    params = {"group_id": int(group_path.split("/")[-1]), "start": "2022-08-26", "end": "2022-08-27"}
+    full = client_auth.get(RESOURCE, params=params).json()["items"][0]
+    response = client_auth.get(RESOURCE, params=params | {"view": "compact"})
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert response.headers["ETag"] != client_auth.get(RESOURCE, params=params).headers["ETag"]
+    compact = response.json()["items"][0]
+    assert {key: compact[key] for key in ("id", "name", "start_ts", "end_ts")} == {
+        key: full[key] for key in ("id", "name", "start_ts", "end_ts")
+    }
+    lecturer = client_auth.get(lecturer_path).json()
+    assert compact["room"] == [{"id": full["room"][0]["id"], "name": full["room"][0]["name"]}]
+    assert compact["group"] == [{"id": full["group"][0]["id"], "name": full["group"][0]["number"]}]
+    assert compact["lecturer"] == [
+        {"id": lecturer["id"], "name": f"{lecturer['last_name']} {lecturer['first_name']} {lecturer['middle_name']}"}
+    ]
+    assert client_auth.get(RESOURCE, params=params | {"view": "tiny"}).status_code == 422
+
+
+def test_read_comments(client_auth: TestClient, dbsession: Session, event_path, group_path):
+    params = {"group_id": int(group_path.split("/")[-1]), "start": "2022-08-26", "end": "2022-08-27"}
+    with_comments = params | {"detail": "comment"}
+    assert "comments" not in client_auth.get(RESOURCE, params=params).json()["items"][0]
+    before = client_auth.get(RESOURCE, params=with_comments)
+    assert before.json()["items"][0]["comments"] == []
+
+    comment = client_auth.post(f"{event_path}/comment/", json={"text": "Интересно", "author_name": "Студент"}).json()
+    # До модерации комментарий не виден, и ответ не меняется
+    assert client_auth.get(RESOURCE, params=with_comments).headers["ETag"] == before.headers["ETag"]
+    client_auth.post(f"{event_path}/comment/{comment['id']}/review/", params={"action": "Approved"})
+    after = client_auth.get(RESOURCE, params=with_comments, headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == status.HTTP_200_OK
+    assert [item["text"] for item in after.json()["items"][0]["comments"]] == ["Интересно"]
+    # Описания преподавателей -- только с detail=description
+    assert "description" not in after.json()["items"][0]["lecturer"][0]
+    described = client_auth.get(RESOURCE, params=params | {"detail": ["comment", "description"]})
+    assert described.json()["items"][0]["lecturer"][0]["description"] == "Очень умный"
+    # ETag без комментариев от них не зависит
+    etag = client_auth.get(RESOURCE, params=params).headers["ETag"]
+    client_auth.delete(f"{event_path}/comment/{comment['id']}")
+    assert client_auth.get(RESOURCE, params=params).headers["ETag"] == etag
+    assert client_auth.get(RESOURCE, params=with_comments).json()["items"][0]["comments"] == []
+
+    dbsession.delete(dbsession.query(CommentEvent).get(comment["id"]))
+    dbsession.commit()
+
+
+def test_read_batch(client_auth: TestClient, dbsession: Session, room_factory, group_factory):
+    rooms = [int(room_factory(client_auth).split("/")[-1]) for _ in range(2)]
+    group_id = int(group_factory(client_auth).split("/")[-1])
+    request_obj = [
+        {
+            "name": f"batch_{i}",
+            "room_id": [room_id],
+            "group_id": [group_id] if i == 0 else [],
+            "lecturer_id": [],
+            "start_ts": f"2022-08-26T1{i}:00:00",
+            "end_ts": f"2022-08-26T1{i}:30:00",
+        }
+        for i, room_id in enumerate(rooms)
+    ]
+    created = client_auth.post(f"{RESOURCE}bulk", json=request_obj).json()
+    params = {"start": "2022-08-26", "end": "2022-08-27", "room_id": rooms + [0], "group_id": [group_id]}
+
+    response = client_auth.get(f"{RESOURCE}batch", params=params)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [(line["type"], line["id"]) for line in lines] == [("group", group_id)] + [
+        ("room", id) for id in rooms + [0]
+    ]
+    assert [[item["id"] for item in line["items"]] for line in lines] == [
+        [created[0]["id"]],
+        [created[0]["id"]],
+        [created[1]["id"]],
+        [],
+    ]
+    assert lines[1]["items"][0]["room"][0]["id"] == rooms[0]
+    compact = client_auth.get(f"{RESOURCE}batch", params=params | {"view": "compact"}).text.splitlines()
+    assert json.loads(compact[2])["items"][0]["room"] == [
+        {"id": rooms[1], "name": lines[2]["items"][0]["room"][0]["name"]}
+    ]
+    # Пустое расписание между непустыми
+    lines = client_auth.get(f"{RESOURCE}batch", params=params | {"room_id": [rooms[0], 0, rooms[1]]}).text.splitlines()
+    assert [len(json.loads(line)["items"]) for line in lines] == [1, 1, 0, 1]
+    assert client_auth.get(f"{RESOURCE}batch", params={"start": "2022-08-26"}).status_code == 422
+    response = client_auth.get(f"{RESOURCE}batch", params=params | {"end": "2022-09-27"})
+    assert response.status_code == 422
+    assert client_auth.get(f"{RESOURCE}batch", params={"room_id": list(range(101))}).status_code == 422
+
+    for row in created:
+        dbsession.delete(dbsession.query(Event).get(row["id"]))
+    dbsession.commit()
+
+
+def test_read_ics_cache(client_auth: TestClient, dbsession: Session, event_path, group_path):
+    group_id = int(group_path.split("/")[-1])
+    params = {"group_id": group_id, "format": "ics", "start": "2022-08-26", "end": "2022-08-27"}
+    before = calendar_cache.stats()
+
+    response = client_auth.get(RESOURCE, params=params)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/calendar")
+    assert b"BEGIN:VEVENT" in response.content
+    response_cached = client_auth.get(RESOURCE, params=params)
+    assert response_cached.content == response.content
+    assert calendar_cache.stats()["misses"] == before["misses"] + 1
+    assert calendar_cache.stats()["hits"] == before["hits"] + 1
+
+    # Другой диапазон дат -- другой ключ кэша и другой календарь
+    response = client_auth.get(RESOURCE, params=params | {"start": "2022-08-27", "end": "2022-08-28"})
+    assert response.status_code == status.HTTP_200_OK
+    assert b"BEGIN:VEVENT" not in response.content
+    assert calendar_cache.stats()["misses"] == before["misses"] + 2
+
+
+def test_ics_stale_render(dbsession: Session, event_path, group_path, mocker):
+    group_id = int(group_path.split("/")[-1])
+    event_id = int(event_path.split("/")[-1])
+    start, end = datetime.date(2022, 8, 26), datetime.date(2022, 8, 27)
+    key = calendar_cache.key("group", group_id, start, end)
+    calendar_cache.discard(key)
+
+    chunks = stream_ics(engine, key, start, end, group_id=group_id)
+    assert next(chunks).startswith(b"BEGIN:VCALENDAR")
+    # Изменение через другой воркер: его нет в снимке рендера, а сброс кэша прошёл до записи календаря
+    mocker.patch.object(cache, "publish")
+    dbsession.execute(update(Event).where(Event.id == event_id).values(update_ts=datetime.datetime.utcnow()))
+    dbsession.commit()
+    mocker.stopall()
+    list(chunks)
+    assert calendar_cache.get(key) is None
+
+    list(stream_ics(engine, key, start, end, group_id=group_id))
+    assert calendar_cache.get(key) is not None
+
+
+def test_ics_invalidation(client_auth: TestClient, dbsession: Session, event_path, group_path, room_path):
+    group_id = int(group_path.split("/")[-1])
+    room_id = int(room_path.split("/")[-1])
+    params = {"format": "ics", "start": "2022-08-26", "end": "2022-08-27"}
+    name = f"invalidation_{datetime.datetime.utcnow().isoformat()}"
+    response = client_auth.get(RESOURCE, params=params | {"group_id": group_id})
+    assert response.status_code == status.HTTP_200_OK
+    assert name.encode() not in response.content
+    # Календарь аудитории события тоже закэширован и должен сброситься
+    assert name.encode() not in client_auth.get(RESOURCE, params=params | {"room_id": room_id}).content
+
+    response = client_auth.patch(event_path, json={"name": name})
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    response = client_auth.get(RESOURCE, params=params | {"group_id": group_id})
+    assert name.encode() in response.content
+    assert name.encode() in client_auth.get(RESOURCE, params=params | {"room_id": room_id}).content
+
+    response = client_auth.patch(f"{RESOURCE}patch_name", json={"old_name": name, "new_name": name + "_renamed"})
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    response = client_auth.get(RESOURCE, params=params | {"group_id": group_id})
+    assert (name + "_renamed").encode() in response.content
+
+    response = client_auth.patch(room_path, json={"name": name + "_room"})
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    response = client_auth.get(RESOURCE, params=params | {"group_id": group_id})
+    assert (name + "_room").encode() in response.content
+
+    response = client_auth.delete(event_path)
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    response = client_auth.get(RESOURCE, params=params | {"group_id": group_id})
+    assert b"BEGIN:VEVENT" not in response.content
+
+
+def test_read_ics_lecturer_room(client_auth: TestClient, event_path, lecturer_path, room_path):
+    params = {"format": "ics", "start": "2022-08-26", "end": "2022-08-27"}
+    for key, path in (("lecturer_id", lecturer_path), ("room_id", room_path)):
+        response = client_auth.get(RESOURCE, params=params | {key: int(path.split("/")[-1])})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.content.count(b"BEGIN:VEVENT") == 1
+    response = client_auth.get(RESOURCE, params=params)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_read_ics_format(client_auth: TestClient, dbsession: Session, group_path, room_path, lecturer_path):
+    name = "Очень длинное название спецкурса; с точкой с запятой, запятыми и \\ обратной чертой " * 2
+    name += "\r\nс переводами\rстрок"
+    request_obj = {
+        "name": name,
+        "room_id": [int(room_path.split("/")[-1])],
+        "group_id": [int(group_path.split("/")[-1])],
+        "lecturer_id": [int(lecturer_path.split("/")[-1])],
+        "start_ts": "2022-08-26T10:00:00",
+        "end_ts": "2022-08-26T11:35:00",
+    }
+    response = client_auth.post(RESOURCE, json=request_obj)
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    id_ = response.json()["id"]
+
+    response = client_auth.get(
+        RESOURCE,
+        params={"group_id": request_obj["group_id"][0], "format": "ics", "start": "2022-08-26", "end": "2022-08-27"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert all(len(line) <= 75 and b"\r" not in line for line in response.content.split(b"\r\n"))
+    calendar = Calendar.from_ical(response.content)
+    (event,) = calendar.walk("VEVENT")
+    assert str(event["summary"]).startswith(name.replace("\r\n", "\n").replace("\r", "\n"))
+    assert event.decoded("dtstart") == datetime.datetime(2022, 8, 26, 10, 0, tzinfo=datetime.timezone.utc)
+    assert event.decoded("dtend") == datetime.datetime(2022, 8, 26, 11, 35, tzinfo=datetime.timezone.utc)
+
+    dbsession.delete(dbsession.query(Event).get(id_))
+    dbsession.commit()
+
+
+def test_read_conditional(client_auth: TestClient, event_path, group_path, room_path):
+    params = {"group_id": int(group_path.split("/")[-1]), "start": "2022-08-26", "end": "2022-08-27"}
+    for format in ("json", "ics"):
+        response = client_auth.get(RESOURCE, params=params | {"format": format})
+        assert response.status_code == status.HTTP_200_OK
+        etag = response.headers["etag"]
+        last_modified = response.headers["last-modified"]
+
+        response = client_auth.get(RESOURCE, params=params | {"format": format}, headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        # Last-Modified не учитывает всего, от чего зависит ответ, поэтому 304 только по ETag
+        response = client_auth.get(
+            RESOURCE, params=params | {"format": format}, headers={"If-Modified-Since": last_modified}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        # Другие параметры страницы -- другое тело ответа и другой ETag
+        response = client_auth.get(RESOURCE, params=params | {"format": format, "limit": 1})
+        assert response.headers["etag"] != etag
+
+    etags = {}
+    for format in ("json", "ics"):
+        etags[format] = client_auth.get(RESOURCE, params=params | {"format": format}).headers["etag"]
+    # Переименование аудитории не меняет строку события, но меняет расписание
+    response = client_auth.patch(room_path, json={"name": f"conditional_{datetime.datetime.utcnow().isoformat()}"})
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    for format in ("json", "ics"):
+        response = client_auth.get(
+            RESOURCE, params=params | {"format": format}, headers={"If-None-Match": etags[format]}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["etag"] != etags[format]
+        etags[format] = response.headers["etag"]
+
+    response = client_auth.delete(event_path)
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    for format in ("json", "ics"):
+        response = client_auth.get(
+            RESOURCE, params=params | {"format": format}, headers={"If-None-Match": etags[format]}
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+
+def test_read_conditional_references(client_auth: TestClient, dbsession: Session, event_path, group_path, room_path):
+    params = {"group_id": int(group_path.split("/")[-1]), "start": "2022-08-26", "end": "2022-08-27"}
+    response = client_auth.get(RESOURCE, params=params)
+    etag = response.headers["etag"]
+    # Другой воркер переименовал аудиторию, сообщение об этом сюда ещё не дошло
+    name = f"references_{datetime.datetime.utcnow().isoformat()}"
+    dbsession.execute(update(Room).where(Room.id == int(room_path.split("/")[-1])).values(name=name))
+    dbsession.commit()
+    response = client_auth.get(RESOURCE, params=params, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    reference_cache.invalidate()
+    response = client_auth.get(RESOURCE, params=params, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+    assert response.json()["items"][0]["room"][0]["name"] == name
+
+
+def test_patch_series_fields(client_auth: TestClient, event_path):
+    for fields in ({"repeat_until_ts": "2022-09-29T10:00:00"}, {"exdates": ["2022-08-26T10:00:00"]}):
+        response = client_auth.patch(event_path, json=fields)
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY, response.json()
+    assert client_auth.patch(event_path, json={"name": "Не серия"}).status_code == status.HTTP_200_OK
+
+
+def test_create_many_import(client_auth: TestClient, dbsession: Session, room_factory, group_factory, lecturer_factory):
+    room_id = int(room_factory(client_auth).split("/")[-1])
+    group_id = int(group_factory(client_auth).split("/")[-1])
+    lecturer_id = int(lecturer_factory(client_auth).split("/")[-1])
+    name = f"import_{datetime.datetime.utcnow().isoformat()}"
+
+    def lessons(count: int) -> list[dict]:
+        return [
+            {
+                "name": name,
+                "room_id": [room_id],
+                "group_id": [group_id],
+                "lecturer_id": [lecturer_id],
+                "start_ts": f"2022-09-{1 + i:02}T10:00:00Z",
+                "end_ts": f"2022-09-{1 + i:02}T11:35:00Z",
+            }
+            for i in range(count)
+        ]
+
+    statements = []
+
+    def count_statements(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    listen(Engine, "before_cursor_execute", count_statements)
+    try:
+        response = client_auth.post(f"{RESOURCE}bulk", json=lessons(2) + lessons(1))
+        assert response.status_code == status.HTTP_200_OK, response.json()
+        assert (response.headers["x-inserted-count"], response.headers["x-skipped-count"]) == ("2", "1")
+        small = len(statements)
+        statements.clear()
+        # Количество запросов не зависит от размера импорта
+        response = client_auth.post(f"{RESOURCE}bulk", json=lessons(20))
+        assert response.status_code == status.HTTP_200_OK, response.json()
+        assert (response.headers["x-inserted-count"], response.headers["x-skipped-count"]) == ("18", "2")
+        assert len(statements) == small
+    finally:
+        remove(Engine, "before_cursor_execute", count_statements)
+    assert response.json()[0]["room"][0]["id"] == room_id
+    assert response.json()[0]["start_ts"] == "2022-09-03T10:00:00"
+
+    response = client_auth.post(f"{RESOURCE}bulk", json=lessons(1) + [lessons(1)[0] | {"room_id": [room_id, -1]}])
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    events = dbsession.query(Event).filter(Event.name == name).all()
+    assert len(events) == 20
+    for event in events:
+        dbsession.delete(event)
+    dbsession.commit()
+
+
+def test_series(client_auth: TestClient, dbsession: Session, group_path, room_path, lecturer_path):
+    group_id = int(group_path.split("/")[-1])
+    request_obj = {
+        "name": f"series_{datetime.datetime.utcnow().isoformat()}",
+        "room_id": [int(room_path.split("/")[-1])],
+        "group_id": [group_id],
+        "lecturer_id": [int(lecturer_path.split("/")[-1])],
+        "start_ts": "2022-09-01T10:00:00",
+        "end_ts": "2022-09-01T11:35:00",
+        "repeat_timedelta_days": 7,
+        "repeat_until_ts": "2022-09-29T10:00:00",
+        "exdates": ["2022-09-15T10:00:00"],
+    }
+    response = client_auth.post(f"{RESOURCE}series", json=request_obj)
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    id_ = response.json()["id"]
+    assert client_auth.get(f"{RESOURCE}series/{id_}").json()["exdates"] == ["2022-09-15T10:00:00"]
+    assert dbsession.query(Event).filter(Event.name == request_obj["name"]).count() == 1
+
+    params = {"group_id": group_id, "start": "2022-09-01", "end": "2022-10-01"}
+    response = client_auth.get(RESOURCE, params=params)
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert response.json()["total"] == 4
+    assert [(row["id"], row["start_ts"], row["end_ts"]) for row in response.json()["items"]] == [
+        (id_, f"2022-09-{day:02}T10:00:00", f"2022-09-{day:02}T11:35:00") for day in (1, 8, 22, 29)
+    ]
+    response = client_auth.get(RESOURCE, params=params | {"start": "2022-09-09", "end": "2022-09-23"})
+    assert [row["start_ts"] for row in response.json()["items"]] == ["2022-09-22T10:00:00"]
+    # Повторения одной серии различаются курсором по времени начала
+    starts, cursor = [], None
+    while True:
+        page = client_auth.get(RESOURCE, params=params | {"limit": 1} | ({"cursor": cursor} if cursor else {})).json()
+        starts += [row["start_ts"] for row in page["items"]]
+        if not (cursor := page["next_cursor"]):
+            break
+    assert len(starts) == 4
+
+    response = client_auth.get(RESOURCE, params=params | {"format": "ics"})
+    assert response.status_code == status.HTTP_200_OK
+    (event,) = Calendar.from_ical(response.content).walk("VEVENT")
+    assert event.decoded("dtstart") == datetime.datetime(2022, 9, 1, 10, 0, tzinfo=datetime.timezone.utc)
+    assert event["rrule"]["freq"] == ["DAILY"] and event["rrule"]["interval"] == [7]
+    assert event["rrule"]["until"] == [datetime.datetime(2022, 9, 29, 10, 0, tzinfo=datetime.timezone.utc)]
+    assert b"EXDATE:20220915T100000Z" in response.content
+
+    response = client_auth.patch(f"{RESOURCE}{id_}", json={"exdates": []})
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert client_auth.get(RESOURCE, params=params).json()["total"] == 5
+    assert b"EXDATE" not in client_auth.get(RESOURCE, params=params | {"format": "ics"}).content
+
+    response = client_auth.post(f"{RESOURCE}series", json=request_obj | {"repeat_timedelta_days": 0})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    dbsession.delete(dbsession.query(Event).get(id_))
+    dbsession.commit()
@@ -1,11 +1,17 @@
-from datetime import datetime
+from datetime import date, datetime
 from urllib.parse import urljoin
 
 from fastapi.testclient import TestClient
+from pytest_mock import MockerFixture
+from sqlalchemy import delete
+from sqlalchemy.event import listen, remove
 from sqlalchemy.orm import Session
 from starlette import status
 
-from calendar_backend.models import Group
+from calendar_backend.cache import cache
+from calendar_backend.database import async_engine
+from calendar_backend.models import Group, GroupWeek
+from calendar_backend.routes.reference_cache import reference_cache
 
 
 RESOURCE = "/group/"
@@ -189,3 +195,106 @@ def test_update_all(client_auth: TestClient, dbsession: Session):
     # Clear db
     dbsession.delete(response_model)
     dbsession.commit()
+
+
+def test_read_cached(client_auth: TestClient, group_path):
+    assert client_auth.get(group_path).status_code == status.HTTP_200_OK
+    statements = []
+
+    def count_statements(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    listen(async_engine.sync_engine, "before_cursor_execute", count_statements)
+    try:
+        response = client_auth.get(group_path)
+        assert response.status_code == status.HTTP_200_OK, response.json()
+        assert statements == []
+
+        # Изменение сбрасывает кэш сразу, не дожидаясь REFERENCE_CACHE_TTL
+        assert client_auth.patch(group_path, json={"name": "cached"}).status_code == status.HTTP_200_OK
+        assert client_auth.get(group_path).json()["name"] == "cached"
+        assert statements
+    finally:
+        remove(async_engine.sync_engine, "before_cursor_execute", count_statements)
+
+
+def test_read_from_replica(client_auth: TestClient, replica, group_path):
+    # Запись идёт в основную базу, чтение -- в реплику, где группы ещё нет
+    assert client_auth.patch(group_path, json={"name": "replica"}).status_code == status.HTTP_200_OK
+    assert client_auth.get(group_path).status_code == status.HTTP_404_NOT_FOUND
+
+    id_ = int(group_path.split("/")[-1])
+    with Session(replica) as session:
+        session.add(Group(id=id_, name="from replica", number="101"))
+        session.commit()
+        try:
+            response = client_auth.get(group_path)
+            assert response.status_code == status.HTTP_200_OK, response.json()
+            assert response.json()["name"] == "from replica"
+            assert client_auth.get(RESOURCE, params={"query": "101"}).json()["total"] == 1
+        finally:
+            session.execute(delete(Group).where(Group.id == id_))
+            session.commit()
+
+
+def test_week(client_auth: TestClient, dbsession: Session, event_path, group_path):
+    group_id = int(group_path.split("/")[-1])
+    week = f"{group_path}/week/2022-W34"
+    response = client_auth.get(week)
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert [item["id"] for item in response.json()["items"]] == [int(event_path.split("/")[-1])]
+    assert dbsession.get(GroupWeek, (group_id, date(2022, 8, 22))).payload == response.content
+    assert client_auth.get(f"{group_path}/week/2022-W35").json()["items"] == []
+
+    # Изменение события удаляет сохранённые недели его групп
+    client_auth.patch(event_path, json={"name": "Новое название"})
+    dbsession.expire_all()
+    assert dbsession.get(GroupWeek, (group_id, date(2022, 8, 22))) is None
+    assert client_auth.get(week).json()["items"][0]["name"] == "Новое название"
+
+    # Неделя, отрендеренная с другими справочниками, не отдаётся
+    stored = dbsession.get(GroupWeek, (group_id, date(2022, 8, 22)))
+    stored.payload, stored.references_stamp = b"{}", "stale"
+    dbsession.commit()
+    assert client_auth.get(week).json()["items"][0]["name"] == "Новое название"
+    dbsession.refresh(stored)
+    assert stored.references_stamp != "stale"
+
+    assert client_auth.get(f"{group_path}/week/2022-W60").status_code == 422
+    assert client_auth.get(f"{group_path}/week/2022-34").status_code == 422
+    assert client_auth.get(f"{RESOURCE}0/week/2022-W34").status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_week_from_lagging_replica(client_auth: TestClient, dbsession: Session, replica, event_path, group_path):
+    group_id = int(group_path.split("/")[-1])
+    with Session(replica) as session:
+        session.add(Group(id=group_id, name="", number="101"))
+        session.commit()
+        try:
+            # Реплика ещё не получила событие: неделя без него отдаётся, но не сохраняется
+            response = client_auth.get(f"{group_path}/week/2022-W34")
+            assert response.status_code == status.HTTP_200_OK, response.json()
+            assert response.json()["items"] == []
+            assert dbsession.get(GroupWeek, (group_id, date(2022, 8, 22))) is None
+        finally:
+            session.execute(delete(Group).where(Group.id == group_id))
+            session.commit()
+
+
+def test_read_not_in_cache(client_auth: TestClient, dbsession: Session, mocker: MockerFixture):
+    client_auth.get(RESOURCE)
+    # Создание через другой воркер: сообщение о нём до кэша этого воркера ещё не дошло
+    mocker.patch.object(cache, "publish")
+    response = client_auth.post(RESOURCE, json={"name": "", "number": f"9{datetime.utcnow().microsecond:06}"})
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    created = response.json()
+    assert created["id"] not in getattr(client_auth.portal.call(reference_cache.get, None), "groups")
+
+    response = client_auth.get(urljoin(RESOURCE, str(created["id"])))
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert response.json() == created
+    response = client_auth.get(RESOURCE, params={"query": created["number"], "limit": 0})
+    assert [row["id"] for row in response.json()["items"]] == [created["id"]]
+
+    dbsession.delete(dbsession.get(Group, created["id"]))
+    dbsession.commit()
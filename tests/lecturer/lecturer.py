@@ -1,10 +1,13 @@
 from urllib.parse import urljoin
+from uuid import uuid4
 
 from fastapi.testclient import TestClient
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from starlette import status
 
 from calendar_backend.models.db import Lecturer
+from calendar_backend.routes.reference_cache import reference_cache
 
 
 RESOURCE = "/lecturer/"
@@ -305,3 +308,53 @@ def test_update_all(client_auth: TestClient, dbsession: Session):
     # Clear db
     dbsession.delete(response_model)
     dbsession.commit()
+
+
+def test_search(client_auth: TestClient, dbsession: Session):
+    tag = uuid4().hex
+    ids = []
+    for first_name, last_name in (("Пётр", f"Фёдоров{tag}"), ("Фёдор", f"Петров{tag}")):
+        request_obj = {"first_name": first_name, "middle_name": tag, "last_name": last_name}
+        response = client_auth.post(RESOURCE, json=request_obj)
+        assert response.status_code == status.HTTP_200_OK, response.json()
+        ids.append(response.json()["id"])
+
+    def search(query: str) -> list[int]:
+        response = client_auth.get(RESOURCE, params={"query": query, "limit": 0})
+        assert response.status_code == status.HTTP_200_OK, response.json()
+        return [item["id"] for item in response.json()["items"]]
+
+    # Регистр и ё не важны, каждое слово запроса -- начало какого-то слова имени
+    assert search(f"федоров{tag} ПЕТ") == [ids[0]]
+    assert search(f"ФЁДОРОВ{tag}") == [ids[0]]
+    # "петр" -- начало и имени Пётр, и фамилии Петров
+    assert sorted(search(f"{tag[:8]} пётр")) == ids
+    assert sorted(search(tag)) == sorted(ids)
+    assert search(f"едоров{tag}") == []
+    assert search(f"{tag} %") == search(tag)
+
+    for id_ in ids:
+        dbsession.delete(dbsession.query(Lecturer).get(id_))
+    dbsession.commit()
+
+
+def test_read_not_in_cache(client_auth: TestClient, dbsession: Session):
+    last_name = f"Кэшев{uuid4().hex[:8]}"
+    client_auth.get(RESOURCE)
+    # Преподаватель добавлен через другой воркер: кэш этого воркера о нём не знает
+    id_ = dbsession.execute(
+        insert(Lecturer)
+        .values(first_name="Петр", middle_name="Васильевич", last_name=last_name, is_deleted=False)
+        .returning(Lecturer.id)
+    ).scalar()
+    dbsession.commit()
+    assert id_ not in client_auth.portal.call(reference_cache.get, None).lecturers
+
+    response = client_auth.get(urljoin(RESOURCE, str(id_)))
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert response.json()["last_name"] == last_name
+    response = client_auth.get(RESOURCE, params={"query": last_name})
+    assert [row["last_name"] for row in response.json()["items"]] == [last_name]
+
+    dbsession.delete(dbsession.get(Lecturer, id_))
+    dbsession.commit()
@@ -0,0 +1,41 @@
+from fastapi.testclient import TestClient
+from pytest_mock import MockerFixture
+from starlette import status
+
+from calendar_backend import database
+
+
+RESOURCE = "/metrics/"
+
+
+def test_read(client: TestClient, group_path):
+    response = client.get(RESOURCE)
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    checkouts = response.json()["db_pool"]["asyncpg"]["checkouts"]
+    assert client.get(group_path).status_code == status.HTTP_200_OK
+
+    response = client.get(RESOURCE)
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    pools = response.json()["db_pool"]
+    assert pools["asyncpg"]["checkouts"] == checkouts + 1
+    assert pools["asyncpg"]["checked_out"] == 0
+    assert set(pools["blocking"]) == set(pools["asyncpg"])
+    assert "misses" in response.json()["ics_cache"]
+    assert "loads" in response.json()["reference_cache"]
+
+
+def test_session_is_lazy(client_auth: TestClient, mocker: MockerFixture, group_path):
+    session_factory = mocker.patch.object(database, "session_factory", wraps=database.session_factory)
+    # Чтение, статика и preflight обходятся без блокирующей сессии
+    assert client_auth.get(group_path).status_code == status.HTTP_200_OK
+    assert client_auth.get("/static/missing.png").status_code == status.HTTP_404_NOT_FOUND
+    response = client_auth.options(
+        group_path, headers={"Origin": "https://example.com", "Access-Control-Request-Method": "GET"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert session_factory.call_count == 0
+
+    # Обработчик, который пишет, получает одну сессию на весь запрос
+    response = client_auth.patch(group_path, json={"name": "lazy"})
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert session_factory.call_count == 1
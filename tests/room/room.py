@@ -2,10 +2,13 @@ import datetime
 from urllib.parse import urljoin
 
 from fastapi.testclient import TestClient
+from pytest_mock import MockerFixture
 from sqlalchemy.orm import Session
 from starlette import status
 
-from calendar_backend.models import Room
+from calendar_backend.cache import cache
+from calendar_backend.models import Event, Room
+from calendar_backend.routes.reference_cache import reference_cache
 
 
 RESOURCE = "/room/"
@@ -133,3 +136,120 @@ def test_update_all(client_auth: TestClient, dbsession: Session):
     # Clear db
     dbsession.delete(response_model)
     dbsession.commit()
+
+
+def test_busy_free(client_auth: TestClient, dbsession: Session):
+    building = f"busy_{datetime.datetime.utcnow().isoformat()}"
+    rooms = [
+        client_auth.post(RESOURCE, json={"name": f"{i}-{building}", "building": building}).json() for i in range(3)
+    ]
+    lesson = {"name": "busy", "group_id": [], "lecturer_id": []}
+    single = client_auth.post(
+        "/event/",
+        json=lesson | {"room_id": [rooms[0]["id"]], "start_ts": "2022-08-26T10:00:00", "end_ts": "2022-08-26T11:35:00"},
+    ).json()
+    # Серия занимает аудиторию по пятницам, кроме 2 сентября
+    series = client_auth.post(
+        "/event/series",
+        json=lesson
+        | {
+            "room_id": [rooms[1]["id"]],
+            "start_ts": "2022-08-12T09:00:00",
+            "end_ts": "2022-08-12T10:35:00",
+            "repeat_timedelta_days": 7,
+            "repeat_until_ts": "2022-09-30T09:00:00",
+            "exdates": ["2022-09-02T09:00:00"],
+        },
+    ).json()
+
+    def free(start: str, end: str) -> list[int]:
+        response = client_auth.get(f"{RESOURCE}free", params={"start": start, "end": end, "building": building})
+        assert response.status_code == status.HTTP_200_OK, response.json()
+        return [room["id"] for room in response.json()]
+
+    assert free("2022-08-26T10:40:00", "2022-08-26T11:00:00") == [rooms[1]["id"], rooms[2]["id"]]
+    assert free("2022-08-26T09:30:00", "2022-08-26T10:30:00") == [rooms[2]["id"]]
+    assert free("2022-08-26T11:35:00", "2022-08-26T12:00:00") == [room["id"] for room in rooms]
+    assert free("2022-09-02T09:00:00", "2022-09-02T10:00:00") == [room["id"] for room in rooms]
+    assert free("2022-09-30T10:00:00+02:00", "2022-09-30T09:30:00Z") == [rooms[0]["id"], rooms[2]["id"]]
+
+    response = client_auth.get(
+        f"{RESOURCE}busy",
+        params={"start": "2022-08-19", "end": "2022-08-27", "room_id": [rooms[0]["id"], rooms[1]["id"]]},
+    )
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert response.json() == [
+        {
+            "id": rooms[0]["id"],
+            "busy": [{"event_id": single["id"], "start_ts": "2022-08-26T10:00:00", "end_ts": "2022-08-26T11:35:00"}],
+        },
+        {
+            "id": rooms[1]["id"],
+            "busy": [
+                {"event_id": series["id"], "start_ts": f"2022-08-{day}T09:00:00", "end_ts": f"2022-08-{day}T10:35:00"}
+                for day in (19, 26)
+            ],
+        },
+    ]
+    assert client_auth.get(f"{RESOURCE}busy", params={"start": "2022-08-26", "end": "2022-08-26"}).status_code == 422
+    assert client_auth.get(f"{RESOURCE}free", params={"start": "2022-08-01", "end": "2022-10-01"}).status_code == 422
+
+    for event in (single, series):
+        dbsession.delete(dbsession.query(Event).get(event["id"]))
+    dbsession.commit()
+    for room in rooms:
+        dbsession.delete(dbsession.query(Room).get(room["id"]))
+    dbsession.commit()
+
+
+def test_busy_midnight(client_auth: TestClient, dbsession: Session):
+    building = f"midnight_{datetime.datetime.utcnow().isoformat()}"
+    room = client_auth.post(RESOURCE, json={"name": f"0-{building}", "building": building}).json()
+    lesson = {"name": "midnight", "group_id": [], "lecturer_id": [], "room_id": [room["id"]]}
+    # Через полночь и до полуночи следующего дня
+    events = [
+        client_auth.post("/event/", json=lesson | {"start_ts": start, "end_ts": end}).json()
+        for start, end in (
+            ("2022-08-26T23:00:00", "2022-08-27T01:00:00"),
+            ("2022-08-28T23:00:00", "2022-08-29T00:00:00"),
+        )
+    ]
+
+    def busy(start: str, end: str) -> list[int]:
+        response = client_auth.get(f"{RESOURCE}busy", params={"start": start, "end": end, "room_id": room["id"]})
+        assert response.status_code == status.HTTP_200_OK, response.json()
+        return [row["event_id"] for row in response.json()[0]["busy"]]
+
+    assert busy("2022-08-27T00:00:00", "2022-08-27T00:30:00") == [events[0]["id"]]
+    assert busy("2022-08-28T23:30:00", "2022-08-28T23:50:00") == [events[1]["id"]]
+    free = client_auth.get(
+        f"{RESOURCE}free", params={"start": "2022-08-28T23:30:00", "end": "2022-08-28T23:50:00", "building": building}
+    )
+    assert free.json() == []
+
+    for event in events:
+        dbsession.delete(dbsession.query(Event).get(event["id"]))
+    dbsession.commit()
+    dbsession.delete(dbsession.query(Room).get(room["id"]))
+    dbsession.commit()
+
+
+def test_read_not_in_cache(client_auth: TestClient, dbsession: Session, mocker: MockerFixture):
+    client_auth.get(RESOURCE)
+    # Создание через другой воркер: сообщение о нём до кэша этого воркера ещё не дошло
+    mocker.patch.object(cache, "publish")
+    response = client_auth.post(
+        RESOURCE, json={"name": f"uncached-{datetime.datetime.utcnow().isoformat()}", "building": "uncached"}
+    )
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    created = response.json()
+    assert created["id"] not in getattr(client_auth.portal.call(reference_cache.get, None), "rooms")
+
+    response = client_auth.get(urljoin(RESOURCE, str(created["id"])))
+    assert response.status_code == status.HTTP_200_OK, response.json()
+    assert response.json() == created
+    response = client_auth.get(RESOURCE, params={"query": created["name"], "limit": 0})
+    assert [row["id"] for row in response.json()["items"]] == [created["id"]]
+
+    dbsession.delete(dbsession.get(Room, created["id"]))
+    dbsession.commit()
@@ -0,0 +1,45 @@
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from starlette import status
+
+from calendar_backend.models import Group, Lecturer, Room
+
+
+RESOURCE = "/search/suggest"
+
+
+def test_suggest(client_auth: TestClient, dbsession: Session):
+    # С буквы: иначе начало tag может совпасть с номером аудитории в запросе
+    tag = "x" + uuid4().hex[:11]
+    group = client_auth.post("/group/", json={"name": f"Группа {tag}а", "number": f"1{tag}"}).json()
+    room = client_auth.post("/room/", json={"name": f"{tag}-21", "direction": "South"}).json()
+    lecturer = client_auth.post(
+        "/lecturer/", json={"first_name": "Пётр", "middle_name": "Петрович", "last_name": f"Ёжиков{tag}"}
+    ).json()
+
+    def suggest(query: str, **params) -> list[tuple[str, int]]:
+        response = client_auth.get(RESOURCE, params={"query": query} | params)
+        assert response.status_code == status.HTTP_200_OK, response.json()
+        return [(item["type"], item["id"]) for item in response.json()["items"]]
+
+    assert suggest(f"1{tag}") == [("group", group["id"])]
+    assert suggest(f"группа {tag[:6]}") == [("group", group["id"])]
+    assert suggest(f"{tag}-2") == [("room", room["id"])]
+    assert suggest(f"ежиков{tag} пет") == [("lecturer", lecturer["id"])]
+    # Целое слово раньше начала слова
+    assert suggest(tag) == [("room", room["id"]), ("group", group["id"])]
+    assert suggest(tag, limit=1) == [("room", room["id"])]
+    assert suggest(f"жиков{tag}") == []
+    assert suggest("") == []
+
+    # Изменение справочника сразу видно в подсказках
+    client_auth.patch(f"/room/{room['id']}", json={"name": f"{tag}-22"})
+    assert suggest(f"{tag}-21") == []
+    assert suggest(f"{tag} 22") == [("room", room["id"])]
+
+    dbsession.delete(dbsession.query(Group).get(group["id"]))
+    dbsession.delete(dbsession.query(Room).get(room["id"]))
+    dbsession.delete(dbsession.query(Lecturer).get(lecturer["id"]))
+    dbsession.commit()